@@ -0,0 +1 @@
+"""End-to-end benchmarks of sphinx-versioning on generated git repositories. Run with: python -m benchmarks --help"""
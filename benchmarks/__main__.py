@@ -0,0 +1,151 @@
+"""Run sphinx-versioning build end-to-end on generated repositories and report per-phase timings.
+
+Everything is local: each scenario has a bare "origin" repository and a clone of it. Repositories are generated once
+per set of parameters and reused by later runs. Results are written as JSON for comparing before and after a change.
+"""
+
+import json
+import os
+import platform
+import shlex
+import shutil
+import tempfile
+import time
+from subprocess import CalledProcessError
+
+import click
+import sphinx
+
+from benchmarks.repos import generate, run
+from benchmarks.scenarios import params, QUICK, SCENARIOS
+from sphinxcontrib.versioning import __version__
+
+
+def median(values):
+    """Get the median of numbers.
+
+    :param list values: Numbers.
+
+    :return: Median.
+    :rtype: float
+    """
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2.0
+
+
+def environment():
+    """Describe where the benchmarks ran, to only compare results from the same environment.
+
+    :return: JSON serializable dict.
+    :rtype: dict
+    """
+    return dict(
+        cpus=os.cpu_count() if hasattr(os, 'cpu_count') else None,
+        git=run(os.getcwd(), ['git', '--version'], env_var=False).strip(),
+        platform=platform.platform(),
+        python=platform.python_version(),
+        sphinx=sphinx.__version__,
+        version=__version__,
+    )
+
+
+def run_scenario(work_dir, name, repeat, build_args):
+    """Build one scenario several times.
+
+    :param str work_dir: Directory with generated repositories.
+    :param str name: Scenario name.
+    :param int repeat: Number of builds.
+    :param list build_args: Additional arguments for the build sub command.
+
+    :raise click.ClickException: If a build fails.
+
+    :return: Parameters, timings reports of every build, and medians of wall time per phase.
+    :rtype: dict
+    """
+    scenario = params(name)
+    start = time.time()
+    local = generate(os.path.join(work_dir, name), scenario)
+    click.echo('{}: generated in {:.1f}s'.format(name, time.time() - start), err=True)
+
+    runs = list()
+    for number in range(repeat):
+        destination = os.path.join(work_dir, name, 'html')
+        report_file = os.path.join(work_dir, name, 'timings.json')
+        if os.path.isdir(destination):
+            shutil.rmtree(destination)
+        start = time.time()
+        try:
+            run(local, ['sphinx-versioning', 'build', '--timings', report_file] + build_args + ['docs', destination])
+        except CalledProcessError as exc:
+            raise click.ClickException('Build of {} failed:\n{}'.format(name, exc.output))
+        with open(report_file) as handle:
+            runs.append(json.load(handle))
+        click.echo('{}: build {}/{} in {:.1f}s'.format(name, number + 1, repeat, time.time() - start), err=True)
+
+    phases = dict()
+    for report in runs:
+        totals = dict()
+        for entry in report['phases']:
+            totals[entry['name']] = totals.get(entry['name'], 0.0) + entry['wall']
+        for phase_name, wall in totals.items():
+            phases.setdefault(phase_name, list()).append(wall)
+    return dict(
+        median=dict(
+            cpu=median([r['cpu'] for r in runs]),
+            git=median([r['git_total'] for r in runs]),
+            phases={n: round(median(w), 3) for n, w in phases.items()},
+            wall=median([r['wall'] for r in runs]),
+        ),
+        params=scenario,
+        runs=runs,
+    )
+
+
+@click.command()
+@click.argument('SCENARIO', nargs=-1, type=click.Choice(sorted(SCENARIOS) + ['all']))
+@click.option('-b', '--build-args', default='', help='Additional arguments for the build sub command.')
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='Write results to this JSON file.')
+@click.option('-r', '--repeat', default=3, type=click.IntRange(1), help='Builds per scenario. Default 3.')
+@click.option('-w', '--work-dir', type=click.Path(file_okay=False),
+              help='Keep generated repositories here to reuse them. Default is a temporary directory.')
+def main(scenario, build_args, output, repeat, work_dir):
+    """Benchmark sphinx-versioning build on generated git repositories.
+
+    SCENARIO is one or more of the scenarios (default: the quick ones). Use "all" for all of them.
+
+    To compare before and after a change run both with the same --work-dir and --output to different files, e.g.:
+
+    \b
+    python -m benchmarks -w /tmp/bench -o before.json refs_100 -b "--build-jobs 4"
+    \f
+
+    :param tuple scenario: Scenario names.
+    :param str build_args: Additional arguments for the build sub command, split like a shell does.
+    :param str output: Write results to this JSON file.
+    :param int repeat: Builds per scenario.
+    :param str work_dir: Directory for generated repositories.
+    """
+    names = sorted(SCENARIOS) if 'all' in scenario else (list(scenario) or list(QUICK))
+    temp_dir = None if work_dir else tempfile.mkdtemp()
+    results = dict(environment=environment(), build_args=shlex.split(build_args), scenarios=dict())
+    try:
+        for name in names:
+            results['scenarios'][name] = run_scenario(work_dir or temp_dir, name, repeat, results['build_args'])
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+    for name in names:
+        medians = results['scenarios'][name]['median']
+        click.echo('{:<12} {:>8.1f}s wall {:>8.1f}s CPU {:>6} git  {}'.format(
+            name, medians['wall'], medians['cpu'], medians['git'],
+            ', '.join('{} {:.1f}s'.format(n, w) for n, w in sorted(medians['phases'].items(), key=lambda i: -i[1]))))
+    if output:
+        with open(output, 'w') as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+        click.echo('Wrote results to: {}'.format(output), err=True)
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
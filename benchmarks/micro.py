@@ -0,0 +1,242 @@
+"""Micro-benchmarks of the pure Python hot paths in versions.py, run per page and per version during builds.
+
+Measures throughput (operations per second) of every case at 10 to 10,000 remotes and 10 to 10,000 pages (found_docs
+of every remote). Results can be saved as a baseline and later compared against it, failing on regressions. Results
+depend on the machine, so baselines aren't committed. Save one before a change and compare after it on the same machine.
+
+Run with: python -m benchmarks.micro --help
+"""
+
+import json
+import os
+import platform
+import re
+import time
+
+import click
+
+from sphinxcontrib.versioning.versions import multi_sort, semvers, Versions
+
+MENU_MAX_REMOTES = 1000  # Rendering a whole menu is quadratic, 10,000 remotes would take minutes per operation.
+PAGES = (10, 100, 1000, 10000)
+REMOTES = (10, 100, 1000, 10000)
+
+
+def remote_tuples(count):
+    """Generate gather_git_info() output: a mix of branches and tags with valid and invalid semver names.
+
+    :param int count: Number of remotes.
+
+    :return: Lists of sha, name, kind, date, and conf_rel_path like routines.gather_git_info() returns.
+    :rtype: list
+    """
+    remotes = list()
+    for number in range(count):
+        if number % 4 == 0:
+            name, kind = 'feature_{}'.format(number), 'heads'
+        elif number % 4 == 1:
+            name, kind = 'v{}.{}.{}rc{}'.format(number // 1000, number // 10 % 100, number % 10, number % 3), 'tags'
+        else:
+            name, kind = 'v{}.{}.{}'.format(number // 1000, number // 10 % 100, number % 10), 'tags'
+        sha = '{:040x}'.format(number * 7919 + 1)
+        remotes.append([sha, name, kind, 1480907825 + (number * 37 % count) * 60, 'docs/conf.py'])
+    return remotes
+
+
+def versions_with_docs(remotes, pages):
+    """Get Versions after pre_build() would have set found_docs and root_dir.
+
+    :param int remotes: Number of remotes.
+    :param int pages: Number of pages in every remote.
+
+    :return: Versions instance with context for the last page of the first remote.
+    :rtype: sphinxcontrib.versioning.versions.Versions
+    """
+    versions = Versions(remote_tuples(remotes), sort=('semver', 'time'))
+    found_docs = tuple('section_{}/page_{}'.format(i % 10, i) for i in range(pages))
+    for remote in versions.remotes:
+        remote['found_docs'] = found_docs
+        remote['root_dir'] = remote['name']
+    versions.context.update(current_version=versions.remotes[0]['name'], pagename=found_docs[-1], scv_is_root=False)
+    return versions
+
+
+def cycle(values):
+    """Get a function returning the next value every call, starting over at the end.
+
+    :param list values: Values.
+
+    :return: Function without arguments.
+    :rtype: function
+    """
+    state = dict(index=-1)
+
+    def next_value():
+        """Get the next value.
+
+        :return: Next value.
+        """
+        state['index'] = (state['index'] + 1) % len(values)
+        return values[state['index']]
+    return next_value
+
+
+def template_menu(versions, pagename, html_theme):
+    """Do what _templates/versions.html does on one page.
+
+    :param sphinxcontrib.versioning.versions.Versions versions: From versions_with_docs().
+    :param str pagename: Current page.
+    :param str html_theme: The sphinx_rtd_theme lists tags and branches separately, other themes all versions.
+
+    :return: Links.
+    :rtype: list
+    """
+    versions.context['pagename'] = pagename
+    if html_theme != 'sphinx_rtd_theme':
+        return list(versions)
+    links = list()
+    for view in ('tags', 'branches'):
+        if getattr(versions, view):
+            links.extend(getattr(versions, view))
+    return links
+
+
+def cases(max_size=max(REMOTES)):
+    """Set up all benchmark cases.
+
+    :param int max_size: Skip cases with more remotes or pages than this.
+
+    :return: Yields case names and functions without arguments running one operation.
+    :rtype: iter
+    """
+    for remotes in (r for r in REMOTES if r <= max_size):
+        tuples = remote_tuples(remotes)
+        names = [r[1] for r in tuples]
+        yield 'semvers[remotes={}]'.format(remotes), lambda n=names: semvers(n)
+
+        dicts = Versions(tuples).remotes
+        yield 'multi_sort[remotes={}]'.format(remotes), lambda d=dicts: multi_sort(d[:], ('semver', 'time'))
+        yield 'multi_sort.pep440[remotes={}]'.format(remotes), lambda d=dicts: multi_sort(d[:], ('pep440', 'alpha'))
+
+        yield 'Versions.__init__[remotes={}]'.format(remotes), \
+            lambda t=tuples: Versions(t, sort=('semver', 'time'), priority='tags')
+
+        versions = versions_with_docs(remotes, min(PAGES))
+        yield 'Versions.__getitem__[remotes={}]'.format(remotes), lambda v=versions, n=cycle(names): v[n()]
+
+        for pages in (p for p in PAGES if p <= max_size):
+            versions = versions_with_docs(remotes, pages)
+            yield 'Versions.vpathto[remotes={},pages={}]'.format(remotes, pages), \
+                lambda v=versions, n=cycle(names): v.vpathto(n())
+
+        if remotes <= MENU_MAX_REMOTES:
+            versions = versions_with_docs(remotes, min(PAGES))
+            pages = cycle(versions.remotes[0]['found_docs'])
+            yield 'menu[remotes={}]'.format(remotes), lambda v=versions, p=pages: template_menu(v, p(), None)
+            yield 'menu.rtd[remotes={}]'.format(remotes), \
+                lambda v=versions, p=pages: template_menu(v, p(), 'sphinx_rtd_theme')
+
+
+def measure(func, min_time, repeat):
+    """Measure throughput of a function, calling it in batches until each batch takes at least min_time.
+
+    :param function func: Function to call without arguments.
+    :param float min_time: Minimum seconds of each measurement.
+    :param int repeat: Number of measurements, the fastest one is used.
+
+    :return: Operations per second.
+    :rtype: float
+    """
+    best = 0.0
+    for _ in range(repeat):
+        calls, start, elapsed = 0, time.time(), 0.0
+        while elapsed < min_time:
+            func()
+            calls += 1
+            elapsed = time.time() - start
+        best = max(best, calls / elapsed)
+    return best
+
+
+def compare(baseline, results, threshold):
+    """Compare results with a baseline.
+
+    :param dict baseline: Case names (keys) and operations per second (values) from an earlier run.
+    :param dict results: Case names (keys) and operations per second (values).
+    :param float threshold: Fraction of throughput that may be lost before it's a regression, e.g. 0.25.
+
+    :return: Lines of text and names of regressed cases.
+    :rtype: tuple
+    """
+    lines, regressions = list(), list()
+    for name in sorted(results):
+        if name not in baseline:
+            lines.append('{:<48} {:>12.1f}/s  (not in baseline)'.format(name, results[name]))
+            continue
+        change = results[name] / baseline[name] - 1
+        regressed = change < -threshold
+        if regressed:
+            regressions.append(name)
+        lines.append('{:<48} {:>12.1f}/s {:>+8.1%}{}'.format(name, results[name], change, '  REGRESSION' * regressed))
+    return lines, regressions
+
+
+@click.command()
+@click.option('-b', '--baseline', type=click.Path(dir_okay=False),
+              help='Baseline JSON file to compare with or save to (e.g. /tmp/baseline.json).')
+@click.option('-c', '--compare', 'compare_', is_flag=True, help='Compare with the baseline, exit 1 on regressions.')
+@click.option('-k', '--keyword', help='Only run cases matching this regex, e.g. vpathto.')
+@click.option('-m', '--max-size', default=max(REMOTES), type=click.IntRange(1),
+              help='Skip cases with more remotes/pages than this. Default {}.'.format(max(REMOTES)))
+@click.option('-r', '--repeat', default=3, type=click.IntRange(1), help='Measurements per case. Default 3.')
+@click.option('-s', '--save', is_flag=True, help='Save results as the new baseline.')
+@click.option('-t', '--min-time', default=0.2, type=float, help='Minimum seconds per measurement. Default 0.2.')
+@click.option('--threshold', default=0.25, type=float,
+              help='Allowed loss of throughput before failing with --compare. Default 0.25 (25%).')
+def main(baseline, compare_, keyword, max_size, repeat, save, min_time, threshold):
+    """Benchmark versions.py: sorting, version lookups, and links to other versions.
+    \f
+
+    :param str baseline: Baseline JSON file.
+    :param bool compare_: Compare with the baseline.
+    :param str keyword: Only run cases matching this regex.
+    :param int max_size: Skip cases with more remotes/pages than this.
+    :param int repeat: Measurements per case.
+    :param bool save: Save results as the new baseline.
+    :param float min_time: Minimum seconds per measurement.
+    :param float threshold: Allowed loss of throughput before failing with --compare.
+    """
+    if (compare_ or save) and not baseline:
+        raise click.UsageError('--baseline is required with --compare and --save.')
+    results = dict()
+    for name, func in cases(max_size):
+        if keyword and not re.search(keyword, name):
+            continue
+        results[name] = round(measure(func, min_time, repeat), 1)
+        if not compare_:
+            click.echo('{:<48} {:>12.1f}/s'.format(name, results[name]))
+
+    environment = dict(platform=platform.platform(), python=platform.python_version())
+    if compare_:
+        with open(baseline) as handle:
+            stored = json.load(handle)
+        if stored['environment'] != environment:
+            click.echo('Warning: baseline is from a different environment: {}'.format(stored['environment']), err=True)
+        lines, regressions = compare(stored['results'], results, threshold)
+        for line in lines:
+            click.echo(line)
+        if regressions:
+            click.echo('{} cases regressed by more than {:.0%}.'.format(len(regressions), threshold), err=True)
+            raise SystemExit(1)
+    if save:
+        if keyword and os.path.isfile(baseline):  # Only replace the cases that ran.
+            with open(baseline) as handle:
+                results = dict(json.load(handle)['results'], **results)
+        with open(baseline, 'w') as handle:
+            json.dump(dict(environment=environment, results=results), handle, indent=2, sort_keys=True)
+            handle.write('\n')
+        click.echo('Wrote baseline to: {}'.format(baseline), err=True)
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
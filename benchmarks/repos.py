@@ -0,0 +1,171 @@
+"""Generate git repositories with Sphinx docs on many branches and tags, like the fixtures in tests/conftest.py.
+
+Commits are written with a single "git fast-import" process so generating thousands of refs takes seconds. Dates and
+contents are derived from the parameters only, so the same parameters always generate the same commits (same SHAs).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+
+from sphinxcontrib.versioning.git import run_command
+
+AUTHOR = 'Benchmark <benchmark@localhost>'
+PARAMS_FILE = 'params.json'  # In the scenario directory, to reuse repositories generated with the same parameters.
+ROOT_TS = 1480907825  # December 05 2016 03:17:05 UTC, like tests/conftest.py.
+
+
+def run(directory, command, *args, **kwargs):
+    """Run command using run_command() function. Supports string and py.path paths.
+
+    :param directory: Root git directory and current working directory.
+    :param iter command: Command to run.
+    :param iter args: Passed to run_command().
+    :param dict kwargs: Passed to run_command().
+
+    :return: run_command() output.
+    :rtype: str
+    """
+    return run_command(str(directory), [str(i) for i in command], *args, **kwargs)
+
+
+def page_tree(pages, depth):
+    """Distribute pages across nested directories, each level's index linking to its pages and the next level.
+
+    :param int pages: Number of pages besides the index pages.
+    :param int depth: Number of nested directory levels below docs. 0 for all pages in docs.
+
+    :return: Document names (keys, e.g. level1/page_3) and the document names they link to in a toctree (values).
+    :rtype: dict
+    """
+    levels = [['level{}'.format(i) for i in range(1, d + 1)] for d in range(depth + 1)]
+    prefixes = ['/'.join(parts + ['']) for parts in levels]
+    tree = {p + 'index': list() for p in prefixes}
+    for number in range(pages):
+        prefix = prefixes[number % len(prefixes)]
+        tree[prefix + 'index'].append('page_{}'.format(number))
+        tree[prefix + 'page_{}'.format(number)] = list()
+    for level, prefix in enumerate(prefixes[:-1]):
+        tree[prefix + 'index'].append('{}/index'.format(levels[level + 1][-1]))
+    return tree
+
+
+def page(name, children, version, paragraphs):
+    """Get the reStructuredText of one page.
+
+    :param str name: Document name.
+    :param list children: Document names relative to this page's directory, for the toctree.
+    :param int version: Number of the commit, changes the text.
+    :param int paragraphs: Paragraphs of text on the page.
+
+    :return: File contents.
+    :rtype: str
+    """
+    title = '{} (version {})'.format(name, version)
+    lines = [title, '=' * len(title), '']
+    for number in range(paragraphs):
+        lines.extend(['Paragraph {} of {} with a link back to :doc:`/index`. '.format(number, name) * 4, ''])
+    if children:
+        lines.extend(['.. toctree::', ''] + ['    {}'.format(c) for c in children] + [''])
+    return '\n'.join(lines)
+
+
+def fast_import_stream(params):
+    """Generate the input of "git fast-import" for one repository.
+
+    The first commit on master has all files. Every other branch and tag gets its own commit on top of the previous one,
+    changing the index page and one other page, so every ref has different docs and history gets deeper with more refs.
+
+    :param dict params: Scenario parameters: branches (including master), tags, pages, depth, paragraphs, size_kb.
+
+    :return: Stream contents.
+    :rtype: bytes
+    """
+    chunks, mark = list(), [0]
+    tree = page_tree(params['pages'], params['depth'])
+    documents = sorted(tree)
+
+    def blob(data):
+        """Add a blob to the stream.
+
+        :param bytes data: File contents.
+
+        :return: Mark of the blob.
+        :rtype: int
+        """
+        mark[0] += 1
+        chunks.append('blob\nmark :{}\ndata {}\n'.format(mark[0], len(data)).encode('ascii') + data + b'\n')
+        return mark[0]
+
+    def rst(name, version):
+        """Add a page to the stream.
+
+        :param str name: Document name.
+        :param int version: Number of the commit.
+
+        :return: Path and mark of the blob.
+        :rtype: tuple
+        """
+        data = page(name, tree[name], version, params['paragraphs']).encode('utf-8')
+        return 'docs/{}.rst'.format(name), blob(data)
+
+    # Files in the first commit.
+    files = [('docs/conf.py', blob(b'master_doc = "index"\nexclude_patterns = ["_build"]\n'))]
+    files.extend(rst(d, 0) for d in documents)
+    for number in range(-(-params['size_kb'] // 1024)):  # Incompressible files of up to 1 MiB each.
+        size = min(1024, params['size_kb'] - number * 1024) * 16  # 64 byte hashes per KiB.
+        data = b''.join(hashlib.sha512('{}-{}'.format(number, i).encode('ascii')).digest() for i in range(size))
+        files.append(('assets/blob_{}.bin'.format(number), blob(data)))
+
+    # One commit per ref.
+    refs = ['refs/heads/master'] + ['refs/heads/branch_{:04d}'.format(i) for i in range(1, params['branches'])]
+    refs += ['refs/tags/v{}.{}.0'.format(i // 100 + 1, i % 100) for i in range(params['tags'])]
+    parent = None
+    for version, ref in enumerate(refs):
+        if version:
+            files = [rst('index', version), rst(documents[version % len(documents)], version)]
+        message = 'Version {}\n'.format(version).encode('ascii')
+        mark[0] += 1
+        lines = ['commit {}'.format(ref), 'mark :{}'.format(mark[0]),
+                 'committer {} {} +0000'.format(AUTHOR, ROOT_TS + version * 60), 'data {}'.format(len(message))]
+        chunks.append('\n'.join(lines).encode('ascii') + b'\n' + message)
+        if parent:
+            chunks.append('from :{}\n'.format(parent).encode('ascii'))
+        chunks.append(''.join('M 100644 :{} {}\n'.format(m, p) for p, m in files).encode('ascii') + b'\n')
+        parent = mark[0]
+    return b''.join(chunks)
+
+
+def generate(directory, params):
+    """Generate a bare "origin" repository and a clone of it, unless already generated with the same parameters.
+
+    :param str directory: Scenario directory. Contains origin.git and local after this.
+    :param dict params: Scenario parameters, see fast_import_stream().
+
+    :return: Path to the local clone.
+    :rtype: str
+    """
+    origin, local = os.path.join(directory, 'origin.git'), os.path.join(directory, 'local')
+    params_file = os.path.join(directory, PARAMS_FILE)
+    if os.path.isfile(params_file) and os.path.isdir(local):
+        with open(params_file) as handle:
+            if json.load(handle) == params:
+                return local
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(origin)
+
+    run(origin, ['git', 'init', '--bare'], env_var=False)
+    importer = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd=origin, stdin=subprocess.PIPE)
+    importer.communicate(fast_import_stream(params))
+    if importer.returncode != 0:
+        raise subprocess.CalledProcessError(importer.returncode, ['git', 'fast-import'])
+    run(directory, ['git', 'clone', '--quiet', origin, local], env_var=False)
+    run(local, ['git', 'config', 'user.email', 'benchmark@localhost'])
+    run(local, ['git', 'config', 'user.name', 'Benchmark'])
+
+    with open(params_file, 'w') as handle:
+        json.dump(params, handle, sort_keys=True)
+    return local
@@ -0,0 +1,28 @@
+"""Benchmark scenarios: parameters of generated repositories and how to build them."""
+
+DEFAULTS = dict(branches=1, depth=1, pages=10, paragraphs=5, size_kb=0, tags=0)
+
+# Names (keys) and parameters (values) overriding DEFAULTS. See repos.fast_import_stream() for parameters.
+SCENARIOS = dict(
+    refs_10=dict(branches=5, tags=5),
+    refs_100=dict(branches=50, tags=50),
+    refs_1000=dict(branches=500, tags=500, pages=2, paragraphs=1),
+    deep_tree=dict(branches=3, tags=2, pages=300, depth=10),
+    large_repo=dict(branches=5, tags=5, size_kb=50 * 1024),
+)
+QUICK = ('refs_10', 'deep_tree')  # Default scenarios, a few minutes in total.
+
+
+def params(name):
+    """Get all parameters of a scenario.
+
+    :raise KeyError: Unknown scenario.
+
+    :param str name: Scenario name.
+
+    :return: Parameters.
+    :rtype: dict
+    """
+    merged = dict(DEFAULTS)
+    merged.update(SCENARIOS[name])
+    return merged
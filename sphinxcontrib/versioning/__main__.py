@@ -1,5 +1,6 @@
 """Entry point of project via setuptools which calls cli()."""
 
+import functools
 import logging
 import os
 import shutil
@@ -7,12 +8,17 @@ import time
 
 import click
 
-from sphinxcontrib.versioning import __version__
+from sphinxcontrib.versioning import __version__, timings, tracing
+from sphinxcontrib.versioning.daemon import Daemon
 from sphinxcontrib.versioning.git import clone, commit_and_push, get_root, GitError
 from sphinxcontrib.versioning.lib import Config, HandledError, TempDir
+from sphinxcontrib.versioning.profiles import merge as merge_profiles
 from sphinxcontrib.versioning.routines import build_all, gather_git_info, pre_build, read_local_conf
 from sphinxcontrib.versioning.setup_logging import setup_logging
-from sphinxcontrib.versioning.versions import multi_sort, Versions
+from sphinxcontrib.versioning.shards import assign_shards, merge as merge_shards, parse_shard, write_manifest
+from sphinxcontrib.versioning.state import BuildState
+from sphinxcontrib.versioning.versions import multi_sort, version_sort_kind, Versions
+from sphinxcontrib.versioning.workers import START_METHODS
 
 IS_EXISTS_DIR = click.Path(exists=True, file_okay=False, dir_okay=True)
 IS_EXISTS_FILE = click.Path(exists=True, file_okay=True, dir_okay=False)
@@ -121,8 +127,10 @@ class ClickCommand(click.Command):
 def cli(config, **options):
     """Build versioned Sphinx docs for every branch and tag pushed to origin.
 
-    Supports only building locally with the "build" sub command or build and push to a remote with the "push" sub
-    command. For more information for either run them with their own --help.
+    Supports only building locally with the "build" sub command, build and push to a remote with the "push" sub
+    command, or build locally and keep rebuilding changed versions with the "watch" sub command. Output of builds split
+    with "build --shard" is combined with the "merge" sub command. For more information for any of them run them with
+    their own --help.
 
     The options below are global and must be specified before the sub command name (e.g. -N build ...).
     \f
@@ -130,12 +138,13 @@ def cli(config, **options):
     :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
     :param dict options: Additional Click options.
     """
-    def pre(rel_source):
+    def pre(rel_source, git=True):
         """To be executed in a Click sub command.
 
         Needed because if this code is in cli() it will be executed when the user runs: <command> <sub command> --help
 
         :param tuple rel_source: Possible relative paths (to git root) of Sphinx directory containing conf.py.
+        :param bool git: Sub command works with the git repo. If False only setup logging and the working directory.
         """
         # Setup logging.
         if not NO_EXECUTE:
@@ -148,6 +157,8 @@ def cli(config, **options):
             log.debug('Working directory: %s', os.getcwd())
         else:
             config.update(dict(chdir=os.getcwd()), overwrite=True)
+        if not git:
+            return
 
         # Get and verify git root.
         try:
@@ -188,17 +199,44 @@ def build_options(func):
     func = click.option('-b', '--show-banner', help='Show a warning banner.', is_flag=True)(func)
     func = click.option('-B', '--banner-main-ref',
                         help="Don't show banner on this ref and point banner URLs to this ref. Default master.")(func)
+    func = click.option('--build-jobs', type=click.IntRange(1),
+                        help='Number of versions to build at the same time. Default 1.')(func)
+    func = click.option('--build-timeout', type=click.IntRange(1),
+                        help='Fail versions taking longer than this many seconds to build. Default no limit.')(func)
+    func = click.option('--doctree-cache-dir', type=click.Path(file_okay=False),
+                        help='Keep sources and doctrees of versions here for incremental builds in later runs.')(func)
+    func = click.option('--git-budget', multiple=True,
+                        help='Warn when a phase runs more git commands than this, e.g. export=20. Repeatable.')(func)
+    func = click.option('--git-trace2-perf', type=click.Path(dir_okay=False),
+                        help='Set GIT_TRACE2_PERF for all git commands to write performance traces to this file.')(func)
+    func = click.option('--history-file', type=click.Path(dir_okay=False),
+                        help='JSON file with build durations of previous builds. Default is in the .git dir '
+                             'with --build-jobs > 1.')(func)
     func = click.option('-i', '--invert', help='Invert/reverse order of versions.', is_flag=True)(func)
+    func = click.option('--jinja-cache-dir', type=click.Path(file_okay=False),
+                        help='Cache compiled Jinja2 templates here, shared by all versions and later runs.')(func)
+    func = click.option('--memory-limit', type=click.IntRange(1),
+                        help='Memory limit of sphinx-build child processes in MiB. Default no limit.')(func)
+    func = click.option('--metrics-file', type=click.Path(dir_okay=False),
+                        help='Write Prometheus metrics of the run to this file (node_exporter textfile).')(func)
     func = click.option('-p', '--priority', type=click.Choice(('branches', 'tags')),
                         help="Group these kinds of versions at the top (for themes that don't separate them).")(func)
+    func = click.option('--profile-dir', type=click.Path(file_okay=False),
+                        help='Profile sphinx-build child processes with cProfile, write .prof files here.')(func)
     func = click.option('-r', '--root-ref',
                         help='The branch/tag at the root of DESTINATION. Will also be in subdir. Default master.')(func)
-    func = click.option('-s', '--sort', multiple=True, type=click.Choice(('semver', 'alpha', 'time')),
+    func = click.option('--start-method', type=click.Choice(START_METHODS),
+                        help='How to start sphinx-build child processes. Default is the platform default.')(func)
+    func = click.option('--worker-builds', type=click.IntRange(1),
+                        help='Versions each sphinx-build child process builds before exiting. Default 1.')(func)
+    func = click.option('-s', '--sort', multiple=True, type=click.Choice(('semver', 'pep440', 'alpha', 'time')),
                         help='Sort versions. Specify multiple times to sort equal values of one kind.')(func)
     func = click.option('-t', '--greatest-tag', is_flag=True,
                         help='Override root-ref to be the tag with the highest version number.')(func)
     func = click.option('-T', '--recent-tag', is_flag=True,
                         help='Override root-ref to be the most recent committed tag.')(func)
+    func = click.option('--timings', type=click.Path(dir_okay=False),
+                        help='Write wall/CPU time and peak memory of every phase and version to this JSON file.')(func)
     func = click.option('-w', '--whitelist-branches', multiple=True,
                         help='Whitelist branches that match the pattern. Can be specified more than once.')(func)
     func = click.option('-W', '--whitelist-tags', multiple=True,
@@ -207,11 +245,46 @@ def build_options(func):
     return func
 
 
+def record_timings(config):
+    """Start recording timings if requested and not already recording (e.g. by push invoking build).
+
+    The JSON report and/or metrics are written and the summary logged when the current sub command exits, even if it
+    fails.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    """
+    if (config.timings or config.metrics_file) and timings.start():
+        click.get_current_context().call_on_close(functools.partial(timings.finish, config.timings,
+                                                                    config.metrics_file))
+
+
+def trace_git(config):
+    """Trace git commands if budgets or GIT_TRACE2_PERF are requested and not already tracing (e.g. by push).
+
+    The summary is logged when the current sub command exits, even if it fails.
+
+    :raise HandledError: If a budget is invalid.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    """
+    log = logging.getLogger(__name__)
+    if not config.git_budget and not config.git_trace2_perf:
+        return
+    try:
+        budgets = tracing.parse_budgets(config.git_budget)
+    except ValueError as exc:
+        log.error(str(exc))
+        raise HandledError
+    tracer = tracing.start(budgets, config.git_trace2_perf)
+    if tracer:
+        click.get_current_context().call_on_close(functools.partial(tracing.finish, tracer))
+
+
 def override_root_main_ref(config, remotes, banner):
     """Override root_ref or banner_main_ref with tags in config if user requested.
 
     :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
-    :param iter remotes: List of dicts from Versions.remotes.
+    :param iter remotes: List of Remotes from Versions.remotes.
     :param bool banner: Evaluate banner main ref instead of root ref.
 
     :return: If root/main ref exists.
@@ -224,7 +297,7 @@ def override_root_main_ref(config, remotes, banner):
     if greatest_tag or recent_tag:
         candidates = [r for r in remotes if r['kind'] == 'tags']
         if candidates:
-            multi_sort(candidates, ['semver' if greatest_tag else 'time'])
+            multi_sort(candidates, [version_sort_kind(config.sort) if greatest_tag else 'time'])
             config.update({'banner_main_ref' if banner else 'root_ref': candidates[0]['name']}, overwrite=True)
         else:
             flag = '--banner-main-ref' if banner else '--root-ref'
@@ -236,6 +309,11 @@ def override_root_main_ref(config, remotes, banner):
 
 @cli.command(cls=ClickCommand)
 @build_options
+@click.option('--resume', help='Skip versions already built by an interrupted build. Requires --state-dir.',
+              is_flag=True)
+@click.option('--shard', help='Build only part of the versions (e.g. 2/4 for the second of four parts).')
+@click.option('--state-dir', type=click.Path(file_okay=False),
+              help='Keep exported commits and record finished builds in this directory.')
 @click.argument('REL_SOURCE', nargs=-1, required=True)
 @click.argument('DESTINATION', type=click.Path(file_okay=False, dir_okay=True))
 @click.make_pass_decorator(Config)
@@ -245,6 +323,11 @@ def build(config, rel_source, destination, **options):
     Doesn't push anything to remote. Just fetch all remote branches and tags, export them to a temporary directory, run
     sphinx-build on each one, and then store all built documentation in DESTINATION.
 
+    With --shard I/N only every Nth part of the versions is built (the first part includes the root ref), e.g. on N
+    different machines. Combine their DESTINATIONs with the merge sub command.
+
+    With --state-dir an interrupted build can be continued with --resume, skipping versions that were already built.
+
     REL_SOURCE is the path to the docs directory relative to the git root. If the source directory has moved around
     between git tags you can specify additional directories.
 
@@ -267,6 +350,20 @@ def build(config, rel_source, destination, **options):
     if NO_EXECUTE:
         raise RuntimeError(config, rel_source, destination)
     log = logging.getLogger(__name__)
+    if config.shard:
+        try:
+            shard, shards = parse_shard(config.shard)
+        except ValueError as exc:
+            log.error(str(exc))
+            raise HandledError
+    if config.resume and not config.state_dir:
+        log.error('--resume requires --state-dir.')
+        raise HandledError
+    record_timings(config)
+    trace_git(config)
+    if config.profile_dir:
+        click.get_current_context().call_on_close(functools.partial(merge_profiles, config.profile_dir))
+    state = BuildState(config.state_dir) if config.state_dir else None
 
     # Gather git data.
     log.info('Gathering info about the remote git repository...')
@@ -301,25 +398,82 @@ def build(config, rel_source, destination, **options):
 
     # Pre-build.
     log.info("Pre-running Sphinx to collect versions' master_doc and other info.")
-    exported_root = pre_build(config.git_root, versions)
+    exported_root = pre_build(config.git_root, versions, state)
     if config.banner_main_ref and config.banner_main_ref not in [r['name'] for r in versions.remotes]:
         log.warning('Banner main ref %s failed during pre-run. Disabling banner.', config.banner_main_ref)
         config.update(dict(banner_greatest_tag=False, banner_main_ref=None, banner_recent_tag=False, show_banner=False),
                       overwrite=True)
 
     # Build.
-    build_all(exported_root, destination, versions)
+    if config.shard:
+        names = assign_shards(versions, config.root_ref, shards)[shard - 1]
+        log.info('Building shard %d/%d: %s', shard, shards, ' '.join(names) or '(nothing)')
+        with timings.phase('build'):
+            build_all(exported_root, destination, versions, state=state)
+        write_manifest(destination, versions, config.root_ref, shard, shards, names)
+    else:
+        with timings.phase('build'):
+            build_all(exported_root, destination, versions, config.pop('checkpoint', None), state=state)
+    timings.record_size('output', destination)
 
     # Cleanup.
-    log.debug('Removing: %s', exported_root)
-    shutil.rmtree(exported_root)
+    if state:
+        state.cleanup()
+    else:
+        log.debug('Removing: %s', exported_root)
+        shutil.rmtree(exported_root)
 
     # Store versions in state for push().
     config['versions'] = versions
 
 
+@cli.command(cls=ClickCommand)
+@click.argument('SHARD_DIR', nargs=-1, required=True, type=IS_EXISTS_DIR)
+@click.argument('DESTINATION', type=click.Path(file_okay=False, dir_okay=True))
+@click.make_pass_decorator(Config)
+def merge(config, shard_dir, destination):
+    """Combine the output of all "build --shard" runs.
+
+    Verifies all shards of one build are present and agree on versions and their directories, then copies them into
+    DESTINATION. The result is the same as running the build sub command once.
+
+    SHARD_DIR is the DESTINATION of one shard. Specify all of them.
+
+    DESTINATION is the path to the local directory that will hold all generated docs for all versions.
+    \f
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param tuple shard_dir: DESTINATION directories of all shards.
+    :param str destination: Destination directory to copy/overwrite built docs to. Does not delete old files.
+    """
+    if 'pre' in config:
+        config.pop('pre')(tuple(), git=False)
+    if NO_EXECUTE:
+        raise RuntimeError(config, shard_dir, destination)
+    merge_shards(shard_dir, destination)
+
+
+def early_push(local_root, remote, versions):
+    """Commit and push the versions built so far. Failures are only logged since the final push follows anyway.
+
+    :param str local_root: Local path to git root directory.
+    :param str remote: The git remote to push to.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    """
+    log = logging.getLogger(__name__)
+    log.info('Attempting to push the most important versions early.')
+    try:
+        if not commit_and_push(local_root, remote, versions, partial=True):
+            log.warning('Failed to push early, remote repository changed.')
+    except GitError as exc:
+        log.warning(exc.message)
+        log.debug(exc.output)
+
+
 @cli.command(cls=ClickCommand)
 @build_options
+@click.option('--early-push', is_flag=True,
+              help='Push once the root, banner main, and most recent versions are built, before building the rest.')
 @click.option('-e', '--grm-exclude', multiple=True,
               help='If specified "git rm" will delete all files in REL_DEST except for these. Specify multiple times '
                    'for more. Paths are relative to REL_DEST in DEST_BRANCH.')
@@ -340,6 +494,7 @@ def push(ctx, config, rel_source, dest_branch, rel_dest, **options):
 
     DEST_BRANCH is the branch name where generated docs will be committed to. The branch will then be pushed to remote.
     If there is a race condition with another job pushing to remote the docs will be re-generated and pushed again.
+    With --early-push the most important versions are pushed in an extra commit before the rest are built.
 
     REL_DEST is the path to the directory that will hold all generated docs for all versions relative to the git roof of
     DEST_BRANCH.
@@ -363,25 +518,35 @@ def push(ctx, config, rel_source, dest_branch, rel_dest, **options):
     if NO_EXECUTE:
         raise RuntimeError(config, rel_source, dest_branch, rel_dest)
     log = logging.getLogger(__name__)
+    if config.shard:
+        log.error('Sharding is only supported by the build sub command.')
+        raise HandledError
+    record_timings(config)
+    trace_git(config)
 
     # Clone, build, push.
     for _ in range(PUSH_RETRIES):
         with TempDir() as temp_dir:
             log.info('Cloning %s into temporary directory...', dest_branch)
             try:
-                clone(config.git_root, temp_dir, config.push_remote, dest_branch, rel_dest, config.grm_exclude)
+                with timings.phase('clone'):
+                    clone(config.git_root, temp_dir, config.push_remote, dest_branch, rel_dest, config.grm_exclude)
             except GitError as exc:
                 log.error(exc.message)
                 log.error(exc.output)
                 raise HandledError
 
+            if config.early_push:
+                config['checkpoint'] = functools.partial(early_push, temp_dir, config.push_remote)
             log.info('Building docs...')
             ctx.invoke(build, rel_source=rel_source, destination=os.path.join(temp_dir, rel_dest))
             versions = config.pop('versions')
 
             log.info('Attempting to push to branch %s on remote repository.', dest_branch)
             try:
-                if commit_and_push(temp_dir, config.push_remote, versions):
+                with timings.phase('push'):
+                    pushed = commit_and_push(temp_dir, config.push_remote, versions)
+                if pushed:
                     return
             except GitError as exc:
                 log.error(exc.message)
@@ -393,3 +558,64 @@ def push(ctx, config, rel_source, dest_branch, rel_dest, **options):
     # Failed if this is reached.
     log.error('Ran out of retries, giving up.')
     raise HandledError
+
+
+@cli.command(cls=ClickCommand)
+@build_options
+@click.option('-I', '--poll-interval', type=click.IntRange(1),
+              help='Seconds to wait between checking the remote for changes. Default 600.')
+@click.option('--webhook-port', type=click.IntRange(0, 65535),
+              help='Listen on this localhost port for ref change notifications and status queries.')
+@click.argument('REL_SOURCE', nargs=-1, required=True)
+@click.argument('DESTINATION', type=click.Path(file_okay=False, dir_okay=True))
+@click.make_pass_decorator(Config)
+@click.pass_context
+def watch(ctx, config, rel_source, destination, **options):
+    """Build locally and keep rebuilding branches/tags as they change.
+
+    Runs until interrupted. First builds everything just like the build sub command. Then periodically checks the remote
+    repository for changed branches/tags and rebuilds only those. If branches/tags are added or removed, or anything in
+    the versions menus changes, all versions are rebuilt.
+
+    With --webhook-port a local HTTP endpoint accepts notifications (POST {"ref": "master", "sha": "..."}) which rebuild
+    that branch/tag right away instead of on the next poll. GET /status reports build status and queue depth.
+
+    REL_SOURCE is the path to the docs directory relative to the git root. If the source directory has moved around
+    between git tags you can specify additional directories.
+
+    DESTINATION is the path to the local directory that will hold all generated docs for all versions.
+
+    To pass options to sphinx-build (run for every branch/tag) use a double hyphen
+    (e.g. watch docs docs/_build/html -- -D setting=value).
+    \f
+
+    :param click.core.Context ctx: Click context.
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param tuple rel_source: Possible relative paths (to git root) of Sphinx directory containing conf.py (e.g. docs).
+    :param str destination: Destination directory to copy/overwrite built docs to. Does not delete old files.
+    :param dict options: Additional Click options.
+    """
+    if 'pre' in config:
+        config.pop('pre')(rel_source)
+        config.update({k: v for k, v in options.items() if v})
+        if config.local_conf:
+            config.update(read_local_conf(config.local_conf), ignore_set=True)
+    if NO_EXECUTE:
+        raise RuntimeError(config, rel_source, destination)
+    if config.shard:
+        logging.getLogger(__name__).error('Sharding is only supported by the build sub command.')
+        raise HandledError
+
+    def full_build():
+        """Invoke the build sub command.
+
+        :return: Versions class instance.
+        :rtype: sphinxcontrib.versioning.versions.Versions
+        """
+        ctx.invoke(build, rel_source=rel_source, destination=destination)
+        return config.pop('versions')
+
+    watcher = Daemon(full_build, rel_source, destination)
+    if config.webhook_port is not None:
+        watcher.serve(config.webhook_port)
+    watcher.run(config.poll_interval)
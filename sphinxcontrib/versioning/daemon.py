@@ -0,0 +1,371 @@
+"""Keep built docs up to date by rebuilding only branches/tags that changed in the remote repository."""
+
+import json
+import logging
+import os
+import threading
+import time
+from subprocess import CalledProcessError
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # Python 2.x.
+
+from sphinxcontrib.versioning.git import export, GitError, list_remote, tree_hashes
+from sphinxcontrib.versioning.lib import Config, HandledError, TempDir
+from sphinxcontrib.versioning.routines import gather_git_info
+from sphinxcontrib.versioning.sphinx_ import build, read_config
+from sphinxcontrib.versioning.versions import Versions
+
+COALESCE_DELAY = 2  # Seconds to wait for more notifications after the first one before rebuilding.
+
+
+def menu_signature(versions):
+    """Collect everything from versions that ends up in the versions menu or banner of every page.
+
+    If this changes between two Versions class instances all pages of all versions need to be rebuilt.
+
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+
+    :return: Hashable signature.
+    :rtype: tuple
+    """
+    remotes = tuple((r['id'], r['root_dir'], r['master_doc'], r['found_docs']) for r in versions.remotes)
+    special = (
+        versions.greatest_tag_remote,
+        versions.recent_branch_remote,
+        versions.recent_remote,
+        versions.recent_tag_remote,
+    )
+    return remotes, tuple(r and r['id'] for r in special)
+
+
+def parse_ref(ref):
+    """Get the branch/tag name from a git ref.
+
+    :param str ref: Branch/tag name, optionally prefixed with "heads/", "tags/", "refs/heads/" or "refs/tags/".
+
+    :return: Branch/tag name.
+    :rtype: str
+    """
+    for prefix in ('refs/heads/', 'refs/tags/', 'heads/', 'tags/'):
+        if ref.startswith(prefix):
+            return ref[len(prefix):]
+    return ref
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Handle HTTP requests to the daemon's local webhook endpoint.
+
+    POST any path with a JSON body such as {"ref": "master", "sha": "<new sha>"} to queue a ref for rebuilding. GitHub
+    style {"ref": "refs/heads/master", "after": "<new sha>"} bodies work too. GET /status for the build status.
+    """
+
+    def respond(self, code, payload):
+        """Send a JSON response.
+
+        :param int code: HTTP status code.
+        :param dict payload: JSON serializable response body.
+        """
+        body = json.dumps(payload, sort_keys=True).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):  # noqa pylint: disable=invalid-name
+        """Report status."""
+        if self.path.rstrip('/') not in ('', '/status'):
+            self.respond(404, dict(error='Not found.'))
+            return
+        self.respond(200, self.server.scv_daemon.get_status())
+
+    def do_POST(self):  # noqa pylint: disable=invalid-name
+        """Queue a ref for rebuilding."""
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode('utf-8'))
+            ref, sha = payload['ref'], payload.get('sha', payload.get('after'))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            self.respond(400, dict(error='Expected JSON object with "ref" and optional "sha".'))
+            return
+        self.server.scv_daemon.notify(ref, sha)
+        self.respond(202, self.server.scv_daemon.get_status())
+
+    def log_message(self, fmt, *args):
+        """Log requests to the debug log instead of stderr.
+
+        :param str fmt: Message format.
+        :param iter args: Message format arguments.
+        """
+        logging.getLogger(__name__).debug('Webhook %s: ' + fmt, self.address_string(), *args)
+
+
+class Daemon(object):
+    """Hold the state of the last build in memory and rebuild versions when the remote repository changes.
+
+    :ivar iter conf_rel_paths: List of possible relative paths (to git root) of Sphinx conf.py (e.g. docs/conf.py).
+    :ivar str destination: Destination directory of the built docs.
+    :ivar function full_build: Builds all versions into destination. Returns the Versions class instance.
+    :ivar threading.Lock lock: Guards pending and status, which are used by the webhook thread.
+    :ivar dict pending: Branch/tag names (keys) and SHAs (values) notified through the webhook, not yet rebuilt.
+    :ivar dict refs: Latest SHA of each remote branch/tag ("kind/name" keys) as of the last build.
+    :ivar dict status: Build state, currently building versions and counters. Reported by the webhook.
+    :ivar dict trees: Git tree hash of each built version (name keys).
+    :ivar sphinxcontrib.versioning.versions.Versions versions: Versions class instance of the last build.
+    :ivar threading.Event wake: Set when refs are notified, wakes up run() before the poll interval elapses.
+    """
+
+    def __init__(self, full_build, rel_source, destination):
+        """Constructor.
+
+        :param function full_build: Builds all versions into destination. Returns the Versions class instance.
+        :param tuple rel_source: Possible relative paths (to git root) of Sphinx directory containing conf.py.
+        :param str destination: Destination directory of the built docs.
+        """
+        self.conf_rel_paths = [os.path.join(s, 'conf.py') for s in rel_source]
+        self.destination = destination
+        self.full_build = full_build
+        self.lock = threading.Lock()
+        self.pending = dict()
+        self.refs = dict()
+        self.status = dict(building=list(), builds=0, failures=0, last_build=None, state='idle')
+        self.trees = dict()
+        self.versions = None
+        self.wake = threading.Event()
+
+    def get_status(self):
+        """Return the build status and queue.
+
+        :return: JSON serializable status.
+        :rtype: dict
+        """
+        with self.lock:
+            status = dict(self.status, building=list(self.status['building']))
+            status['queue'] = sorted(self.pending)
+            status['queue_depth'] = len(self.pending)
+        return status
+
+    def count(self, key):
+        """Increment a counter in self.status.
+
+        :param str key: Counter to increment (e.g. "builds").
+        """
+        with self.lock:
+            self.status[key] += 1
+
+    def set_status(self, **kwargs):
+        """Update self.status.
+
+        :param dict kwargs: Keys and values to set.
+        """
+        with self.lock:
+            self.status.update(kwargs)
+
+    def notify(self, ref, sha=None):
+        """Queue a branch/tag for rebuilding. Notifications for the same ref before it's rebuilt are merged.
+
+        :param str ref: Branch/tag name (optionally prefixed with e.g. "refs/heads/").
+        :param str sha: The commit the ref moved to, if known. Informational, the remote is checked either way.
+        """
+        log = logging.getLogger(__name__)
+        name = parse_ref(ref)
+        log.info('Notified: %s moved to %s', name, sha or '(unknown)')
+        with self.lock:
+            self.pending[name] = sha
+        self.wake.set()
+
+    def serve(self, port, host='127.0.0.1'):
+        """Start the webhook HTTP server in a background thread.
+
+        :param int port: TCP port to listen on. 0 picks a free port.
+        :param str host: Address to listen on.
+
+        :return: The HTTP server, already serving.
+        :rtype: HTTPServer
+        """
+        log = logging.getLogger(__name__)
+        server = HTTPServer((host, port), WebhookHandler)
+        server.scv_daemon = self
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        log.info('Listening for webhook notifications on http://%s:%d/', *server.server_address[:2])
+        return server
+
+    def list_refs(self):
+        """Get the latest SHA of all remote branches and tags.
+
+        :return: SHAs with "kind/name" keys, or None if git failed.
+        :rtype: dict
+        """
+        log = logging.getLogger(__name__)
+        try:
+            remotes = list_remote(Config.from_context().git_root)
+        except GitError as exc:
+            log.warning(exc.message)
+            log.debug(exc.output)
+            return None
+        return {'/'.join((kind, name)): sha for sha, name, kind in remotes}
+
+    def rebuild_all(self):
+        """Build all versions from scratch.
+
+        :raise HandledError: If the build fails. The last build's refs and versions are kept so the next poll retries.
+        """
+        log = logging.getLogger(__name__)
+        log.info('Building all versions...')
+        refs = self.list_refs() or dict()
+        self.set_status(building=sorted(k.split('/', 1)[1] for k in refs), state='building')
+        try:
+            versions = self.full_build()
+        except HandledError:
+            self.count('failures')
+            raise
+        finally:
+            self.set_status(building=list(), last_build=time.time(), state='idle')
+        try:
+            trees = tree_hashes(Config.from_context().git_root, {r['sha'] for r in versions.remotes})
+        except CalledProcessError:
+            log.error('Failed to get git tree hashes.')
+            self.count('failures')
+            raise HandledError
+        self.count('builds')
+        self.refs, self.versions = refs, versions
+        self.trees = {r['name']: trees[r['sha']] for r in versions.remotes}
+
+    def try_rebuild_all(self):
+        """Call rebuild_all() and log failures instead of raising, so one broken commit doesn't stop the daemon.
+
+        :return: If the build succeeded.
+        :rtype: bool
+        """
+        log = logging.getLogger(__name__)
+        try:
+            self.rebuild_all()
+        except HandledError:
+            log.warning('Failed to build all versions. Will retry on the next poll.')
+            return False
+        return True
+
+    def poll(self, only=None):
+        """Check the remote repository for changes and rebuild versions if needed.
+
+        :param iter only: Only consider changes to these branch/tag names. Others are left for later polls.
+
+        :return: If anything was successfully rebuilt.
+        :rtype: bool
+        """
+        log = logging.getLogger(__name__)
+        refs = self.list_refs()
+        if refs is not None and only is not None:
+            view = {k: v for k, v in self.refs.items() if k.split('/', 1)[1] not in only}
+            view.update((k, v) for k, v in refs.items() if k.split('/', 1)[1] in only)
+            refs = view
+        if refs is None or refs == self.refs:
+            return False
+        moved = sorted(k for k in refs if k in self.refs and refs[k] != self.refs[k])
+        log.info('Remote branches/tags changed: %s', ' '.join(moved) or '(added or removed)')
+
+        if set(refs) != set(self.refs):
+            return self.try_rebuild_all()
+        try:
+            rebuilt = self.rebuild_changed(only)
+        except HandledError:
+            log.warning('Failed to rebuild changed versions only.')
+            self.set_status(building=list(), state='idle')
+            self.count('failures')
+            rebuilt = False
+        if rebuilt is False:
+            return self.try_rebuild_all()
+        self.refs = refs
+        return True
+
+    def rebuild_changed(self, only=None):
+        """Rebuild only versions whose files changed, if the versions menus on other pages are unaffected.
+
+        :raise HandledError: If git or sphinx-build fails.
+
+        :param iter only: Only consider changes to these branch/tag names. Others keep their last built commit.
+
+        :return: Names of rebuilt versions, or False if all versions must be rebuilt instead.
+        :rtype: list
+        """
+        log = logging.getLogger(__name__)
+        config = Config.from_context()
+        old = self.versions
+
+        # Get new SHAs/dates.
+        remotes = gather_git_info(config.git_root, self.conf_rel_paths, config.whitelist_branches,
+                                  config.whitelist_tags)
+        if sorted(r[1] for r in remotes) != sorted(r['name'] for r in old.remotes):
+            return False
+        if only is not None:
+            keys = ('sha', 'name', 'kind', 'date', 'conf_rel_path')
+            remotes = [r if r[1] in only else [old[r[1]][k] for k in keys] for r in remotes]
+        versions = Versions(remotes, sort=config.sort, priority=config.priority, invert=config.invert)
+        try:
+            trees = tree_hashes(config.git_root, {r['sha'] for r in versions.remotes})
+        except CalledProcessError:
+            log.error('Failed to get git tree hashes.')
+            raise HandledError
+        for remote in versions.remotes:
+            remote.update((k, old[remote['name']][k]) for k in ('found_docs', 'master_doc', 'root_dir'))
+        changed = [r for r in versions.remotes if trees[r['sha']] != self.trees.get(r['name'])]
+        log.info('Versions with changed files: %s', ' '.join(r['name'] for r in changed) or '(none)')
+
+        with TempDir() as exported_root:
+            # Read new configs.
+            for remote in changed:
+                try:
+                    export(config.git_root, remote['sha'], os.path.join(exported_root, remote['sha']))
+                except CalledProcessError:
+                    log.error('Failed to export commit %s of %s.', remote['sha'], remote['name'])
+                    raise HandledError
+                source = os.path.dirname(os.path.join(exported_root, remote['sha'], remote['conf_rel_path']))
+                new = read_config(source, remote['name'])
+                found_docs = tuple(sorted(new['found_docs']))
+                if (found_docs, new['master_doc']) != (remote['found_docs'], remote['master_doc']):
+                    log.info('Pages changed in %s.', remote['name'])
+                    return False
+            if menu_signature(versions) != menu_signature(old):
+                log.info('Versions menu changed.')
+                return False
+
+            # Build.
+            self.set_status(building=[r['name'] for r in changed], state='building')
+            for remote in changed:
+                source = os.path.dirname(os.path.join(exported_root, remote['sha'], remote['conf_rel_path']))
+                if remote['name'] == config.root_ref:
+                    log.info('Building root: %s', remote['name'])
+                    build(source, self.destination, versions, remote['name'], True)
+                log.info('Building ref: %s', remote['name'])
+                build(source, os.path.join(self.destination, remote['root_dir']), versions, remote['name'], False)
+
+        self.versions = versions
+        self.trees = {r['name']: trees[r['sha']] for r in versions.remotes}
+        self.set_status(building=list(), last_build=time.time(), state='idle')
+        self.count('builds')
+        return [r['name'] for r in changed]
+
+    def run(self, interval, iterations=None):
+        """Build everything and then poll the remote repository forever.
+
+        Refs notified through the webhook are rebuilt right away (after COALESCE_DELAY seconds to merge bursts of
+        notifications), other refs only on the regular poll.
+
+        :param int interval: Seconds to wait between polls.
+        :param int iterations: Stop after polling this many times. None to never stop.
+        """
+        self.try_rebuild_all()
+        polls = 0
+        while iterations is None or polls < iterations:
+            only = None
+            if self.wake.wait(interval):
+                time.sleep(COALESCE_DELAY)
+                with self.lock:
+                    only, self.pending = set(self.pending), dict()
+                    self.wake.clear()
+            self.poll(only)
+            polls += 1
@@ -1,6 +1,7 @@
 """Interface with git locally and remotely."""
 
 import glob
+import io
 import json
 import logging
 import os
@@ -11,11 +12,15 @@ import time
 from datetime import datetime
 from subprocess import CalledProcessError, PIPE, Popen, STDOUT
 
+from sphinxcontrib.versioning.timings import count_git
+
 IS_WINDOWS = sys.platform == 'win32'
+LAST_COMMITS_FILE = '.scv_last_commits.json'  # Written by export() in the target directory, read by sphinx_.py.
 RE_ALL_REMOTES = re.compile(r'([\w./-]+)\t([A-Za-z0-9@:/\\._-]+) \((fetch|push)\)\n')
 RE_REMOTE = re.compile(r'^(?P<sha>[0-9a-f]{5,40})\trefs/(?P<kind>heads|tags)/(?P<name>[\w./-]+(?:\^\{})?)$',
                        re.MULTILINE)
 RE_UNIX_TIME = re.compile(r'^\d{10}$', re.MULTILINE)
+TRACERS = list()  # Objects with environ() and trace(record) methods, see tracing.GitTracer. Called by run_command().
 WHITELIST_ENV_VARS = (
     'APPVEYOR',
     'APPVEYOR_ACCOUNT_NAME',
@@ -81,6 +86,30 @@ WHITELIST_ENV_VARS = (
 )
 
 
+class CountingReader(object):
+    """Wrap a file object and count bytes read from it."""
+
+    def __init__(self, stream):
+        """Constructor.
+
+        :param stream: File object to read from.
+        """
+        self.count = 0
+        self.stream = stream
+
+    def read(self, size=-1):
+        """Read from the wrapped file object.
+
+        :param int size: Max bytes to read. Negative to read everything.
+
+        :return: Data read.
+        :rtype: bytes
+        """
+        data = self.stream.read(size)
+        self.count += len(data)
+        return data
+
+
 class GitError(Exception):
     """Raised if git exits non-zero."""
 
@@ -121,7 +150,8 @@ def run_command(local_root, command, env_var=True, pipeto=None, retry=0, environ
     :param iter command: Command to run.
     :param dict environ: Environment variables to set/override in the command.
     :param bool env_var: Define GIT_DIR environment variable (on non-Windows).
-    :param function pipeto: Pipe `command`'s stdout to this function (only parameter given).
+    :param function pipeto: Pipe `command`'s stdout to this function (only parameter given). If it returns True it
+        stopped reading early, the command is terminated and that counts as success.
     :param int retry: Retry this many times on CalledProcessError after 0.1 seconds.
 
     :return: Command output.
@@ -131,6 +161,8 @@ def run_command(local_root, command, env_var=True, pipeto=None, retry=0, environ
 
     # Setup env.
     env = os.environ.copy()
+    for tracer in TRACERS:
+        env.update(tracer.environ())
     if environ:
         env.update(environ)
     if env_var and not IS_WINDOWS:
@@ -139,21 +171,38 @@ def run_command(local_root, command, env_var=True, pipeto=None, retry=0, environ
         env.pop('GIT_DIR', None)
 
     # Run command.
-    with open(os.devnull) as null:
-        main = Popen(command, cwd=local_root, env=env, stdout=PIPE, stderr=PIPE if pipeto else STDOUT, stdin=null)
-        if pipeto:
-            pipeto(main.stdout)
-            main_output = main.communicate()[1].decode('utf-8')  # Might deadlock if stderr is written to a lot.
-        else:
-            main_output = main.communicate()[0].decode('utf-8')
-    log.debug(json.dumps(dict(cwd=local_root, command=command, code=main.poll(), output=main_output)))
+    start, retries = time.time(), 0
+    while True:
+        count_git(command)
+        output_bytes = 0
+        with open(os.devnull) as null:
+            main = Popen(command, cwd=local_root, env=env, stdout=PIPE, stderr=PIPE if pipeto else STDOUT, stdin=null)
+            stopped = False
+            if pipeto:
+                stdout = CountingReader(main.stdout) if TRACERS else main.stdout
+                stopped = pipeto(stdout)
+                if stopped:
+                    main.terminate()
+                raw = main.communicate()[1]  # Might deadlock if stderr is written to a lot.
+                output_bytes = getattr(stdout, 'count', 0)
+            else:
+                raw = main.communicate()[0]
+        code = 0 if stopped else main.poll()
+        main_output = raw.decode('utf-8')
+        log.debug(json.dumps(dict(cwd=local_root, command=command, code=code, output=main_output)))
+        if code == 0 or retries >= retry:
+            break
+        retries += 1
+        time.sleep(0.1)
+
+    # Trace.
+    for tracer in TRACERS:
+        tracer.trace(dict(code=code, command=list(command), cwd=local_root, output_bytes=output_bytes + len(raw),
+                          retries=retries, seconds=round(time.time() - start, 6)))
 
     # Verify success.
-    if main.poll() != 0:
-        if retry < 1:
-            raise CalledProcessError(main.poll(), command, output=main_output)
-        time.sleep(0.1)
-        return run_command(local_root, command, env_var, pipeto, retry - 1)
+    if code != 0:
+        raise CalledProcessError(code, command, output=main_output)
 
     return main_output
 
@@ -249,6 +298,25 @@ def filter_and_date(local_root, conf_rel_paths, commits):
     return dates_paths
 
 
+def tree_hashes(local_root, commits):
+    """Get the git tree hash of commits. Commits with identical files have identical tree hashes.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param iter commits: List of commit SHAs. Or "SHA:path" strings for the tree of a subdirectory in that commit.
+
+    :return: Tree hash for each commit. SHA keys and str values.
+    :rtype: dict
+    """
+    commits = list(commits)
+    if not commits:
+        return dict()
+    revisions = [c if ':' in c else '{}^{{tree}}'.format(c) for c in commits]
+    output = run_command(local_root, ['git', 'rev-parse'] + revisions)
+    return dict(zip(commits, output.split()))
+
+
 def fetch_commits(local_root, remotes):
     """Fetch from origin.
 
@@ -270,16 +338,69 @@ def fetch_commits(local_root, remotes):
             run_command(local_root, ['git', 'reflog', sha])
 
 
+def last_commits(local_root, commit, paths):
+    """Get the Unix time of the last commit changing each file, with one "git log" instead of one per file.
+
+    git's output is parsed as it's streamed and git is stopped once all files are found. Files "git log --name-only"
+    doesn't list as-is (quoted paths, changes only in merge commits) fall back to one "git log" each.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param str commit: Git commit SHA to look at the history of.
+    :param iter paths: File paths relative to the git root.
+
+    :return: File paths (keys) and Unix times (values).
+    :rtype: dict
+    """
+    remaining = set(paths)
+    dates = dict()
+
+    def parse(stdout):
+        """Read "git log" output and record dates of files in remaining.
+
+        :param file stdout: Handle to git's stdout pipe.
+
+        :return: If it stopped reading before the end of the output.
+        :rtype: bool
+        """
+        last_committed, partial = None, b''  # Output ends with a newline, partial is always empty in the end.
+        for chunk in iter(lambda: stdout.read(io.DEFAULT_BUFFER_SIZE), b''):
+            lines = (partial + chunk).split(b'\n')
+            partial = lines.pop()
+            for line in (r.decode('utf-8') for r in lines):
+                if line.startswith('\x00'):
+                    last_committed = int(line[1:])
+                elif line in remaining:
+                    dates[line] = last_committed
+                    remaining.discard(line)
+            if not remaining:
+                return True
+        return False
+
+    if remaining:
+        command = ['git', 'log', '--format=%x00%at', '--name-only', '--no-renames', commit]
+        run_command(local_root, command, pipeto=parse)
+    for file_path in remaining:
+        dates[file_path] = int(run_command(local_root, ['git', 'log', '-n1', '--format=%at', commit, '--', file_path]))
+    return dates
+
+
 def export(local_root, commit, target):
     """Export git commit to directory. "Extracts" all files at the commit to the target directory.
 
-    Set mtime of RST files to last commit date.
+    Set mtime of RST files to last commit date. Also write these dates to LAST_COMMITS_FILE in the target directory
+    (JSON, paths relative to the git root as keys, only if there are RST files) for the extension to use instead of
+    reading mtimes.
 
     :raise CalledProcessError: Unhandled git command failure.
 
     :param str local_root: Local path to git root directory.
     :param str commit: Git commit SHA to export.
     :param str target: Directory to export to.
+
+    :return: RST file paths relative to the git root (keys) and Unix times of their last commit (values).
+    :rtype: dict
     """
     log = logging.getLogger(__name__)
     target = os.path.realpath(target)
@@ -317,9 +438,13 @@ def export(local_root, commit, target):
     run_command(local_root, ['git', 'archive', '--format=tar', commit], pipeto=extract)
 
     # Set mtime.
-    for file_path in mtimes:
-        last_committed = int(run_command(local_root, ['git', 'log', '-n1', '--format=%at', commit, '--', file_path]))
+    dates = last_commits(local_root, commit, mtimes)
+    for file_path, last_committed in dates.items():
         os.utime(os.path.join(target, file_path), (last_committed, last_committed))
+    if dates:
+        with open(os.path.join(target, LAST_COMMITS_FILE), 'w') as handle:
+            json.dump(dates, handle, sort_keys=True)
+    return dates
 
 
 def clone(local_root, new_root, remote, branch, rel_dest, exclude):
@@ -390,7 +515,7 @@ def clone(local_root, new_root, remote, branch, rel_dest, exclude):
     run_command(new_root, ['git', 'checkout', '--'] + exclude_joined)
 
 
-def commit_and_push(local_root, remote, versions):
+def commit_and_push(local_root, remote, versions, partial=False):
     """Commit changed, new, and deleted files in the repo and attempt to push the branch to the remote repository.
 
     :raise CalledProcessError: Unhandled git command failure.
@@ -399,17 +524,24 @@ def commit_and_push(local_root, remote, versions):
     :param str local_root: Local path to git root directory.
     :param str remote: The git remote to push to.
     :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param bool partial: Only some versions are built so far. Commit changed and new files but don't delete any.
 
     :return: If push succeeded.
     :rtype: bool
     """
     log = logging.getLogger(__name__)
     current_branch = run_command(local_root, ['git', 'rev-parse', '--abbrev-ref', 'HEAD']).strip()
-    run_command(local_root, ['git', 'add', '.'])
+    if partial:
+        run_command(local_root, ['git', 'reset', '--quiet', 'HEAD'])  # Unstage "git rm" of versions not built yet.
+        run_command(local_root, ['git', 'add', '--ignore-removal', '.'])
+        diff = ['git', 'diff', '--cached', 'HEAD', '--no-ext-diff']
+    else:
+        run_command(local_root, ['git', 'add', '--all', '.'])
+        diff = ['git', 'diff', 'HEAD', '--no-ext-diff']
 
     # Check if there are no changes.
     try:
-        run_command(local_root, ['git', 'diff', 'HEAD', '--no-ext-diff', '--quiet', '--exit-code'])
+        run_command(local_root, diff + ['--quiet', '--exit-code'])
     except CalledProcessError:
         pass  # Repo is dirty, something has changed.
     else:
@@ -417,7 +549,7 @@ def commit_and_push(local_root, remote, versions):
         return True
 
     # Check if there are changes excluding those files that always change.
-    output = run_command(local_root, ['git', 'diff', 'HEAD', '--no-ext-diff', '--name-status'])
+    output = run_command(local_root, diff + ['--name-status'])
     for status, name in (l.split('\t', 1) for l in output.splitlines()):
         if status != 'M':
             break  # Only looking for modified files.
@@ -432,9 +564,10 @@ def commit_and_push(local_root, remote, versions):
     latest_commit = sorted(versions.remotes, key=lambda v: v['date'])[-1]
     commit_message_file = os.path.join(local_root, '_scv_commit_message.txt')
     with open(commit_message_file, 'w') as handle:
-        handle.write('AUTO sphinxcontrib-versioning {} {}\n\n'.format(
+        handle.write('AUTO sphinxcontrib-versioning {} {}{}\n\n'.format(
             datetime.utcfromtimestamp(latest_commit['date']).strftime('%Y%m%d'),
             latest_commit['sha'][:11],
+            ' (partial)' if partial else '',
         ))
         for line in ('{}: {}\n'.format(v, os.environ[v]) for v in WHITELIST_ENV_VARS if v in os.environ):
             handle.write(line)
@@ -0,0 +1,95 @@
+"""Remember how long versions took to build, to estimate build times and start the longest builds first."""
+
+import json
+import logging
+import os
+import time
+
+from sphinxcontrib.versioning.lib import write_file
+
+FILE_NAME = 'sphinxcontrib-versioning-history.json'  # Default file name in the .git directory of git_root.
+MAX_ENTRIES = 1000  # Oldest entries are dropped when saving more than this many.
+SECONDS_PER_PAGE = 0.5  # Estimate until the first build is recorded.
+
+
+def history_file(config):
+    """Get the path to the build history file.
+
+    Build order only depends on the history with more than one build job, so by default nothing is recorded otherwise.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+
+    :return: The history_file config value, or a file in the .git directory of git_root with more than one build job.
+        None if neither applies.
+    :rtype: str
+    """
+    if config.history_file:
+        return config.history_file
+    if config.build_jobs <= 1 or not config.git_root or not os.path.isdir(os.path.join(config.git_root, '.git')):
+        return None
+    return os.path.join(config.git_root, '.git', FILE_NAME)
+
+
+class BuildHistory(object):
+    """Build durations of Sphinx source directories stored in a JSON file.
+
+    Durations are keyed by git tree hash of the directory containing conf.py, so branches/tags and commits with the same
+    docs share one entry.
+
+    :ivar dict entries: Tree hashes (keys) and [seconds, number of pages, unix time recorded] lists (values).
+    :ivar str path: Path to the JSON file. None to keep everything in memory only.
+    """
+
+    def __init__(self, path=None):
+        """Constructor. Reads the file if it exists.
+
+        :param str path: Path to the JSON file. None to keep everything in memory only.
+        """
+        log = logging.getLogger(__name__)
+        self.entries = dict()
+        self.path = path
+        if not path or not os.path.isfile(path):
+            return
+        try:
+            with open(path) as handle:
+                entries = json.load(handle)
+            self.entries = {k: v for k, v in entries.items() if isinstance(v, list) and len(v) == 3}
+        except (AttributeError, IOError, OSError, ValueError):
+            log.warning('Ignoring unreadable build history file: %s', path)
+
+    def estimate(self, tree, pages):
+        """Estimate how long a build will take.
+
+        :param str tree: Git tree hash of the Sphinx source directory. None if unknown.
+        :param int pages: Number of pages (found_docs) in the version. Used if tree was never built.
+
+        :return: Expected duration in seconds.
+        :rtype: float
+        """
+        if tree in self.entries:
+            return self.entries[tree][0]
+        recorded = [e for e in self.entries.values() if e[1]]
+        if not recorded:
+            return SECONDS_PER_PAGE * pages
+        return sum(e[0] for e in recorded) / sum(e[1] for e in recorded) * pages
+
+    def record(self, tree, seconds, pages):
+        """Record a build's duration.
+
+        :param str tree: Git tree hash of the Sphinx source directory. Nothing is recorded if None.
+        :param float seconds: How long the build took.
+        :param int pages: Number of pages (found_docs) in the version.
+        """
+        if tree:
+            self.entries[tree] = [round(seconds, 3), pages, int(time.time())]
+
+    def save(self):
+        """Write entries to the JSON file, dropping the oldest ones beyond MAX_ENTRIES. Failures are only logged."""
+        log = logging.getLogger(__name__)
+        if not self.path:
+            return
+        entries = dict(sorted(self.entries.items(), key=lambda i: i[1][2])[-MAX_ENTRIES:])
+        try:
+            write_file(self.path, json.dumps(entries, sort_keys=True))
+        except (IOError, OSError) as exc:
+            log.warning('Unable to save build history to %s: %s', self.path, exc)
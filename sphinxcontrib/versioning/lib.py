@@ -4,12 +4,15 @@ import atexit
 import functools
 import logging
 import os
+import re
 import shutil
 import tempfile
 import weakref
 
 import click
 
+RE_INVALID_FILENAME = re.compile(r'[^0-9A-Za-z._-]')  # Characters replaced in file and directory names.
+
 
 class Config(object):
     """The global configuration and state of the running program."""
@@ -22,23 +25,36 @@ class Config(object):
         # Booleans.
         self.banner_greatest_tag = False
         self.banner_recent_tag = False
+        self.early_push = False
         self.greatest_tag = False
         self.invert = False
         self.no_colors = False
         self.no_local_conf = False
         self.recent_tag = False
+        self.resume = False
         self.show_banner = False
 
         # Strings.
         self.banner_main_ref = 'master'
         self.chdir = None
+        self.doctree_cache_dir = None
         self.git_root = None
+        self.git_trace2_perf = None
+        self.history_file = None
+        self.jinja_cache_dir = None
         self.local_conf = None
+        self.metrics_file = None
         self.priority = None
+        self.profile_dir = None
         self.push_remote = 'origin'
         self.root_ref = 'master'
+        self.shard = None
+        self.start_method = None
+        self.state_dir = None
+        self.timings = None
 
         # Tuples.
+        self.git_budget = tuple()
         self.grm_exclude = tuple()
         self.overflow = tuple()
         self.sort = tuple()
@@ -46,7 +62,13 @@ class Config(object):
         self.whitelist_tags = tuple()
 
         # Integers.
+        self.build_jobs = 1
+        self.build_timeout = None
+        self.memory_limit = None
+        self.poll_interval = 600
         self.verbose = 0
+        self.webhook_port = None
+        self.worker_builds = 1
 
     def __contains__(self, item):
         """Implement 'key in Config'.
@@ -167,3 +189,22 @@ class TempDir(object):
         shutil.rmtree(self.name, onerror=lambda *a: os.chmod(a[1], __import__('stat').S_IWRITE) or os.unlink(a[1]))
         if os.path.exists(self.name):
             raise IOError(17, "File exists: '{}'".format(self.name))
+
+
+def write_file(path, contents):
+    """Write a text file, replacing the old file only after the new one is completely written.
+
+    Readers (and interrupted runs) never see a partially written file. os.replace() is atomic on every platform, on
+    Python 2.x os.rename() only is on POSIX so the old file is removed first on Windows.
+
+    :param str path: File path. The new file is written to path + ".tmp" first.
+    :param str contents: File contents.
+    """
+    with open(path + '.tmp', 'w') as handle:
+        handle.write(contents)
+    if hasattr(os, 'replace'):
+        os.replace(path + '.tmp', path)
+        return
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)
+    os.rename(path + '.tmp', path)
@@ -0,0 +1,96 @@
+"""Write the timings report as Prometheus metrics for the node_exporter textfile collector."""
+
+from collections import OrderedDict
+
+from sphinxcontrib.versioning.lib import write_file
+
+PREFIX = 'sphinx_versioning_'
+
+
+def escape(value):
+    """Escape a label value.
+
+    :param str value: Label value.
+
+    :return: Escaped value without surrounding quotes.
+    :rtype: str
+    """
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def metric(lines, name, kind, help_text, samples):
+    """Append one metric with HELP and TYPE lines.
+
+    :param list lines: Append lines of text to this list.
+    :param str name: Metric name without PREFIX.
+    :param str kind: Metric type, e.g. gauge.
+    :param str help_text: Description.
+    :param iter samples: (labels dict, value) tuples. Labels are sorted by name.
+    """
+    lines.append('# HELP {}{} {}'.format(PREFIX, name, help_text))
+    lines.append('# TYPE {}{} {}'.format(PREFIX, name, kind))
+    for labels, value in samples:
+        label_text = ','.join('{}="{}"'.format(k, escape(v)) for k, v in sorted(labels.items()))
+        lines.append('{}{}{} {}'.format(PREFIX, name, '{' + label_text + '}' if label_text else '', value))
+
+
+def format_metrics(report):
+    """Format a timings report in the Prometheus text exposition format.
+
+    :param dict report: From sphinxcontrib.versioning.timings.Timings.report().
+
+    :return: Text ending with a newline.
+    :rtype: str
+    """
+    lines = list()
+    metric(lines, 'last_run_timestamp_seconds', 'gauge', 'Unix time the last run started.',
+           [(dict(), report['started'])])
+    metric(lines, 'run_duration_seconds', 'gauge', 'Wall time of the last run.', [(dict(), report['wall'])])
+    metric(lines, 'run_cpu_seconds', 'gauge', 'CPU time of the last run including child processes.',
+           [(dict(), report['cpu'])])
+    if report['peak_rss']:
+        metric(lines, 'peak_rss_bytes', 'gauge', 'Peak resident set size of the largest process.',
+               [(dict(), report['peak_rss'])])
+
+    phases = dict()
+    for entry in report['phases']:
+        phases[entry['name']] = phases.get(entry['name'], 0.0) + entry['wall']
+    metric(lines, 'phase_duration_seconds', 'gauge', 'Wall time of each phase of the last run.',
+           [(dict(phase=n), round(phases[n], 3)) for n in sorted(phases)])
+
+    # A version built more than once (rebuilding everything after a failure, push retries) keeps its last wall time.
+    # Repeated label sets would make the textfile collector reject the whole file.
+    walls = OrderedDict(((b['name'], b['root']), b['wall']) for b in report['builds'])
+    failed = {(f['name'], f['phase'] == 'root') for f in report['failures'] if f['phase'] != 'read_config'}
+    metric(lines, 'builds', 'gauge', 'Versions built by the last run by result.', [
+        (dict(result='built'), len(set(walls) - failed)),
+        (dict(result='cached'), len(report['cached'])),
+        (dict(result='failed'), len(failed)),
+    ])
+    metric(lines, 'build_duration_seconds', 'gauge', 'Wall time of the last sphinx-build run of each version.',
+           [(dict(ref=n, root=str(r).lower()), walls[(n, r)]) for n, r in walls])
+    failures = dict()
+    for failure in report['failures']:
+        key = (failure['name'], failure['phase'])
+        failures[key] = failures.get(key, 0) + 1
+    metric(lines, 'ref_failures', 'gauge', 'Failures of each branch/tag in the last run.',
+           [(dict(ref=n, phase=p), failures[(n, p)]) for n, p in sorted(failures)])
+
+    metric(lines, 'git_subprocesses', 'gauge', 'git commands run by the last run.',
+           [(dict(command=c), report['git'][c]) for c in sorted(report['git'])])
+    metric(lines, 'exported_bytes', 'gauge', 'Size of all commits exported by the last run.',
+           [(dict(), report['sizes'].get('exported', 0))])
+    metric(lines, 'output_bytes', 'gauge', 'Size of the docs built by the last run.',
+           [(dict(), report['sizes'].get('output', 0))])
+    return '\n'.join(lines) + '\n'
+
+
+def write(path, report):
+    """Write metrics to a file. The file is replaced only after the new one is completely written.
+
+    The textfile collector may read the file at any time, so it must never see a partially written file.
+
+    :param str path: File path, should end with .prom for the textfile collector.
+    :param dict report: From sphinxcontrib.versioning.timings.Timings.report().
+    """
+    write_file(path, format_metrics(report))
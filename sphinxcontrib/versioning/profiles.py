@@ -0,0 +1,89 @@
+"""Profile sphinx-build child processes with cProfile and merge the results."""
+
+import cProfile
+import logging
+import os
+import pstats
+
+from sphinxcontrib.versioning.lib import RE_INVALID_FILENAME
+
+ASSIGNED = dict()  # Profile file paths (keys) and phases (values) handed out since the last merge().
+
+
+def profile_path(directory, name, phase):
+    """Get the file path for the profile of one child process task.
+
+    Files are named <ref>-<phase>.prof, e.g. master-build.prof. If the same ref and phase run more than once before
+    merge() (e.g. the root ref is built once before and once during the final build) a number is appended. The local
+    conf.py is read as "(local)" and becomes local-read_config.prof.
+
+    :param str directory: Directory to write profiles to. Created if missing.
+    :param str name: Branch/tag name.
+    :param str phase: What the child process runs, e.g. read_config or build.
+
+    :return: Path of the profile file.
+    :rtype: str
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    safe_name = RE_INVALID_FILENAME.sub('_', name).replace('-', '_')  # No hyphens, they separate names from phases.
+    base = os.path.join(directory, '{}-{}'.format(safe_name.strip('_'), phase))
+    path, number = base + '.prof', 1
+    while path in ASSIGNED:
+        number += 1
+        path = '{}-{}.prof'.format(base, number)
+    ASSIGNED[path] = phase
+    return path
+
+
+def run_profiled(path, func, args):
+    """Run func(*args) with cProfile and write the stats to a file, even if func fails. Runs in child processes.
+
+    :param str path: Write the profile to this file.
+    :param function func: Module level function to profile.
+    :param tuple args: Arguments for func.
+
+    :return: Return value of func.
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        profiler.dump_stats(path)
+
+
+def merge(directory):
+    """Merge the profiles of all refs written since the last call into one file per phase.
+
+    E.g. build.prof from all <ref>-build.prof files. Profiles of child processes that were terminated (e.g. timed out)
+    don't exist and are skipped.
+
+    :param str directory: Directory to write merged profiles to.
+
+    :return: Paths of the merged profiles.
+    :rtype: list
+    """
+    log = logging.getLogger(__name__)
+    phases = dict()
+    for path, phase in sorted(ASSIGNED.items()):
+        if os.path.isfile(path):
+            phases.setdefault(phase, list()).append(path)
+    ASSIGNED.clear()
+
+    merged = list()
+    for phase, paths in sorted(phases.items()):
+        stats = None
+        for path in paths:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(path)
+                else:
+                    stats.add(path)
+            except (EOFError, TypeError, ValueError):
+                log.warning('Skipping unreadable profile: %s', path)
+        if stats is None:
+            continue
+        merged.append(os.path.join(directory, phase + '.prof'))
+        stats.dump_stats(merged[-1])
+        log.info('Merged %d %s profiles into: %s', len(paths), phase, merged[-1])
+    return merged
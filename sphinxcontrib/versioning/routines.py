@@ -4,13 +4,16 @@ import json
 import logging
 import os
 import re
+import shutil
 import subprocess
 
-from sphinxcontrib.versioning.git import export, fetch_commits, filter_and_date, GitError, list_remote
-from sphinxcontrib.versioning.lib import Config, HandledError, TempDir
-from sphinxcontrib.versioning.sphinx_ import build, read_config
-
-RE_INVALID_FILENAME = re.compile(r'[^0-9A-Za-z.-]')
+from sphinxcontrib.versioning.git import export, fetch_commits, filter_and_date, GitError, list_remote, tree_hashes
+from sphinxcontrib.versioning.history import BuildHistory, history_file
+from sphinxcontrib.versioning.lib import Config, HandledError, RE_INVALID_FILENAME, TempDir
+from sphinxcontrib.versioning.shards import assign_shards, parse_shard
+from sphinxcontrib.versioning.sphinx_ import build, build_parallel, read_config, warm_up
+from sphinxcontrib.versioning.state import cache_dir, fingerprint, settings_hash, sync_tree, versions_hash
+from sphinxcontrib.versioning.timings import phase, record_cached, record_failure, record_size
 
 
 def read_local_conf(local_conf):
@@ -53,7 +56,8 @@ def gather_git_info(root, conf_rel_paths, whitelist_branches, whitelist_tags):
     # List remote.
     log.info('Getting list of all remote branches/tags...')
     try:
-        remotes = list_remote(root)
+        with phase('list_remote'):
+            remotes = list_remote(root)
     except GitError as exc:
         log.error(exc.message)
         log.error(exc.output)
@@ -63,12 +67,15 @@ def gather_git_info(root, conf_rel_paths, whitelist_branches, whitelist_tags):
     # Filter and date.
     try:
         try:
-            dates_paths = filter_and_date(root, conf_rel_paths, (i[0] for i in remotes))
+            with phase('filter_and_date'):
+                dates_paths = filter_and_date(root, conf_rel_paths, (i[0] for i in remotes))
         except GitError:
             log.info('Need to fetch from remote...')
-            fetch_commits(root, remotes)
+            with phase('fetch'):
+                fetch_commits(root, remotes)
             try:
-                dates_paths = filter_and_date(root, conf_rel_paths, (i[0] for i in remotes))
+                with phase('filter_and_date'):
+                    dates_paths = filter_and_date(root, conf_rel_paths, (i[0] for i in remotes))
             except GitError as exc:
                 log.error(exc.message)
                 log.error(exc.output)
@@ -97,7 +104,26 @@ def gather_git_info(root, conf_rel_paths, whitelist_branches, whitelist_tags):
     return whitelisted_remotes
 
 
-def pre_build(local_root, versions):
+def source_dir(exported_root, remote):
+    """Get the Sphinx source directory (containing conf.py) of a version.
+
+    With a doctree cache directory this is the version's stable copy of its exported commit, see sync_tree().
+
+    :param str exported_root: Tempdir path with exported commits as subdirectories.
+    :param sphinxcontrib.versioning.versions.Remote remote: The version.
+
+    :return: Directory to pass to sphinx-build.
+    :rtype: str
+    """
+    config = Config.from_context()
+    if config.doctree_cache_dir:
+        root = os.path.join(cache_dir(config.doctree_cache_dir, remote['name']), 'source')
+    else:
+        root = os.path.join(exported_root, remote['sha'])
+    return os.path.dirname(os.path.join(root, remote['conf_rel_path']))
+
+
+def pre_build(local_root, versions, state=None):
     """Build docs for all versions to determine root directory and master_doc names.
 
     Need to build docs to (a) avoid filename collision with files from root_ref and branch/tag names and (b) determine
@@ -105,29 +131,50 @@ def pre_build(local_root, versions):
     versions).
 
     Exports all commits into a temporary directory and returns the path to avoid re-exporting during the final build.
+    With a state directory commits are exported there instead, reusing complete exports of an interrupted build. When
+    resuming, configs read by an interrupted build are reused too. With a doctree cache directory every version's
+    export is then synced to its stable copy there.
 
     :param str local_root: Local path to git root directory.
     :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param sphinxcontrib.versioning.state.BuildState state: State of earlier builds. None for a temporary directory.
 
     :return: Tempdir path with exported commits as subdirectories.
     :rtype: str
     """
     log = logging.getLogger(__name__)
-    exported_root = TempDir(True).name
+    config = Config.from_context()
+    exported_root = state.exported_root if state else TempDir(True).name
 
     # Extract all.
-    for sha in {r['sha'] for r in versions.remotes}:
-        target = os.path.join(exported_root, sha)
-        log.debug('Exporting %s to temporary directory.', sha)
-        export(local_root, sha, target)
+    with phase('export'):
+        for sha in {r['sha'] for r in versions.remotes}:
+            target = os.path.join(exported_root, sha)
+            if state and sha in state.exported and os.path.isdir(target):
+                log.debug('Already exported %s to state directory.', sha)
+                continue
+            if os.path.isdir(target):
+                shutil.rmtree(target)  # Incomplete export of an interrupted build.
+            log.debug('Exporting %s to %s directory.', sha, 'state' if state else 'temporary')
+            export(local_root, sha, target)
+            record_size('exported', target)
+            if state:
+                state.exported.append(sha)
+                state.save()
+        if config.doctree_cache_dir:
+            for remote in versions.remotes:
+                source = os.path.join(cache_dir(config.doctree_cache_dir, remote['name']), 'source')
+                changed = sync_tree(os.path.join(exported_root, remote['sha']), source)
+                log.debug('Synced %s to %s, %d files changed.', remote['name'], source, changed)
 
     # Build root.
-    remote = versions[Config.from_context().root_ref]
-    with TempDir() as temp_dir:
-        log.debug('Building root (before setting root_dirs) in temporary directory: %s', temp_dir)
-        source = os.path.dirname(os.path.join(exported_root, remote['sha'], remote['conf_rel_path']))
-        build(source, temp_dir, versions, remote['name'], True)
-        existing = os.listdir(temp_dir)
+    with phase('pre_run'):
+        remote = versions[config.root_ref]
+        with TempDir() as temp_dir:
+            log.debug('Building root (before setting root_dirs) in temporary directory: %s', temp_dir)
+            source = source_dir(exported_root, remote)
+            build(source, temp_dir, versions, remote['name'], True)
+            existing = os.listdir(temp_dir)
 
     # Define root_dir for all versions to avoid file name collisions.
     for remote in versions.remotes:
@@ -139,47 +186,173 @@ def pre_build(local_root, versions):
         existing.append(root_dir)
 
     # Get found_docs and master_doc values for all versions.
-    for remote in list(versions.remotes):
-        log.debug('Partially running sphinx-build to read configuration for: %s', remote['name'])
-        source = os.path.dirname(os.path.join(exported_root, remote['sha'], remote['conf_rel_path']))
-        try:
-            config = read_config(source, remote['name'])
-        except HandledError:
-            log.warning('Skipping. Will not be building: %s', remote['name'])
-            versions.remotes.pop(versions.remotes.index(remote))
-            continue
-        remote['found_docs'] = config['found_docs']
-        remote['master_doc'] = config['master_doc']
+    themes = set()
+    settings = settings_hash(config) if state else None
+    with phase('read_config'):
+        for remote in list(versions.remotes):
+            key = fingerprint(remote['sha'], remote['conf_rel_path'], settings)
+            if state and config.resume and key in state.configs:
+                log.debug('Reusing configuration read by an earlier build for: %s', remote['name'])
+                read = state.configs[key]
+            else:
+                log.debug('Partially running sphinx-build to read configuration for: %s', remote['name'])
+                source = source_dir(exported_root, remote)
+                try:
+                    read = read_config(source, remote['name'])
+                except HandledError:
+                    log.warning('Skipping. Will not be building: %s', remote['name'])
+                    record_failure(remote['name'], 'read_config')
+                    versions.remotes.pop(versions.remotes.index(remote))
+                    continue
+                if state:
+                    state.configs[key] = dict(found_docs=list(read['found_docs']), html_theme=read['html_theme'],
+                                              master_doc=read['master_doc'])
+                    state.save()
+            remote['found_docs'] = tuple(read['found_docs'])
+            remote['master_doc'] = read['master_doc']
+            themes.add(read['html_theme'])
+
+    # Import themes once here instead of in every child process.
+    warm_up(*sorted(themes))
 
     return exported_root
 
 
-def build_all(exported_root, destination, versions):
+def build_order(versions):
+    """Order versions by how important it is to have them built early.
+
+    First the root ref, then the banner main ref, then the most recent branch/tag, branch, and tag and the greatest tag.
+    The rest follow most recently committed first (least stale first), since those are the most likely to be read.
+
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+
+    :return: Important remotes and the other remotes, both in build order.
+    :rtype: tuple
+    """
+    config = Config.from_context()
+    special = (versions.recent_remote, versions.recent_branch_remote, versions.recent_tag_remote,
+               versions.greatest_tag_remote)
+    important = list()
+    for name in [config.root_ref, config.banner_main_ref] + [r['name'] for r in special if r]:
+        if name and name not in important and name in [r['name'] for r in versions.remotes]:
+            important.append(name)
+    others = sorted((r for r in versions.remotes if r['name'] not in important), key=lambda r: -r['date'])
+    return [versions[n] for n in important], others
+
+
+def docs_trees(local_root, remotes):
+    """Get the git tree hash of the Sphinx source directory (containing conf.py) of each version.
+
+    :param str local_root: Local path to git root directory. None if unknown.
+    :param iter remotes: List of Remotes from Versions.remotes.
+
+    :return: Tree hashes with branch/tag name keys. Empty if unavailable.
+    :rtype: dict
+    """
+    log = logging.getLogger(__name__)
+    if not local_root:
+        return dict()
+    revisions = {r['name']: '{}:{}'.format(r['sha'], os.path.dirname(r['conf_rel_path'])) for r in remotes}
+    try:
+        trees = tree_hashes(local_root, set(revisions.values()))
+    except subprocess.CalledProcessError:
+        log.debug('Failed to get git tree hashes of docs directories.')
+        return dict()
+    return {n: trees[r] for n, r in revisions.items()}
+
+
+def build_all(exported_root, destination, versions, checkpoint=None, state=None):
     """Build all versions.
 
+    The root ref is built first, then all versions in the order from build_order(). With more than one build job the
+    versions after the important ones are ordered longest expected build time first, so the slowest builds don't end up
+    running alone at the end. Build times are estimated from previous builds (see history_file()), or from the number
+    of pages for docs never built before.
+
+    With a state directory every finished build is recorded along with a hash of its inputs (commit, settings, and the
+    versions shown in the menu). When resuming, builds with the same inputs and all their files still in destination
+    are skipped.
+
+    With --shard only the branches/tags assigned to that shard by assign_shards() are built. The first shard also builds
+    the root ref in the web root.
+
     :param str exported_root: Tempdir path with exported commits as subdirectories.
     :param str destination: Destination directory to copy/overwrite built docs to. Does not delete old files.
     :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param function checkpoint: Called once with versions after the important versions are built, if others remain.
+        No other build is running at that time.
+    :param sphinxcontrib.versioning.state.BuildState state: Record finished builds here. None to not record them.
     """
     log = logging.getLogger(__name__)
+    config = Config.from_context()
+    history = BuildHistory(history_file(config))
+    trees = docs_trees(config.git_root, versions.remotes)
+    settings = settings_hash(config) if state else None
+    names, build_root = None, True
+    if config.shard:
+        shard, shards = parse_shard(config.shard)
+        names, build_root = assign_shards(versions, config.root_ref, shards)[shard - 1], shard == 1
 
     while True:
-        # Build root.
-        remote = versions[Config.from_context().root_ref]
-        log.info('Building root: %s', remote['name'])
-        source = os.path.dirname(os.path.join(exported_root, remote['sha'], remote['conf_rel_path']))
-        build(source, destination, versions, remote['name'], True)
-
-        # Build all refs.
-        for remote in list(versions.remotes):
-            log.info('Building ref: %s', remote['name'])
-            source = os.path.dirname(os.path.join(exported_root, remote['sha'], remote['conf_rel_path']))
-            target = os.path.join(destination, remote['root_dir'])
-            try:
-                build(source, target, versions, remote['name'], False)
-            except HandledError:
-                log.warning('Skipping. Will not be building %s. Rebuilding everything.', remote['name'])
-                versions.remotes.pop(versions.remotes.index(remote))
-                break  # Break out of for loop.
-        else:
-            break  # Break out of while loop if for loop didn't execute break statement above.
+        important, others = build_order(versions)
+        expected = {r['name']: history.estimate(trees.get(r['name']), len(r['found_docs'])) for r in versions.remotes}
+        if config.build_jobs > 1:
+            others.sort(key=lambda r: -expected[r['name']])
+        if names is not None:
+            important, others = [r for r in important if r['name'] in names], [r for r in others if r['name'] in names]
+
+        # Build root and all refs.
+        builds, inputs = list(), dict()
+        menu = versions_hash(versions) if state else None
+        queue = [(versions[config.root_ref], True)] if build_root else list()
+        for remote, is_root in queue + [(r, False) for r in important + others]:
+            rel_target = '' if is_root else remote['root_dir']
+            inputs[rel_target] = fingerprint(remote['sha'], remote['conf_rel_path'], is_root, settings, menu)
+            if state and config.resume and state.is_complete(destination, rel_target, inputs[rel_target]):
+                log.info('Already built %s from the same inputs, skipping.', 'root' if is_root else remote['name'])
+                record_cached(remote['name'], is_root)
+                continue
+            source = source_dir(exported_root, remote)
+            target = os.path.join(destination, rel_target) if rel_target else destination
+            builds.append((source, target, versions, remote['name'], is_root))
+        remaining = [expected[b[3]] for b in builds]
+        if builds:
+            log.info('Expecting builds to take about %d seconds.', sum(remaining) / min(config.build_jobs, len(builds)))
+
+        # With a checkpoint the important versions are built in a batch of their own, so no other build is still
+        # writing to destination while the checkpoint runs (e.g. committing and pushing destination).
+        first = [b for b in builds if b[4] or b[3] in [r['name'] for r in important]]
+        batches = [first, builds[len(first):]] if checkpoint and len(first) < len(builds) else [builds]
+        failed = False
+        for number, batch in enumerate(batches):
+            if number:
+                checkpoint(versions)
+                checkpoint = None
+            for args in build_parallel(batch, config.build_jobs):
+                (_, _, _, name, is_root), success, seconds = args
+                if not success:
+                    record_failure(name, 'root' if is_root else 'build')
+                if not success and (is_root or names is not None):
+                    if names is not None:
+                        log.error('Other shards link to %s, a shard build cannot skip it.', name)
+                    raise HandledError
+                if not success:
+                    log.warning('Skipping. Will not be building %s. Rebuilding everything.', name)
+                    versions.remotes.pop(versions.remotes.index(versions[name]))
+                    failed = True
+                    break  # Break out of for loop.
+                history.record(trees.get(name), seconds, len(versions[name]['found_docs']))
+                if state:
+                    rel_target = '' if is_root else versions[name]['root_dir']
+                    exclude = [r['root_dir'] for r in versions.remotes] if is_root else ()
+                    state.record(destination, rel_target, inputs[rel_target], exclude)
+                remaining.remove(expected[name])
+                if remaining:
+                    log.info('Built %s in %d seconds. About %d seconds left.', name, seconds,
+                             sum(remaining) / min(config.build_jobs, len(remaining)))
+            if failed:
+                break
+        if not failed:
+            break  # Break out of while loop unless a version failed.
+
+    history.save()
@@ -0,0 +1,141 @@
+"""Split building all versions across several machines and merge their output."""
+
+import filecmp
+import json
+import logging
+import os
+import re
+import shutil
+
+from sphinxcontrib.versioning.lib import HandledError
+
+MANIFEST = '.scv_shard.json'  # Written to the root of each shard's DESTINATION, describes what the shard built.
+RE_SHARD = re.compile(r'^(\d+)/(\d+)$')
+
+
+def parse_shard(value):
+    """Parse a shard specification.
+
+    :raise ValueError: If value is invalid.
+
+    :param str value: Shard number and number of shards, e.g. "1/4". Shard numbers start at 1.
+
+    :return: Shard number and number of shards.
+    :rtype: tuple
+    """
+    match = RE_SHARD.match(value or '')
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise ValueError('Invalid shard "{}", expected i/n with 1 <= i <= n (e.g. 1/4).'.format(value))
+    return int(match.group(1)), int(match.group(2))
+
+
+def assign_shards(versions, root_ref, count):
+    """Distribute versions across shards, balancing the number of pages each shard builds.
+
+    Deterministic for the same versions, so every shard computes the same assignment independently. The first shard
+    also builds the root ref in the web root.
+
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance after pre_build().
+    :param str root_ref: Name of the root ref.
+    :param int count: Number of shards.
+
+    :return: Branch/tag names for each shard (first list for shard 1).
+    :rtype: list
+    """
+    loads = [0] * count
+    loads[0] = len(versions[root_ref]['found_docs']) + 1
+    shards = [list() for _ in range(count)]
+    for remote in sorted(versions.remotes, key=lambda r: (-len(r['found_docs']), r['name'])):
+        index = loads.index(min(loads))
+        shards[index].append(remote['name'])
+        loads[index] += len(remote['found_docs']) + 1
+    return shards
+
+
+def write_manifest(destination, versions, root_ref, shard, count, names):
+    """Record what a shard built, to be verified and removed by merge().
+
+    :param str destination: Destination directory of the shard's build.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param str root_ref: Name of the root ref.
+    :param int shard: Shard number.
+    :param int count: Number of shards.
+    :param iter names: Branch/tag names built by the shard.
+    """
+    manifest = dict(
+        built=sorted(names),
+        count=count,
+        root_ref=root_ref,
+        shard=shard,
+        versions={r['name']: dict(root_dir=r['root_dir'], sha=r['sha']) for r in versions.remotes},
+    )
+    with open(os.path.join(destination, MANIFEST), 'w') as handle:
+        json.dump(manifest, handle, sort_keys=True)
+
+
+def read_manifests(shard_dirs):
+    """Read and verify the manifests of all shards.
+
+    :raise HandledError: If a manifest is missing or shards don't belong to the same build. Will be logged first.
+
+    :param iter shard_dirs: Destination directories of all shards.
+
+    :return: Manifests, ordered like shard_dirs.
+    :rtype: list
+    """
+    log = logging.getLogger(__name__)
+    manifests = list()
+    for shard_dir in shard_dirs:
+        try:
+            with open(os.path.join(shard_dir, MANIFEST)) as handle:
+                manifests.append(json.load(handle))
+        except (IOError, OSError, ValueError):
+            log.error('Missing or invalid %s in %s. Not built with --shard?', MANIFEST, shard_dir)
+            raise HandledError
+
+    first = manifests[0]
+    if sorted(m['shard'] for m in manifests) != list(range(1, first['count'] + 1)):
+        log.error('Expected shards 1 to %d exactly once each, got: %s', first['count'],
+                  ' '.join('{}/{}'.format(m['shard'], m['count']) for m in manifests))
+        raise HandledError
+    for shard_dir, manifest in zip(shard_dirs, manifests):
+        for key in ('count', 'root_ref', 'versions'):
+            if manifest[key] != first[key]:
+                log.error('Shard %s disagrees with shard %s on %s (root_dir assignments or versions differ).',
+                          shard_dir, shard_dirs[0], key)
+                raise HandledError
+    built = sorted(n for m in manifests for n in m['built'])
+    if built != sorted(first['versions']):
+        log.error('Shards built %s but versions are %s.', ' '.join(built), ' '.join(sorted(first['versions'])))
+        raise HandledError
+    return manifests
+
+
+def merge(shard_dirs, destination):
+    """Combine the output of all shards into one directory, the same as building everything on one machine.
+
+    :raise HandledError: If shards don't belong to the same build or have conflicting files. Will be logged first.
+
+    :param iter shard_dirs: Destination directories of all shards.
+    :param str destination: Directory to copy all shards' files into.
+    """
+    log = logging.getLogger(__name__)
+    shard_dirs = list(shard_dirs)
+    manifests = read_manifests(shard_dirs)
+    copied = set()
+
+    for shard_dir, manifest in zip(shard_dirs, manifests):
+        log.info('Merging shard %d/%d: %s', manifest['shard'], manifest['count'], shard_dir)
+        for root, _, files in os.walk(shard_dir):
+            target_dir = os.path.join(destination, os.path.relpath(root, shard_dir))
+            if not os.path.isdir(target_dir):
+                os.makedirs(target_dir)
+            for name in files:
+                source, target = os.path.join(root, name), os.path.join(target_dir, name)
+                if root == shard_dir and name == MANIFEST:
+                    continue
+                if target in copied and not filecmp.cmp(source, target, shallow=False):
+                    log.error('Conflicting file in more than one shard: %s', os.path.relpath(target, destination))
+                    raise HandledError
+                shutil.copy2(source, target)
+                copied.add(target)
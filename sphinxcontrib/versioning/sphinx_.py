@@ -1,11 +1,17 @@
 """Interface with Sphinx."""
 
 import datetime
+import hashlib
+import importlib
+import json
 import logging
-import multiprocessing
 import os
+import pickle
 import sys
+import time
 
+import pkg_resources
+from jinja2 import FileSystemBytecodeCache
 from sphinx import application, build_main, locale
 from sphinx.builders.html import StandaloneHTMLBuilder
 from sphinx.config import Config as SphinxConfig
@@ -13,48 +19,153 @@ from sphinx.errors import SphinxError
 from sphinx.jinja2glue import SphinxFileSystemLoader
 from sphinx.util.i18n import format_date
 
-from sphinxcontrib.versioning import __version__
+from sphinxcontrib.versioning import __version__, timings, workers
+from sphinxcontrib.versioning.git import LAST_COMMITS_FILE
 from sphinxcontrib.versioning.lib import Config, HandledError, TempDir
+from sphinxcontrib.versioning.profiles import profile_path, run_profiled
+from sphinxcontrib.versioning.state import cache_dir
 from sphinxcontrib.versioning.versions import Versions
 
-SC_VERSIONING_VERSIONS = list()  # Updated after forking.
+PLACEHOLDER = '\x00{}\x00'  # Stands in for the Nth URL in templates rendered once for all pages, see render_cached().
 STATIC_DIR = os.path.join(os.path.dirname(__file__), '_static')
+WARM_MODULES = (
+    'docutils.parsers.rst',
+    'docutils.writers.html4css1',
+    'jinja2',
+    'pygments.formatters.html',
+    'sphinx.builders.html',
+    'sphinx.environment',
+    'sphinx.highlighting',
+    'sphinx.search',
+    'sphinx.writers.html',
+)
+KNOWN_THEMES = ('sphinx_rtd_theme',)  # Theme packages importable by their html_theme name, without entry points.
+WARMED = set()  # Modules imported by warm_up() in this process.
+
+
+class PlaceholderVersions(object):
+    """Stands in for Versions when rendering versions.html once for all pages. URLs are placeholders.
+
+    :ivar list branches: Names and placeholders of branches.
+    :ivar list links: Names and placeholders of all remotes, Nth remote has the Nth placeholder.
+    :ivar list tags: Names and placeholders of tags.
+    """
+
+    def __init__(self, versions):
+        """Constructor.
+
+        :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+        """
+        self.links = [(r.name, PLACEHOLDER.format(i)) for i, r in enumerate(versions.remotes)]
+        self.branches = [link for link, r in zip(self.links, versions.remotes) if r.kind == 'heads']
+        self.tags = [link for link, r in zip(self.links, versions.remotes) if r.kind == 'tags']
+
+    def __bool__(self):
+        """True if there are any remotes. Python 3.x."""
+        return bool(self.links)
+
+    def __nonzero__(self):
+        """True if there are any remotes. Python 2.x."""
+        return self.__bool__()
+
+    def __iter__(self):
+        """Yield names and placeholders of branches and tags."""
+        return iter(self.links)
+
+    def __len__(self):
+        """Number of remotes."""
+        return len(self.links)
 
 
 class EventHandlers(object):
     """Hold Sphinx event handlers as static or class methods.
 
-    :ivar multiprocessing.queues.Queue ABORT_AFTER_READ: Communication channel to parent process.
+    :ivar bool ABORT_AFTER_READ: Stop Sphinx after reading config and discovering pages, store them in READ_CONFIG.
     :ivar bool BANNER_GREATEST_TAG: Banner URLs point to greatest/highest (semver) tag.
     :ivar str BANNER_MAIN_VERSION: Banner URLs point to this remote name (from Versions.__getitem__()).
     :ivar bool BANNER_RECENT_TAG: Banner URLs point to most recently committed tag.
     :ivar str CURRENT_VERSION: Current version being built.
+    :ivar dict FRAGMENTS: Templates rendered with placeholders (see render_cached()) in the current build.
     :ivar bool IS_ROOT: Value for context['scv_is_root'].
+    :ivar str JINJA_CACHE_DIR: Directory for compiled Jinja2 templates shared with other children and runs.
+    :ivar dict LAST_COMMITS: Unix times of last commits (values) of docnames (keys), None until the first page.
+    :ivar dict LAST_UPDATED: Formatted last_updated values (values) of Unix times (keys) in the current build.
+    :ivar int PAGES: Number of pages the html-page-context handler ran for in the current build.
+    :ivar tuple PHASE: Name of the phase of the current build and Unix time it (or its last part) started.
+    :ivar dict PHASE_SECONDS: Seconds spent in each phase of the current build (see mark()).
+    :ivar dict READ_CONFIG: Config values and found docs read when ABORT_AFTER_READ is set.
     :ivar bool SHOW_BANNER: Display the banner.
     :ivar sphinxcontrib.versioning.versions.Versions VERSIONS: Versions class instance.
     """
 
-    ABORT_AFTER_READ = None
+    ABORT_AFTER_READ = False
     BANNER_GREATEST_TAG = False
     BANNER_MAIN_VERSION = None
     BANNER_RECENT_TAG = False
     CURRENT_VERSION = None
+    FRAGMENTS = dict()
     IS_ROOT = False
+    JINJA_CACHE_DIR = None
+    LAST_COMMITS = None
+    LAST_UPDATED = dict()
+    PAGES = 0
+    PHASE = None
+    PHASE_SECONDS = dict()
+    READ_CONFIG = None
     SHOW_BANNER = False
     VERSIONS = None
 
-    @staticmethod
-    def builder_inited(app):
+    @classmethod
+    def mark(cls, phase, elapsed_phase=None):
+        """Start a phase of the build, ending the current one.
+
+        Phases: startup (until the builder is initialized), environment (loading the pickled environment and finding
+        changed docs), read, resolve (resolving references in doctrees), write (translating doctrees, rendering
+        templates, writing pages, static files, and the search index), and versions (this extension's
+        html-page-context handler).
+
+        :param str phase: Name of the phase starting now. None to end the last phase.
+        :param str elapsed_phase: Count the time since the last mark towards this phase instead of the current one.
+        """
+        now = time.time()
+        if cls.PHASE is not None:
+            name = elapsed_phase or cls.PHASE[0]
+            cls.PHASE_SECONDS[name] = cls.PHASE_SECONDS.get(name, 0.0) + now - cls.PHASE[1]
+        cls.PHASE = (phase, now) if phase else None
+
+    @classmethod
+    def builder_inited(cls, app):
         """Update the Sphinx builder.
 
         :param sphinx.application.Sphinx app: Sphinx application object.
         """
+        cls.mark('environment')
+
+        # Sphinx has no event after a page is written. The time until the next doctree-resolved is spent resolving.
+        write_doc = app.builder.write_doc
+
+        def timed_write_doc(*args, **kwargs):
+            """Call the builder's write_doc() and end the write phase of this page afterwards.
+
+            :param iter args: Positional arguments.
+            :param dict kwargs: Keyword arguments.
+            """
+            try:
+                return write_doc(*args, **kwargs)
+            finally:
+                cls.mark('write')
+        app.builder.write_doc = timed_write_doc
+
         # Add this extension's _templates directory to Sphinx.
         templates_dir = os.path.join(os.path.dirname(__file__), '_templates')
         app.builder.templates.pathchain.insert(0, templates_dir)
         app.builder.templates.loaders.insert(0, SphinxFileSystemLoader(templates_dir))
         app.builder.templates.templatepathlen += 1
 
+        # Share compiled templates with other children and runs.
+        if cls.JINJA_CACHE_DIR:
+            app.builder.templates.environment.bytecode_cache = bytecode_cache(cls.JINJA_CACHE_DIR)
+
         # Add versions.html to sidebar.
         if '**' not in app.config.html_sidebars:
             try:
@@ -64,6 +175,48 @@ class EventHandlers(object):
         elif 'versions.html' not in app.config.html_sidebars['**']:
             app.config.html_sidebars['**'].append('versions.html')
 
+    @classmethod
+    def env_get_outdated(cls, app, env, added, changed, removed):
+        """Re-read (and so rewrite) pages whose versions menu or banner changed since the previous build.
+
+        Versions aren't a Sphinx config value, so Sphinx only rewrites pages whose source changed. Fingerprints of every
+        page's links to other versions are stored in the environment (pickled in the doctree directory) to compare.
+        Pages not in the output directory yet (e.g. a new target with a cached doctree directory) are written anyway.
+
+        :param sphinx.application.Sphinx app: Sphinx application object.
+        :param sphinx.environment.BuildEnvironment env: Sphinx build environment.
+        :param set added: Docnames of new pages.
+        :param set changed: Docnames of pages whose source changed.
+        :param set removed: Docnames of deleted pages.
+
+        :return: Docnames of unchanged pages to re-read.
+        :rtype: list
+        """
+        assert removed is not None  # Unused, for linting.
+        if cls.ABORT_AFTER_READ:
+            return list()
+        versions = cls.VERSIONS
+        this_remote = versions[cls.CURRENT_VERSION]
+        shared = repr((
+            cls.CURRENT_VERSION, cls.IS_ROOT, cls.SHOW_BANNER, cls.BANNER_MAIN_VERSION, cls.BANNER_GREATEST_TAG,
+            cls.BANNER_RECENT_TAG, [(r.name, r.kind) for r in versions.remotes],
+            [this_remote == r for r in (versions.greatest_tag_remote, versions.recent_branch_remote,
+                                        versions.recent_remote, versions.recent_tag_remote)],
+        ))
+        previous = getattr(env, 'scv_menus', dict())
+        env.scv_menus = dict()
+        for docname in env.found_docs:
+            versions.context = dict(current_version=cls.CURRENT_VERSION, pagename=docname, scv_is_root=cls.IS_ROOT)
+            urls = [u for _, u in versions.links()[0]]
+            env.scv_menus[docname] = hashlib.sha1('\n'.join([shared] + urls).encode('utf-8')).hexdigest()
+        outdated = (d for d, f in env.scv_menus.items() if f != previous.get(d) and d not in added and d not in changed)
+        return [d for d in outdated if os.path.isfile(app.builder.get_outfilename(d))]
+
+    @classmethod
+    def env_before_read_docs(cls, *_):
+        """Start of the read phase."""
+        cls.mark('read')
+
     @classmethod
     def env_updated(cls, app, env):
         """Abort Sphinx after initializing config and discovering all pages to build.
@@ -71,15 +224,69 @@ class EventHandlers(object):
         :param sphinx.application.Sphinx app: Sphinx application object.
         :param sphinx.environment.BuildEnvironment env: Sphinx build environment.
         """
+        cls.mark('write')
         if cls.ABORT_AFTER_READ:
             config = {n: getattr(app.config, n) for n in (a for a in dir(app.config) if a.startswith('scv_'))}
             config['found_docs'] = tuple(str(d) for d in env.found_docs)
+            config['html_theme'] = str(app.config.html_theme)
             config['master_doc'] = str(app.config.master_doc)
-            cls.ABORT_AFTER_READ.put(config)
+            cls.READ_CONFIG = config
             sys.exit(0)
 
+    @classmethod
+    def doctree_resolved(cls, *_):
+        """A doctree was resolved, the time since the previous page was written was spent resolving it."""
+        cls.mark('write', elapsed_phase='resolve')
+
+    @classmethod
+    def build_finished(cls, *_):
+        """End of the write phase."""
+        cls.mark(None)
+
     @classmethod
     def html_page_context(cls, app, pagename, templatename, context, doctree):
+        """Time this extension's work on every page, see update_context().
+
+        :param sphinx.application.Sphinx app: Sphinx application object.
+        :param str pagename: Name of the page being rendered (without .html or any file extension).
+        :param str templatename: Page name with .html.
+        :param dict context: Jinja2 HTML context.
+        :param docutils.nodes.document doctree: Tree of docutils nodes.
+        """
+        cls.mark('versions')
+        try:
+            cls.update_context(app, pagename, templatename, context, doctree)
+        finally:
+            cls.PAGES += 1
+            cls.mark('write')
+
+    @classmethod
+    def render_cached(cls, app, template, context, key, overrides, urls):
+        """Render a template once per key with placeholders instead of URLs, then fill in the URLs of this page.
+
+        The versions menu and banner only differ between pages by their URLs, rendering them with Jinja2 once per
+        build instead of for every page.
+
+        :param sphinx.application.Sphinx app: Sphinx application object.
+        :param str template: Template name.
+        :param dict context: Jinja2 HTML context.
+        :param tuple key: Everything besides the URLs that the output depends on.
+        :param dict overrides: Context values the template gets URLs from, returning PLACEHOLDER.format(N) instead.
+        :param list urls: URLs of this page, the Nth one replaces PLACEHOLDER.format(N).
+
+        :return: Rendered template.
+        :rtype: str
+        """
+        if key not in cls.FRAGMENTS:
+            rendered_context = dict(context)
+            rendered_context.update(overrides)
+            cls.FRAGMENTS[key] = app.builder.templates.render(template, rendered_context).split('\x00')
+        parts = cls.FRAGMENTS[key][:]
+        parts[1::2] = [urls[int(i)] for i in parts[1::2]]
+        return ''.join(parts)
+
+    @classmethod
+    def update_context(cls, app, pagename, templatename, context, doctree):
         """Update the Jinja2 HTML context, exposes the Versions class instance to it.
 
         :param sphinx.application.Sphinx app: Sphinx application object.
@@ -116,9 +323,18 @@ class EventHandlers(object):
         context['vhasdoc'] = versions.vhasdoc
         context['vpathto'] = versions.vpathto
 
+        # Pre-render versions menu, used by versions.html.
+        urls = [u for _, u in versions.links()[0]]
+        overrides = dict(versions=PlaceholderVersions(versions))
+        context['scv_versions_menu'] = cls.render_cached(app, 'versions.html', context, ('versions.html',), overrides,
+                                                         urls)
+
         # Insert banner into body.
         if cls.SHOW_BANNER and 'body' in context:
-            parsed = app.builder.templates.render('banner.html', context)
+            has_doc = versions.vhasdoc(cls.BANNER_MAIN_VERSION)
+            overrides = dict(vpathto=lambda _: PLACEHOLDER.format(0))
+            urls = [versions.vpathto(cls.BANNER_MAIN_VERSION)] if has_doc else list()
+            parsed = cls.render_cached(app, 'banner.html', context, ('banner.html', has_doc), overrides, urls)
             context['body'] = parsed + context['body']
             # Handle overridden css_files.
             css_files = context.setdefault('css_files', list())
@@ -128,13 +344,69 @@ class EventHandlers(object):
             if STATIC_DIR not in app.config.html_static_path:
                 app.config.html_static_path.append(STATIC_DIR)
 
-        # Reset last_updated with file's mtime (will be last git commit authored date).
+        # Reset last_updated with the last git commit date of the page's file, formatted once per date.
         if app.config.html_last_updated_fmt is not None:
-            file_path = app.env.doc2path(pagename)
-            if os.path.isfile(file_path):
-                lufmt = app.config.html_last_updated_fmt or getattr(locale, '_')('%b %d, %Y')
-                mtime = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
-                context['last_updated'] = format_date(lufmt, mtime, language=app.config.language, warn=app.warn)
+            if cls.LAST_COMMITS is None:
+                cls.LAST_COMMITS = read_last_commits(app.srcdir, this_remote.conf_rel_path, app.config.source_suffix)
+            last_committed = cls.LAST_COMMITS.get(pagename)
+            if last_committed is None:  # Not exported by git.export(), e.g. tests or non-RST source files.
+                file_path = app.env.doc2path(pagename)
+                if os.path.isfile(file_path):
+                    last_committed = os.path.getmtime(file_path)
+            if last_committed is not None:
+                if last_committed not in cls.LAST_UPDATED:
+                    lufmt = app.config.html_last_updated_fmt or getattr(locale, '_')('%b %d, %Y')
+                    mtime = datetime.datetime.fromtimestamp(last_committed)
+                    cls.LAST_UPDATED[last_committed] = format_date(lufmt, mtime, language=app.config.language,
+                                                                   warn=app.warn)
+                context['last_updated'] = cls.LAST_UPDATED[last_committed]
+
+
+def read_last_commits(srcdir, conf_rel_path, source_suffix):
+    """Read the last commit dates of source files git.export() wrote next to the exported files.
+
+    :param str srcdir: Sphinx source directory, the directory of conf.py in the exported commit.
+    :param str conf_rel_path: Relative path (to git root) of conf.py, to find the exported root directory.
+    :param iter source_suffix: File extension(s) of Sphinx source files. Other files are ignored.
+
+    :return: Docnames (keys) and Unix times (values). Empty if srcdir wasn't exported by git.export().
+    :rtype: dict
+    """
+    conf_dir = conf_rel_path.rpartition('/')[0]
+    prefix = conf_dir + '/' if conf_dir else ''
+    path = os.path.join(srcdir, *([os.pardir] * prefix.count('/') + [LAST_COMMITS_FILE]))
+    if not os.path.isfile(path):
+        return dict()
+    with open(path) as handle:
+        dates = json.load(handle)
+    if isinstance(source_suffix, (str, type(u''))):  # Single suffix, not a list.
+        source_suffix = [source_suffix]
+    last_commits = dict()
+    for file_path, last_committed in dates.items():
+        docname, suffix = os.path.splitext(file_path[len(prefix):])
+        if file_path.startswith(prefix) and suffix in source_suffix:
+            last_commits[docname] = last_committed
+    return last_commits
+
+
+def bytecode_cache(directory):
+    """Get a Jinja2 bytecode cache storing compiled templates in a directory, creating it if needed.
+
+    Files are named after the template name and path. Jinja2 recompiles templates whose source changed since (the
+    cached file stores a hash of the source) and ignores files written by other Python versions.
+
+    :param str directory: Cache directory.
+
+    :return: Bytecode cache for the Jinja2 environment.
+    :rtype: jinja2.FileSystemBytecodeCache
+    """
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):  # Not just created by another child at the same time.
+                raise
+    return FileSystemBytecodeCache(directory)
 
 
 def setup(app):
@@ -145,9 +417,6 @@ def setup(app):
     :returns: Extension version.
     :rtype: dict
     """
-    # Used internally. For rebuilding all pages when one or versions fail.
-    app.add_config_value('sphinxcontrib_versioning_versions', SC_VERSIONING_VERSIONS, 'html')
-
     # Needed for banner.
     app.config.html_static_path.append(STATIC_DIR)
     app.add_stylesheet('banner.css')
@@ -158,8 +427,12 @@ def setup(app):
 
     # Event handlers.
     app.connect('builder-inited', EventHandlers.builder_inited)
+    app.connect('env-get-outdated', EventHandlers.env_get_outdated)
+    app.connect('env-before-read-docs', EventHandlers.env_before_read_docs)
     app.connect('env-updated', EventHandlers.env_updated)
+    app.connect('doctree-resolved', EventHandlers.doctree_resolved)
     app.connect('html-page-context', EventHandlers.html_page_context)
+    app.connect('build-finished', EventHandlers.build_finished)
     return dict(version=__version__)
 
 
@@ -172,26 +445,96 @@ class ConfigInject(SphinxConfig):
         self.extensions.append('sphinxcontrib.versioning.sphinx_')
 
 
+class VersionsSnapshot(object):
+    """Versions class instance pickled to a file once, read by every child instead of pickling it for each one.
+
+    Snapshots are identified by a hash of the pickled instance, so a snapshot is never reused after versions changed.
+    Only the latest snapshot is kept, older ones are deleted when versions change (e.g. between daemon rebuilds).
+
+    :ivar str path: Path to the pickle file.
+    """
+
+    DIRECTORY = None  # Temporary directory holding all snapshot files, deleted at exit.
+    LOADED = dict()  # Unpickled Versions instance in child processes, reused by workers running more than one build.
+    SNAPSHOTS = dict()  # Hash of the latest pickled Versions instance in the parent process and its snapshot.
+
+    def __init__(self, pickled, digest):
+        """Constructor.
+
+        :param bytes pickled: Pickled Versions class instance.
+        :param str digest: Hash of pickled.
+        """
+        if self.DIRECTORY is None:
+            VersionsSnapshot.DIRECTORY = TempDir(True).name
+        self.path = os.path.join(self.DIRECTORY, 'versions_{}.pickle'.format(digest))
+        with open(self.path, 'wb') as handle:
+            handle.write(pickled)
+
+    @classmethod
+    def get(cls, versions):
+        """Get a snapshot of versions, creating one only if it changed since the last call.
+
+        :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+
+        :return: Snapshot instance.
+        :rtype: VersionsSnapshot
+        """
+        pickled = pickle.dumps(versions, pickle.HIGHEST_PROTOCOL)
+        digest = hashlib.sha1(pickled).hexdigest()
+        if digest not in cls.SNAPSHOTS:
+            for snapshot in cls.SNAPSHOTS.values():
+                os.remove(snapshot.path)
+            cls.SNAPSHOTS.clear()
+            cls.SNAPSHOTS[digest] = cls(pickled, digest)
+        return cls.SNAPSHOTS[digest]
+
+    def load(self):
+        """Unpickle the Versions class instance (in the child process).
+
+        :return: Versions class instance.
+        :rtype: sphinxcontrib.versioning.versions.Versions
+        """
+        if self.path not in self.LOADED:
+            self.LOADED.clear()
+            with open(self.path, 'rb') as handle:
+                self.LOADED[self.path] = pickle.load(handle)
+        return self.LOADED[self.path]
+
+
 def _build(argv, config, versions, current_name, is_root):
     """Build Sphinx docs via multiprocessing for isolation.
 
     :param tuple argv: Arguments to pass to Sphinx.
     :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
-    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param versions: Versions class instance or a VersionsSnapshot of one.
     :param str current_name: The ref name of the current version being built.
     :param bool is_root: Is this build in the web root?
+
+    :return: CPU time (cpu) of the build, peak RSS (peak_rss) of the child process so far, seconds spent in each
+        phase (phases, see EventHandlers.mark()), and number of pages (pages).
+    :rtype: dict
     """
-    # Patch.
+    cpu = timings.cpu_time()
+    EventHandlers.PAGES = 0
+    EventHandlers.PHASE = None
+    EventHandlers.PHASE_SECONDS = dict()
+    EventHandlers.mark('startup')
+    if isinstance(versions, VersionsSnapshot):
+        versions = versions.load()
+
+    # Patch. Reset everything since workers may run more than one build.
     application.Config = ConfigInject
-    if config.show_banner:
-        EventHandlers.BANNER_GREATEST_TAG = config.banner_greatest_tag
-        EventHandlers.BANNER_MAIN_VERSION = config.banner_main_ref
-        EventHandlers.BANNER_RECENT_TAG = config.banner_recent_tag
-        EventHandlers.SHOW_BANNER = True
+    EventHandlers.BANNER_GREATEST_TAG = config.banner_greatest_tag if config.show_banner else False
+    EventHandlers.BANNER_MAIN_VERSION = config.banner_main_ref if config.show_banner else None
+    EventHandlers.BANNER_RECENT_TAG = config.banner_recent_tag if config.show_banner else False
+    EventHandlers.SHOW_BANNER = bool(config.show_banner)
     EventHandlers.CURRENT_VERSION = current_name
+    EventHandlers.FRAGMENTS = dict()
     EventHandlers.IS_ROOT = is_root
+    EventHandlers.JINJA_CACHE_DIR = config.jinja_cache_dir
+    EventHandlers.LAST_COMMITS = None
+    EventHandlers.LAST_UPDATED = dict()
     EventHandlers.VERSIONS = versions
-    SC_VERSIONING_VERSIONS[:] = [p for r in versions.remotes for p in sorted(r.items()) if p[0] not in ('sha', 'date')]
 
     # Update argv.
     if config.verbose > 1:
@@ -205,21 +548,129 @@ def _build(argv, config, versions, current_name, is_root):
     result = build_main(argv)
     if result != 0:
         raise SphinxError
+    EventHandlers.mark(None)
+    phases = {k: round(v, 3) for k, v in EventHandlers.PHASE_SECONDS.items()}
+    return dict(cpu=round(timings.cpu_time() - cpu, 3), pages=EventHandlers.PAGES, peak_rss=timings.peak_rss(),
+                phases=phases)
 
 
-def _read_config(argv, config, current_name, queue):
+def _read_config(argv, config, current_name):
     """Read the Sphinx config via multiprocessing for isolation.
 
     :param tuple argv: Arguments to pass to Sphinx.
     :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
     :param str current_name: The ref name of the current version being built.
-    :param multiprocessing.queues.Queue queue: Communication channel to parent process.
+
+    :return: Specific Sphinx config values.
+    :rtype: dict
     """
     # Patch.
-    EventHandlers.ABORT_AFTER_READ = queue
+    EventHandlers.ABORT_AFTER_READ = True
+    EventHandlers.READ_CONFIG = None
 
     # Run.
-    _build(argv, config, Versions(list()), current_name, False)
+    try:
+        _build(argv, config, Versions(list()), current_name, False)
+    except SystemExit:
+        if EventHandlers.READ_CONFIG is None:
+            raise
+    finally:
+        EventHandlers.ABORT_AFTER_READ = False
+    return EventHandlers.READ_CONFIG
+
+
+def warm_up(*themes):
+    """Import modules Sphinx would otherwise import lazily in every child, so children start with them loaded.
+
+    The parent process acts as the template children are forked from. With the "forkserver" start method the same
+    modules are preloaded in the server (see workers.get_context()).
+
+    Safe to call repeatedly, only modules not yet imported are handled. Themes are only imported if they're registered
+    through the sphinx.html_themes entry point or listed in KNOWN_THEMES, other html_theme names (e.g. themes bundled
+    with Sphinx or in html_theme_path) aren't importable modules.
+
+    :param iter themes: The html_theme of each version.
+    """
+    log = logging.getLogger(__name__)
+    entry_points = {e.name: e.module_name for e in pkg_resources.iter_entry_points('sphinx.html_themes')}
+    modules = [entry_points.get(t, t) for t in themes if t in entry_points or t in KNOWN_THEMES]
+    names = [n for n in WARM_MODULES + tuple(modules) if n not in WARMED]
+    if not names:
+        return
+    WARMED.update(names)
+    workers.PRELOAD.update(names)
+
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except Exception:  # pylint: disable=broad-except
+            log.debug('Unable to pre-import module %s, children will handle it.', name, exc_info=True)
+
+
+def _limits(config):
+    """Get the limits of each child process' run time and memory.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+
+    :return: time_limit in seconds and memory_limit in bytes, the limits argument of the workers module.
+    :rtype: dict
+    """
+    return dict(time_limit=config.build_timeout, memory_limit=(config.memory_limit or 0) * 1024 * 1024 or None)
+
+
+def _run_child(func, args, config):
+    """Warm up the template process and run func in a child process (fresh or reused as configured).
+
+    :param function func: Function to run in the child.
+    :param tuple args: Arguments passed to func.
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+
+    :return: If func succeeded and its return value.
+    :rtype: tuple
+    """
+    warm_up()
+    return workers.run(func, args, config.start_method, config.worker_builds, _limits(config))
+
+
+def _profiled(config, task, current_name, phase):
+    """Wrap a child process task with cProfile if the profile_dir config value is set.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param tuple task: Function and tuple of arguments.
+    :param str current_name: The ref name of the current version.
+    :param str phase: Name of the phase for the profile file name.
+
+    :return: Function and tuple of arguments.
+    :rtype: tuple
+    """
+    if not config.profile_dir:
+        return task
+    return run_profiled, (profile_path(config.profile_dir, current_name, phase),) + tuple(task)
+
+
+def _build_task(config, source, target, versions, current_name, is_root):
+    """Get the function and arguments to run in a child process to build one version.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param str source: Source directory to pass to sphinx-build.
+    :param str target: Destination directory to write documentation to (passed to sphinx-build).
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param str current_name: The ref name of the current version being built.
+    :param bool is_root: Is this build in the web root?
+
+    :return: Function and tuple of arguments.
+    :rtype: tuple
+    """
+    log = logging.getLogger(__name__)
+    argv = ('sphinx-build', source, target)
+    if config.doctree_cache_dir:
+        doctrees = 'root_doctrees' if is_root else 'doctrees'
+        argv += ('-d', os.path.join(cache_dir(config.doctree_cache_dir, current_name), doctrees))
+    if workers.pickles_tasks(config.start_method, config.worker_builds):
+        versions = VersionsSnapshot.get(versions)
+    log.debug('Running sphinx-build for %s with args: %s', current_name, str(argv))
+    return _profiled(config, (_build, (argv, config, versions, current_name, is_root)), current_name,
+                     'root' if is_root else 'build')
 
 
 def build(source, target, versions, current_name, is_root):
@@ -234,18 +685,47 @@ def build(source, target, versions, current_name, is_root):
     :param bool is_root: Is this build in the web root?
     """
     log = logging.getLogger(__name__)
-    argv = ('sphinx-build', source, target)
     config = Config.from_context()
-
-    log.debug('Running sphinx-build for %s with args: %s', current_name, str(argv))
-    child = multiprocessing.Process(target=_build, args=(argv, config, versions, current_name, is_root))
-    child.start()
-    child.join()  # Block.
-    if child.exitcode != 0:
+    if not _run_child(*_build_task(config, source, target, versions, current_name, is_root), config=config)[0]:
         log.error('sphinx-build failed for branch/tag: %s', current_name)
         raise HandledError
 
 
+def build_parallel(builds, jobs):
+    """Build Sphinx docs for several versions, up to jobs at the same time. Builds are started in the order given.
+
+    Failed builds are logged but don't raise. If the caller stops iterating early, builds still running are terminated.
+    Builds exceeding the build_timeout or memory_limit config values fail like any other build.
+
+    :param list builds: Tuples of build() arguments (source, target, versions, current_name, is_root).
+    :param int jobs: Maximum number of sphinx-build child processes running at the same time.
+
+    :return: Yields the build() arguments of each build, if it succeeded, and seconds it took, as builds finish.
+    :rtype: iter
+    """
+    log = logging.getLogger(__name__)
+    config = Config.from_context()
+    tasks = [_build_task(config, *b) for b in builds]
+
+    def started(index):
+        """Log the start of a build.
+
+        :param int index: Index of the build in builds.
+        """
+        log.info('Building %s: %s', 'root' if builds[index][4] else 'ref', builds[index][3])
+
+    warm_up()
+    results = workers.run_parallel(tasks, jobs, config.start_method, config.worker_builds, started, _limits(config))
+    try:
+        for index, success, usage, seconds in results:
+            if not success:
+                log.error('sphinx-build failed for branch/tag: %s', builds[index][3])
+            timings.record_build(builds[index][3], builds[index][4], seconds, usage)
+            yield builds[index], success, seconds
+    finally:
+        results.close()
+
+
 def read_config(source, current_name):
     """Read the Sphinx config for one version.
 
@@ -258,18 +738,15 @@ def read_config(source, current_name):
     :rtype: dict
     """
     log = logging.getLogger(__name__)
-    queue = multiprocessing.Queue()
     config = Config.from_context()
 
     with TempDir() as temp_dir:
         argv = ('sphinx-build', source, temp_dir)
         log.debug('Running sphinx-build for config values with args: %s', str(argv))
-        child = multiprocessing.Process(target=_read_config, args=(argv, config, current_name, queue))
-        child.start()
-        child.join()  # Block.
-        if child.exitcode != 0:
+        task = _profiled(config, (_read_config, (argv, config, current_name)), current_name, 'read_config')
+        success, config = _run_child(*task, config=config)
+        if not success:
             log.error('sphinx-build failed for branch/tag while reading config: %s', current_name)
             raise HandledError
 
-    config = queue.get()
     return config
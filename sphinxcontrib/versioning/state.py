@@ -0,0 +1,225 @@
+"""Remember finished work of a build in a directory, to resume the build if it is interrupted."""
+
+import filecmp
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import sphinx
+
+from sphinxcontrib.versioning import __version__
+from sphinxcontrib.versioning.lib import RE_INVALID_FILENAME, write_file
+
+FILE_NAME = 'state.json'  # In the state directory, next to the "exported" directory.
+OUTPUT_SETTINGS = ('banner_greatest_tag', 'banner_main_ref', 'banner_recent_tag', 'greatest_tag', 'invert', 'overflow',
+                   'priority', 'recent_tag', 'root_ref', 'show_banner', 'sort')  # Config values affecting built files.
+
+
+def fingerprint(*values):
+    """Hash JSON serializable values.
+
+    :param values: Values to hash. Order matters.
+
+    :return: Hex digest.
+    :rtype: str
+    """
+    return hashlib.sha1(json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def settings_hash(config):
+    """Hash everything besides the docs themselves that affects sphinx-build output.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+
+    :return: Hex digest.
+    :rtype: str
+    """
+    return fingerprint([getattr(config, k) for k in OUTPUT_SETTINGS], __version__, sphinx.__version__)
+
+
+def versions_hash(versions):
+    """Hash what every built page shows of other versions (versions menu and banner).
+
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance after pre_build().
+
+    :return: Hex digest.
+    :rtype: str
+    """
+    keys = ('name', 'kind', 'root_dir', 'master_doc', 'found_docs')
+    remotes = [[list(r[k]) if k == 'found_docs' else r[k] for k in keys] for r in versions.remotes]
+    special = [r and r['name'] for r in (versions.greatest_tag_remote, versions.recent_branch_remote,
+                                         versions.recent_remote, versions.recent_tag_remote)]
+    return fingerprint(remotes, special)
+
+
+def output_files(target, exclude=()):
+    """List files in a built directory with their sizes.
+
+    :param str target: Directory sphinx-build wrote to.
+    :param iter exclude: Names of subdirectories in target to skip (root_dirs of other versions in the web root).
+
+    :return: Paths relative to target (keys) and sizes in bytes (values).
+    :rtype: dict
+    """
+    files = dict()
+    for root, dirs, names in os.walk(target):
+        if root == target:
+            dirs[:] = [d for d in dirs if d not in exclude]
+        for name in names:
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, target).replace(os.sep, '/')] = os.path.getsize(path)
+    return files
+
+
+def cache_dir(directory, name):
+    """Get the directory of one branch/tag in the doctree cache directory (see --doctree-cache-dir).
+
+    Named after the branch/tag with invalid characters replaced, plus a hash of the name so e.g. "feature/x" and
+    "feature_x" don't share a directory.
+
+    :param str directory: Doctree cache directory.
+    :param str name: Branch/tag name.
+
+    :return: Path with "source" (exported files) and "doctrees"/"root_doctrees" (passed to sphinx-build -d) inside.
+    :rtype: str
+    """
+    return os.path.join(directory, '{}-{}'.format(RE_INVALID_FILENAME.sub('_', name), fingerprint(name)[:8]))
+
+
+def _remove(path):
+    """Remove a file, symlink, or directory tree if it exists.
+
+    :param str path: Path to remove.
+    """
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def sync_tree(source, target):
+    """Make target a copy of source, only writing files whose contents differ so unchanged files keep their mtime.
+
+    Sphinx re-reads docs modified after it last read them. Exported files have the date of their last commit as mtime,
+    which may be older than the last build, so the exports are synced to a stable directory instead of built directly.
+
+    :param str source: Directory to copy, e.g. an exported commit.
+    :param str target: Directory to update. Created if missing.
+
+    :return: Number of files and symlinks written or removed.
+    :rtype: int
+    """
+    changed = 0
+    if not os.path.isdir(target) or os.path.islink(target):
+        _remove(target)
+        os.makedirs(target)
+    names = set(os.listdir(source))
+    for name in set(os.listdir(target)) - names:
+        _remove(os.path.join(target, name))
+        changed += 1
+    for name in sorted(names):
+        src, dst = os.path.join(source, name), os.path.join(target, name)
+        if os.path.islink(src):
+            if os.path.islink(dst) and os.readlink(dst) == os.readlink(src):
+                continue
+            _remove(dst)
+            os.symlink(os.readlink(src), dst)
+        elif os.path.isdir(src):
+            changed += sync_tree(src, dst)
+            continue
+        else:
+            if os.path.isfile(dst) and not os.path.islink(dst) and filecmp.cmp(src, dst, shallow=False):
+                continue
+            _remove(dst)
+            shutil.copyfile(src, dst)
+            shutil.copymode(src, dst)
+        changed += 1
+    return changed
+
+
+class BuildState(object):
+    """Exported commits, read configs, and finished builds stored in a state directory.
+
+    Exports are kept in the "exported" subdirectory until the build finishes. Everything else is stored in a JSON file,
+    written after every step so a killed build loses at most the version being worked on.
+
+    :ivar dict builds: Build targets relative to DESTINATION ("" for root, keys) and [inputs hash, output files] lists.
+    :ivar dict configs: read_config() results keyed by SHA, conf_rel_path, and settings hash.
+    :ivar str directory: Path to the state directory.
+    :ivar list exported: SHAs completely exported to the "exported" subdirectory.
+    """
+
+    def __init__(self, directory):
+        """Constructor. Reads the state file if it exists.
+
+        :param str directory: Path to the state directory. Created if missing.
+        """
+        log = logging.getLogger(__name__)
+        self.builds = dict()
+        self.configs = dict()
+        self.directory = directory
+        self.exported = list()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory, FILE_NAME)
+        if not os.path.isfile(path):
+            return
+        try:
+            with open(path) as handle:
+                state = json.load(handle)
+            self.builds = dict(state['builds'])
+            self.configs = dict(state['configs'])
+            self.exported = list(state['exported'])
+        except (IOError, KeyError, OSError, TypeError, ValueError):
+            log.warning('Ignoring unreadable state file: %s', path)
+
+    @property
+    def exported_root(self):
+        """Directory with exported commits as subdirectories."""
+        return os.path.join(self.directory, 'exported')
+
+    def save(self):
+        """Write the state file. Replaces the old file only after the new one is completely written."""
+        state = dict(builds=self.builds, configs=self.configs, exported=self.exported)
+        write_file(os.path.join(self.directory, FILE_NAME), json.dumps(state, sort_keys=True))
+
+    def is_complete(self, destination, target, inputs):
+        """Check if a build target was built from the same inputs and all its files are still there.
+
+        :param str destination: Destination directory of the whole build.
+        :param str target: Build target relative to destination. Empty string for the root ref.
+        :param str inputs: Hash of everything the build depends on.
+
+        :return: If the build can be skipped.
+        :rtype: bool
+        """
+        if self.builds.get(target, [None])[0] != inputs:
+            return False
+        base = os.path.join(destination, target)
+        for path, size in self.builds[target][1].items():
+            path = os.path.join(base, path)
+            if not os.path.isfile(path) or os.path.getsize(path) != size:
+                return False
+        return True
+
+    def record(self, destination, target, inputs, exclude=()):
+        """Record a finished build and save the state file.
+
+        :param str destination: Destination directory of the whole build.
+        :param str target: Build target relative to destination. Empty string for the root ref.
+        :param str inputs: Hash of everything the build depends on.
+        :param iter exclude: Names of subdirectories in target to skip (root_dirs of other versions in the web root).
+        """
+        self.builds[target] = [inputs, output_files(os.path.join(destination, target), exclude)]
+        self.save()
+
+    def cleanup(self):
+        """Remove exported commits after a finished build. Records of finished builds are kept."""
+        log = logging.getLogger(__name__)
+        log.debug('Removing: %s', self.exported_root)
+        if os.path.isdir(self.exported_root):
+            shutil.rmtree(self.exported_root)
+        self.exported = list()
+        self.save()
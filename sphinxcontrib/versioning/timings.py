@@ -0,0 +1,298 @@
+"""Measure where a run spends its time: wall time, CPU time, and peak memory of phases and builds."""
+
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+
+from sphinxcontrib.versioning import metrics
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows.
+
+CURRENT = None  # Timings instance recording this run. None if not enabled.
+GIT_COMMANDS = dict()  # git sub-commands (e.g. "archive") run by this process (keys) and how many times (values).
+PHASE_NAMES = list()  # Names of the phases running right now, innermost last. Also kept when not recording.
+PHASES = ('startup', 'environment', 'read', 'resolve', 'write', 'versions')  # See sphinx_.EventHandlers.mark().
+SLOWEST_BUILDS = 5  # Number of builds listed in the summary.
+
+
+def cpu_time():
+    """Get the CPU time (user and system) of this process and its finished child processes.
+
+    :return: Seconds.
+    :rtype: float
+    """
+    times = os.times()
+    return times[0] + times[1] + times[2] + times[3]
+
+
+def peak_rss(children=False):
+    """Get the peak resident set size of this process or of its largest finished child process.
+
+    :param bool children: Child processes instead of this process.
+
+    :return: Bytes. None if unknown.
+    :rtype: int
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Kilobytes everywhere else.
+
+
+def count_git(command):
+    """Count a git subprocess about to be spawned.
+
+    :param iter command: Command to run.
+    """
+    if len(command) > 1 and os.path.basename(command[0]) == 'git':
+        GIT_COMMANDS[command[1]] = GIT_COMMANDS.get(command[1], 0) + 1
+
+
+class Timings(object):
+    """Measurements of one run.
+
+    :ivar list builds: Dicts with name, root, wall, cpu, peak_rss, pages, and Sphinx phases of every sphinx-build run in
+        a child process.
+    :ivar list cached: Dicts with name and root of builds skipped because they were already built (--resume).
+    :ivar float cpu: CPU time of the process when recording started.
+    :ivar list failures: Dicts with name and phase (read_config, build, or root) of every failed branch/tag.
+    :ivar dict git: GIT_COMMANDS when recording started.
+    :ivar list phases: Dicts with name, wall, cpu, peak_rss, and git commands of every phase, in order of finishing.
+    :ivar dict sizes: Bytes of exported commits (exported) and built docs (output).
+    :ivar float wall: Unix time when recording started.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        self.builds = list()
+        self.cached = list()
+        self.cpu = cpu_time()
+        self.failures = list()
+        self.git = dict(GIT_COMMANDS)
+        self.phases = list()
+        self.sizes = dict()
+        self.wall = time.time()
+
+    @staticmethod
+    def git_since(before):
+        """Get the number of git commands run since a snapshot of GIT_COMMANDS.
+
+        :param dict before: Earlier copy of GIT_COMMANDS.
+
+        :return: Sub-commands and counts, only those run since.
+        :rtype: dict
+        """
+        return {k: v - before.get(k, 0) for k, v in GIT_COMMANDS.items() if v > before.get(k, 0)}
+
+    def report(self):
+        """Get all measurements.
+
+        :return: JSON serializable report.
+        :rtype: dict
+        """
+        git = self.git_since(self.git)
+        return dict(
+            builds=self.builds,
+            cached=self.cached,
+            cpu=round(cpu_time() - self.cpu, 3),
+            failures=self.failures,
+            git=git,
+            git_total=sum(git.values()),
+            peak_rss=max(peak_rss() or 0, peak_rss(True) or 0) or None,
+            phases=self.phases,
+            sizes=self.sizes,
+            started=round(self.wall, 3),
+            wall=round(time.time() - self.wall, 3),
+        )
+
+    def summary(self):
+        """Format the report for humans.
+
+        :return: Lines of text.
+        :rtype: list
+        """
+        report = self.report()
+        totals = dict()
+        for entry in report['phases']:
+            total = totals.setdefault(entry['name'], [0, 0.0, 0.0, 0])
+            total[0] += 1
+            total[1] += entry['wall']
+            total[2] += entry['cpu']
+            total[3] += sum(entry['git'].values())
+
+        lines = ['Timings: {:.1f}s wall, {:.1f}s CPU, peak RSS {}, {} git commands.'.format(
+            report['wall'], report['cpu'], format_bytes(report['peak_rss']), report['git_total'])]
+        for name in sorted(totals, key=lambda n: -totals[n][1]):
+            count, wall, cpu, git = totals[name]
+            lines.append('  {:<16} {:>8.1f}s wall {:>8.1f}s CPU {:>5} git{}'.format(
+                name, wall, cpu, git, ' ({}x)'.format(count) if count > 1 else ''))
+        phases, pages = dict(), sum(b['pages'] or 0 for b in report['builds'])
+        for build in report['builds']:
+            for name, seconds in (build['phases'] or dict()).items():
+                phases[name] = phases.get(name, 0.0) + seconds
+        if phases:
+            lines.append('  sphinx phases: {}'.format(', '.join(
+                '{} {:.1f}s'.format(n, phases.get(n, 0.0)) for n in PHASES)))
+            if pages:
+                lines.append('  versions menu overhead: {:.1f}ms per page ({} pages)'.format(
+                    phases.get('versions', 0.0) * 1000 / pages, pages))
+        for build in sorted(report['builds'], key=lambda b: -b['wall'])[:SLOWEST_BUILDS]:
+            lines.append('  build {:<10} {:>8.1f}s wall {:>8.1f}s CPU, peak RSS {}'.format(
+                ('root ' if build['root'] else '') + build['name'], build['wall'], build['cpu'] or 0,
+                format_bytes(build['peak_rss'])))
+        return lines
+
+
+def directory_size(path):
+    """Get the total size of all files in a directory, not counting .git directories (e.g. of the push clone).
+
+    :param str path: Directory.
+
+    :return: Bytes.
+    :rtype: int
+    """
+    total = 0
+    for root, dirs, names in os.walk(path):
+        dirs[:] = [d for d in dirs if d != '.git']
+        total += sum(os.path.getsize(os.path.join(root, n)) for n in names)
+    return total
+
+
+def format_bytes(value):
+    """Format a number of bytes for humans.
+
+    :param int value: Bytes. None if unknown.
+
+    :return: MiB with unit.
+    :rtype: str
+    """
+    return 'unknown' if value is None else '{:.0f} MiB'.format(value / 1024.0 / 1024)
+
+
+def start():
+    """Start recording if not already recording (e.g. the build sub command invoked by push).
+
+    :return: If recording was started by this call, making the caller responsible for calling finish().
+    :rtype: bool
+    """
+    global CURRENT  # pylint: disable=global-statement
+    if CURRENT is not None:
+        return False
+    CURRENT = Timings()
+    return True
+
+
+def finish(path, metrics_path=None):
+    """Stop recording, write the JSON report and/or metrics, and log the summary.
+
+    :param str path: Write the JSON report to this file. None to only write metrics.
+    :param str metrics_path: Write Prometheus metrics to this file. None to not write metrics.
+    """
+    global CURRENT  # pylint: disable=global-statement
+    log = logging.getLogger(__name__)
+    timings, CURRENT = CURRENT, None
+    if timings is None:
+        return
+    report = timings.report()
+    if metrics_path:
+        metrics.write(metrics_path, report)
+        log.info('Wrote metrics to: %s', metrics_path)
+    if not path:
+        return
+    with open(path, 'w') as handle:
+        json.dump(report, handle, indent=2, sort_keys=True)
+    for line in timings.summary():
+        log.info(line)
+    log.info('Wrote timings report to: %s', path)
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Measure a phase of the run (e.g. exporting all commits) while recording. Always tracked for current_phase().
+
+    Peak RSS is the peak of this process and its finished child processes up to the end of the phase.
+
+    :param str name: Name of the phase. Phases with the same name are added up in the summary.
+    """
+    PHASE_NAMES.append(name)
+    wall, cpu, git = time.time(), cpu_time(), dict(GIT_COMMANDS)
+    try:
+        yield
+    finally:
+        PHASE_NAMES.pop()
+        if CURRENT is not None:
+            CURRENT.phases.append(dict(
+                cpu=round(cpu_time() - cpu, 3),
+                git=Timings.git_since(git),
+                name=name,
+                peak_rss=max(peak_rss() or 0, peak_rss(True) or 0) or None,
+                wall=round(time.time() - wall, 3),
+            ))
+
+
+def current_phase():
+    """Get the name of the innermost phase running right now, recording or not.
+
+    :return: Phase name. None outside of phases.
+    :rtype: str
+    """
+    return PHASE_NAMES[-1] if PHASE_NAMES else None
+
+
+def record_build(name, is_root, seconds, usage):
+    """Record one sphinx-build run in a child process while recording.
+
+    :param str name: Branch/tag name.
+    :param bool is_root: Built in the web root.
+    :param float seconds: Wall time.
+    :param dict usage: CPU time (cpu), peak RSS (peak_rss), number of pages (pages) and seconds in each Sphinx phase
+        (phases) reported by the child. None if it failed.
+    """
+    if CURRENT is None:
+        return
+    usage = usage or dict()
+    CURRENT.builds.append(dict(
+        cpu=usage.get('cpu'),
+        name=name,
+        pages=usage.get('pages'),
+        peak_rss=usage.get('peak_rss'),
+        phases=usage.get('phases'),
+        root=is_root,
+        wall=round(seconds, 3),
+    ))
+
+
+def record_cached(name, is_root):
+    """Record a build skipped because it was already built while recording.
+
+    :param str name: Branch/tag name.
+    :param bool is_root: Built in the web root.
+    """
+    if CURRENT is not None:
+        CURRENT.cached.append(dict(name=name, root=is_root))
+
+
+def record_failure(name, phase_name):
+    """Record a branch/tag that failed while recording.
+
+    :param str name: Branch/tag name.
+    :param str phase_name: What failed: read_config, build, or root.
+    """
+    if CURRENT is not None:
+        CURRENT.failures.append(dict(name=name, phase=phase_name))
+
+
+def record_size(name, path):
+    """Add up the size of a directory while recording. Not measured when not recording.
+
+    :param str name: What the directory holds: exported or output.
+    :param str path: Directory.
+    """
+    if CURRENT is not None:
+        CURRENT.sizes[name] = CURRENT.sizes.get(name, 0) + directory_size(path)
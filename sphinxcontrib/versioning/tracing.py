@@ -0,0 +1,161 @@
+"""Trace git commands run by run_command(): duration, output size, and retries, with budgets per phase."""
+
+import contextlib
+import logging
+import os
+import re
+
+from sphinxcontrib.versioning import git
+from sphinxcontrib.versioning.timings import current_phase
+
+CURRENT = None  # GitTracer registered by start(). None if not tracing.
+RE_BUDGET = re.compile(r'^([\w.-]+)=(\d+)$')
+
+
+def parse_budgets(values):
+    """Parse git command budgets.
+
+    :raise ValueError: If a value is invalid.
+
+    :param iter values: Phase names and max git commands, e.g. "export=20".
+
+    :return: Max git commands (values) of phases (keys).
+    :rtype: dict
+    """
+    budgets = dict()
+    for value in values:
+        match = RE_BUDGET.match(value)
+        if not match:
+            raise ValueError('Invalid git budget "{}", expected phase=count (e.g. export=20).'.format(value))
+        budgets[match.group(1)] = int(match.group(2))
+    return budgets
+
+
+class GitTracer(object):
+    """Records every git command run by run_command() while registered in git.TRACERS.
+
+    Every attempt of a retried command counts as a git command against the budget of the phase it ran in (see
+    timings.phase()). Commands outside of phases are recorded with phase None and have no budget.
+
+    :ivar dict budgets: Max git commands (values) of phases (keys). Phases not in here are unlimited.
+    :ivar dict counts: Git commands (values) run in phases (keys).
+    :ivar list records: Dicts with code, command, cwd, output_bytes, over_budget, phase, retries, and seconds of every
+        command, in order of finishing.
+    :ivar str trace2_perf: Absolute path git appends GIT_TRACE2_PERF output to. None to not enable it.
+    """
+
+    def __init__(self, budgets=None, trace2_perf=None):
+        """Constructor.
+
+        :param dict budgets: Max git commands (values) of phases (keys).
+        :param str trace2_perf: File git appends GIT_TRACE2_PERF output to. None to not enable it.
+        """
+        self.budgets = dict(budgets or dict())
+        self.counts = dict()
+        self.records = list()
+        self.trace2_perf = os.path.abspath(trace2_perf) if trace2_perf else None  # Commands run in other directories.
+
+    def environ(self):
+        """Get environment variables to set in git commands.
+
+        :return: Variable names (keys) and values.
+        :rtype: dict
+        """
+        return dict(GIT_TRACE2_PERF=self.trace2_perf) if self.trace2_perf else dict()
+
+    def trace(self, record):
+        """Record a finished git command and flag it if its phase is over budget.
+
+        :param dict record: code, command, cwd, output_bytes, retries, and seconds from run_command().
+        """
+        log = logging.getLogger(__name__)
+        name = current_phase()
+        self.counts[name] = self.counts.get(name, 0) + 1 + record['retries']
+        budget = self.budgets.get(name)
+        record = dict(record, over_budget=budget is not None and self.counts[name] > budget, phase=name)
+        self.records.append(record)
+        if not record['over_budget']:
+            return
+        if self.counts[name] - record['retries'] - 1 <= budget:  # First command over budget.
+            log.warning('Phase %s exceeded its budget of %d git commands with: %s', name, budget,
+                        ' '.join(record['command']))
+        else:
+            log.debug('Phase %s over its budget of %d git commands with: %s', name, budget,
+                      ' '.join(record['command']))
+
+    def over_budget(self):
+        """Get phases that ran more git commands than their budget.
+
+        :return: Phase names (keys) and git commands run (values).
+        :rtype: dict
+        """
+        return {n: c for n, c in self.counts.items() if n in self.budgets and c > self.budgets[n]}
+
+    def summary(self):
+        """Format git commands per phase for humans.
+
+        :return: Lines of text.
+        :rtype: list
+        """
+        seconds = dict()
+        for record in self.records:
+            seconds[record['phase']] = seconds.get(record['phase'], 0.0) + record['seconds']
+        lines = ['Git commands: {} in {:.1f}s.'.format(sum(self.counts.values()), sum(seconds.values()))]
+        for name in sorted(self.counts, key=lambda n: -seconds[n]):
+            budget = ' (budget {})'.format(self.budgets[name]) if name in self.budgets else ''
+            lines.append('  {:<16} {:>5} git {:>8.1f}s{}'.format(
+                name or '(no phase)', self.counts[name], seconds[name], budget))
+        return lines
+
+
+def start(budgets=None, trace2_perf=None):
+    """Register a new GitTracer if none is registered yet (e.g. the build sub command invoked by push).
+
+    :param dict budgets: Max git commands (values) of phases (keys).
+    :param str trace2_perf: File git appends GIT_TRACE2_PERF output to. None to not enable it.
+
+    :return: The new tracer, making the caller responsible for calling finish(). None if already tracing.
+    :rtype: GitTracer
+    """
+    global CURRENT  # pylint: disable=global-statement
+    if CURRENT is not None:
+        return None
+    CURRENT = GitTracer(budgets, trace2_perf)
+    git.TRACERS.append(CURRENT)
+    return CURRENT
+
+
+def finish(tracer):
+    """Unregister a tracer and log its summary and phases over budget.
+
+    :param GitTracer tracer: From start().
+    """
+    global CURRENT  # pylint: disable=global-statement
+    log = logging.getLogger(__name__)
+    if tracer is not CURRENT:
+        return
+    CURRENT = None
+    git.TRACERS.remove(tracer)
+    for line in tracer.summary():
+        log.info(line)
+    for name, count in sorted(tracer.over_budget().items()):
+        log.warning('Phase %s ran %d git commands, over its budget of %d.', name, count, tracer.budgets[name])
+    if tracer.trace2_perf:
+        log.info('Git wrote GIT_TRACE2_PERF output to: %s', tracer.trace2_perf)
+
+
+@contextlib.contextmanager
+def trace(budgets=None):
+    """Record git commands run in the with block, e.g. to assert on the number of git commands per phase in tests.
+
+    :param dict budgets: Max git commands (values) of phases (keys).
+
+    :return: Registered tracer, unregistered without logging when the with block exits.
+    :rtype: GitTracer
+    """
+    tracer = GitTracer(budgets)
+    git.TRACERS.append(tracer)
+    try:
+        yield tracer
+    finally:
+        git.TRACERS.remove(tracer)
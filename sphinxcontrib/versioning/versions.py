@@ -2,97 +2,373 @@
 
 import re
 
+PEP440_PRE = dict(a=0, alpha=0, b=1, beta=1, c=2, pre=2, preview=2, rc=2)  # Pre-release spellings and their order.
+RE_PEP440 = re.compile(
+    r'^v?(?:(\d+)!)?(\d+(?:\.\d+)*)'  # Epoch and release.
+    r'(?:[-_.]?(a|alpha|b|beta|c|pre|preview|rc)[-_.]?(\d*))?'  # Pre-release.
+    r'(?:-(\d+)|[-_.]?(?:post|rev|r)[-_.]?(\d*))?'  # Post-release.
+    r'(?:[-_.]?dev[-_.]?(\d*))?'  # Development release.
+    r'(?:\+([a-z0-9]+(?:[-_.][a-z0-9]+)*))?$',  # Local version.
+    re.IGNORECASE
+)
 RE_SEMVER = re.compile(r'^v?V?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:\.(\d+))?(?:\.(\d+))?(?:\.(\d+))?(?:\.(\d+))?([\w.+-]*)$')
+SORT_KEYS = dict(pep440=dict(), semver=dict())  # Parsed version keys (values) of branch/tag names (keys) by sort kind.
 
 
-def semvers(names):
-    """Parse versions into integers and convert non-integer meta indicators into integers with ord().
+def semver_key(name):
+    """Parse a version into a sort key. Keys of valid versions sort before invalid ones, highest version first.
+
+    Version numbers are inverted so the highest sorts first. The rest of the name (meta indicators such as b3) sorts
+    alphabetically, versions without one first. Keys are cached per name.
+
+    :param str name: Branch/tag name.
+
+    :return: Parsed version. E.g. v1.10.0b3 -> (0, (-1, -10, 0, 0, 0, 0, 0), 'b3'), master -> (1, (), '').
+    :rtype: tuple
+    """
+    cache = SORT_KEYS['semver']
+    if name not in cache:
+        match = RE_SEMVER.match(name)
+        if match:
+            groups = match.groups()
+            cache[name] = (0, tuple(-int(i or 0) for i in groups[:-1]), groups[-1])
+        else:
+            cache[name] = (1, (), '')
+    return cache[name]
+
+
+def pep440_key(name):
+    """Parse a PEP 440 version into a sort key. Keys of valid versions sort after invalid ones, lowest version first.
 
-    Each return list item has an indicator as the first item. 0 for valid versions and 1 for invalid. Can be used to
-    sort non-version names (e.g. master, feature_branch, etc) after valid versions. No sorting is done in this function
-    though.
+    Sort with reverse=True for the highest version first and invalid ones last. Keys are cached per name.
 
-    Read multi_sort() docstring for reasoning behind inverted integers in version_ints variable.
+    :param str name: Branch/tag name.
+
+    :return: Parsed version. E.g. v1.10.0rc1 -> (1, 0, (1, 10), (2, 1), -1, (1, 0), ()), master -> (0,).
+    :rtype: tuple
+    """
+    cache = SORT_KEYS['pep440']
+    if name not in cache:
+        match = RE_PEP440.match(name)
+        if not match:
+            cache[name] = (0,)
+            return cache[name]
+        epoch, release, pre_letter, pre, post_implicit, post, dev, local = match.groups()
+        release = [int(i) for i in release.split('.')]
+        while len(release) > 1 and not release[-1]:
+            release.pop()  # 1.0 == 1.0.0
+        post = post_implicit or post
+        if pre_letter:
+            pre_key = (PEP440_PRE[pre_letter.lower()], int(pre or 0))
+        elif dev is not None and post is None:
+            pre_key = (-1, 0)  # 1.0.dev1 < 1.0a1
+        else:
+            pre_key = (3, 0)  # 1.0rc1 < 1.0
+        cache[name] = (
+            1,
+            int(epoch or 0),
+            tuple(release),
+            pre_key,
+            -1 if post is None else int(post or 0),
+            (1, 0) if dev is None else (0, int(dev or 0)),  # 1.0.dev1 < 1.0
+            tuple((1, int(p), '') if p.isdigit() else (0, 0, p.lower()) for p in re.split(r'[-_.]', local or '') if p),
+        )
+    return cache[name]
+
+
+def semvers(names):
+    """Parse versions with semver_key(). No sorting is done in this function.
 
     :param iter names: List of strings representing versions/tags/branches.
 
-    :return: List of parsed versions. E.g. v1.10.0b3 -> [0, 1, 10, 0, ord('b'), ord('3')]
+    :return: List of parsed versions.
     :rtype: list
     """
-    matches = [(RE_SEMVER.findall(n) or [[]])[0] for n in names]
-    max_len_ints = 0
-    max_len_str = 0
-
-    # Get max lens for padding.
-    for match in (m for m in matches if m):
-        max_len_ints = len(match)  # Never changes.
-        max_len_str = max(max_len_str, len(match[-1]))
-    if not max_len_ints:
-        return matches  # Nothing to do, all empty.
-    invalid_template = [1] + [0] * (max_len_ints + max_len_str - 1)
-
-    # Parse.
-    exploded_semver = list()
-    for match in matches:
-        if not match:
-            exploded_semver.append(invalid_template[:])
-            continue
-        version_ints = [-int(i or 0) for i in match[:-1]]
-        ints_of_str = [ord(i) for i in match[-1]] + [0] * (max_len_str - len(match[-1]))
-        exploded_semver.append([0] + version_ints + ints_of_str)
+    return [semver_key(n) for n in names]
 
-    return exploded_semver
+
+def version_sort_kind(sort):
+    """Get how to compare version numbers, e.g. to find the greatest tag.
+
+    :param iter sort: Sort conditions. See multi_sort().
+
+    :return: pep440 if it's one of the conditions, otherwise semver.
+    :rtype: str
+    """
+    return 'pep440' if sort and 'pep440' in [s.strip().lower() for s in sort] else 'semver'
 
 
 def multi_sort(remotes, sort):
     """Sort `remotes` in place. Allows sorting by multiple conditions.
 
-    This is needed because Python 3 no longer supports sorting lists of multiple types. Sort keys must all be of the
-    same type.
+    Sorts once per condition, last one first. Python's sort is stable so equal values of one condition keep the order
+    of the conditions after it.
 
-    Problem: the user expects versions to be sorted latest first and timelogical to be most recent first (when viewing
-    the HTML documentation), yet expects alphabetical sorting to be A before Z.
-    Solution: invert integers (dates and parsed versions).
+    The user expects versions to be sorted latest first and timelogical to be most recent first (when viewing the HTML
+    documentation), yet expects alphabetical sorting to be A before Z.
 
-    :param iter remotes: List of dicts from Versions().remotes.
-    :param iter sort: What to sort by. May be one or more of: alpha, time, semver
+    :param iter remotes: List of Remotes from Versions().remotes.
+    :param iter sort: What to sort by. May be one or more of: alpha, time, semver, pep440
     """
-    exploded_alpha = list()
-    exploded_semver = list()
-
-    # Convert name to int if alpha is in sort.
-    if 'alpha' in sort:
-        alpha_max_len = max(len(r['name']) for r in remotes)
-        for name in (r['name'] for r in remotes):
-            exploded_alpha.append([ord(i) for i in name] + [0] * (alpha_max_len - len(name)))
-
-    # Parse versions if semver is in sort.
-    if 'semver' in sort:
-        exploded_semver = semvers(r['name'] for r in remotes)
-
-    # Build sort_mapping dict.
-    sort_mapping = dict()
-    for i, remote in enumerate(remotes):
-        key = list()
-        for sort_by in sort:
-            if sort_by == 'alpha':
-                key.extend(exploded_alpha[i])
-            elif sort_by == 'time':
-                key.append(-remote['date'])
-            elif sort_by == 'semver':
-                key.extend(exploded_semver[i])
-        sort_mapping[id(remote)] = key
-
-    # Sort.
-    remotes.sort(key=lambda k: sort_mapping.get(id(k)))
+    for sort_by in reversed(list(sort)):
+        if sort_by == 'alpha':
+            remotes.sort(key=lambda r: r.name)
+        elif sort_by == 'time':
+            remotes.sort(key=lambda r: r.date, reverse=True)
+        elif sort_by == 'semver':
+            remotes.sort(key=lambda r: semver_key(r.name))
+        elif sort_by == 'pep440':
+            remotes.sort(key=lambda r: pep440_key(r.name), reverse=True)
+
+
+class PageTable(object):
+    """Page names (found_docs) of all versions in a run and their IDs. Versions store sets of page IDs as bitsets.
+
+    Each name is stored once no matter how many versions have the page. IDs are assigned in sorted order of the names
+    added together, so the same docs get the same IDs every run.
+
+    :ivar dict ids: Page names (keys) and their IDs (values).
+    :ivar list names: Page names, index is the ID.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        self.ids = dict()
+        self.names = list()
+
+    def encode(self, names):
+        """Convert page names into a bitset, adding new names to the table.
+
+        :param iter names: Page names.
+
+        :return: Bitset, bit N of byte N // 8 set for ID N. No trailing zero bytes, so equal sets are equal bytes.
+        :rtype: bytes
+        """
+        ids, names = self.ids, set(names)
+        for name in sorted(n for n in names if n not in ids):
+            ids[name] = len(self.names)
+            self.names.append(name)
+        bits = bytearray((max(ids[n] for n in names) // 8 + 1) if names else 0)
+        for name in names:
+            page_id = ids[name]
+            bits[page_id >> 3] |= 1 << (page_id & 7)
+        return bytes(bits)
+
+    def decode(self, bits):
+        """Convert a bitset into page names.
+
+        :param bytes bits: From encode().
+
+        :return: Sorted page names.
+        :rtype: tuple
+        """
+        names = self.names
+        return tuple(sorted(names[i * 8 + b] for i, byte in enumerate(bytearray(bits)) if byte
+                            for b in range(8) if byte >> b & 1))
+
+    def contains(self, bits, name):
+        """Check if a page is in a bitset in constant time.
+
+        :param bytes bits: From encode().
+        :param str name: Page name.
+
+        :return: If name is in the set.
+        :rtype: bool
+        """
+        page_id = self.ids.get(name)
+        if page_id is None:
+            return False
+        byte = bits[page_id >> 3:(page_id >> 3) + 1]
+        return bool(byte) and bool(ord(byte) >> (page_id & 7) & 1)
+
+
+class Remote(object):
+    """One branch/tag. Supports dict-style access (remote['name']) like the dicts it replaces, used by templates.
+
+    Uses __slots__ instead of a dict per remote and stores found_docs as a bitset of IDs in a PageTable shared with all
+    other remotes, keeping memory and pickle size (sent to every child process) small for thousands of versions with
+    thousands of pages.
+
+    :ivar str conf_rel_path: Relative path (to git root) of conf.py.
+    :ivar int date: Unix time of the commit.
+    :ivar bytes docs: found_docs as a bitset of page IDs in pages.
+    :ivar tuple found_docs: Sorted names of all pages. Set by pre_build().
+    :ivar str id: kind/name, e.g. heads/master.
+    :ivar str kind: heads or tags.
+    :ivar str master_doc: Sphinx master_doc. Set by pre_build().
+    :ivar str name: Branch/tag name.
+    :ivar PageTable pages: Page names and IDs of all remotes.
+    :ivar str root_dir: Subdirectory of the web root this version is built in. Set by pre_build().
+    :ivar str sha: Commit SHA.
+    """
+
+    KEYS = ('conf_rel_path', 'date', 'found_docs', 'id', 'kind', 'master_doc', 'name', 'root_dir', 'sha')
+    __slots__ = ('conf_rel_path', 'date', 'docs', 'id', 'kind', 'master_doc', 'name', 'pages', 'root_dir', 'sha')
+
+    def __init__(self, sha, name, kind, date, conf_rel_path, pages=None):
+        """Constructor.
+
+        :param str sha: Commit SHA.
+        :param str name: Branch/tag name.
+        :param str kind: heads or tags.
+        :param int date: Unix time of the commit.
+        :param str conf_rel_path: Relative path (to git root) of conf.py.
+        :param PageTable pages: Page table shared with other remotes. A new one if None.
+        """
+        self.conf_rel_path = conf_rel_path
+        self.date = date
+        self.docs = bytes()
+        self.id = '/'.join((kind, name))
+        self.kind = kind
+        self.master_doc = 'contents'
+        self.name = name
+        self.pages = PageTable() if pages is None else pages
+        self.root_dir = name
+        self.sha = sha
+
+    @property
+    def found_docs(self):
+        """Sorted names of all pages."""
+        return self.pages.decode(self.docs)
+
+    @found_docs.setter
+    def found_docs(self, value):
+        """Set names of all pages.
+
+        :param iter value: Page names.
+        """
+        self.docs = self.pages.encode(value)
+
+    def __contains__(self, key):
+        """Implement 'key in remote'.
+
+        :param str key: Key to look for.
+
+        :return: If key is one of KEYS.
+        :rtype: bool
+        """
+        return key in self.KEYS
+
+    def __eq__(self, other):
+        """Compare all values, like dicts do.
+
+        :param other: Other remote.
+
+        :return: If both have the same values.
+        :rtype: bool
+        """
+        if other.__class__ is not self.__class__:
+            return False
+        if other.pages is self.pages:  # Same page IDs, compare bitsets instead of decoding them.
+            return self.__getstate__() == other.__getstate__()
+        return self.items() == other.items()
+
+    def __ne__(self, other):
+        """Python 2.x."""
+        return not self == other
+
+    __hash__ = None  # Mutable, like dicts.
+
+    def __getitem__(self, key):
+        """Implement remote[key].
+
+        :raise KeyError: If key isn't one of KEYS.
+
+        :param str key: Name of the value.
+
+        :return: Value.
+        """
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        """Implement remote[key] = value.
+
+        :raise KeyError: If key isn't one of KEYS.
+
+        :param str key: Name of the value.
+        :param value: New value.
+        """
+        if key not in self.KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __getstate__(self):
+        """Pickle as a tuple of values instead of a dict of slots. The page table is pickled once for all remotes.
+
+        :return: Values in __slots__ order.
+        :rtype: tuple
+        """
+        return tuple(getattr(self, k) for k in self.__slots__)
+
+    def __setstate__(self, state):
+        """Unpickle.
+
+        :param tuple state: From __getstate__().
+        """
+        for key, value in zip(self.__slots__, state):
+            setattr(self, key, value)
+
+    def __repr__(self):
+        """Class representation."""
+        return '<{}.{} {}>'.format(self.__class__.__module__, self.__class__.__name__, self.id)
+
+    def has_doc(self, name):
+        """Check if this version has a page in constant time.
+
+        :param str name: Page name.
+
+        :return: If name is in found_docs.
+        :rtype: bool
+        """
+        return self.pages.contains(self.docs, name)
+
+    def get(self, key, default=None):
+        """Get a value like dict.get().
+
+        :param str key: Name of the value.
+        :param default: Returned if key isn't one of KEYS.
+
+        :return: Value.
+        """
+        return getattr(self, key) if key in self.KEYS else default
+
+    def items(self):
+        """Get names and values like dict.items(), sorted by name.
+
+        :return: List of tuples.
+        :rtype: list
+        """
+        return [(k, getattr(self, k)) for k in self.KEYS]
+
+    def keys(self):
+        """Get names of the values like dict.keys(), sorted.
+
+        :return: KEYS
+        :rtype: tuple
+        """
+        return self.KEYS
+
+    def update(self, pairs):
+        """Set values like dict.update() with an iterable of (key, value) pairs or a dict.
+
+        :raise KeyError: If a key isn't one of KEYS.
+
+        :param pairs: Dict or iterable of (key, value) tuples.
+        """
+        for key, value in (pairs.items() if hasattr(pairs, 'items') else pairs):
+            self[key] = value
 
 
 class Versions(object):
     """Iterable class that holds all versions and handles sorting and filtering. To be fed into Sphinx's Jinja2 env.
 
-    :ivar iter remotes: List of dicts for every branch/tag.
+    :ivar iter remotes: List of Remote instances for every branch/tag.
+    :ivar PageTable pages: Page names of all remotes.
     :ivar dict context: Current Jinja2 context, provided by Sphinx's html-page-context API hook.
-    :ivar dict greatest_tag_remote: Tag with the highest version number if it's a valid semver.
+    :ivar tuple links_cache: Key of the current page and links() of it.
+    :ivar dict greatest_tag_remote: Tag with the highest version number if it's a valid semver/PEP 440 version.
     :ivar dict recent_branch_remote: Most recently committed branch.
     :ivar dict recent_remote: Most recently committed branch/tag.
     :ivar dict recent_tag_remote: Most recently committed tag.
@@ -101,23 +377,15 @@ class Versions(object):
     def __init__(self, remotes, sort=None, priority=None, invert=False):
         """Constructor.
 
-        :param iter remotes: Output of routines.gather_git_info(). Converted to list of dicts as instance variable.
-        :param iter sort: List of strings (order matters) to sort remotes by. Strings may be: alpha, time, semver
+        :param iter remotes: Output of routines.gather_git_info(). Converted to list of Remotes as instance variable.
+        :param iter sort: List of strings (order matters) to sort remotes by. See multi_sort() for valid strings.
         :param str priority: May be "branches" or "tags". Groups either before the other. Maintains order otherwise.
         :param bool invert: Invert sorted/grouped remotes at the end of processing.
         """
-        self.remotes = [dict(
-            id='/'.join(r[2:0:-1]),  # str; kind/name
-            sha=r[0],  # str
-            name=r[1],  # str
-            kind=r[2],  # str
-            date=r[3],  # int
-            conf_rel_path=r[4],  # str
-            found_docs=tuple(),  # tuple of str
-            master_doc='contents',  # str
-            root_dir=r[1],  # str
-        ) for r in remotes]
+        self.pages = PageTable()
+        self.remotes = [Remote(*r[:5], pages=self.pages) for r in remotes]
         self.context = dict()
+        self.links_cache = (None, None)
         self.greatest_tag_remote = None
         self.recent_branch_remote = None
         self.recent_remote = None
@@ -129,9 +397,9 @@ class Versions(object):
 
         # Priority.
         if priority == 'branches':
-            self.remotes.sort(key=lambda r: 1 if r['kind'] == 'tags' else 0)
+            self.remotes.sort(key=lambda r: 1 if r.kind == 'tags' else 0)
         elif priority == 'tags':
-            self.remotes.sort(key=lambda r: 0 if r['kind'] == 'tags' else 1)
+            self.remotes.sort(key=lambda r: 0 if r.kind == 'tags' else 1)
 
         # Invert.
         if invert:
@@ -142,12 +410,13 @@ class Versions(object):
             remotes = self.remotes[:]
             multi_sort(remotes, ('time',))
             self.recent_remote = remotes[0]
-            self.recent_branch_remote = ([r for r in remotes if r['kind'] != 'tags'] or [None])[0]
-            self.recent_tag_remote = ([r for r in remotes if r['kind'] == 'tags'] or [None])[0]
+            self.recent_branch_remote = ([r for r in remotes if r.kind != 'tags'] or [None])[0]
+            self.recent_tag_remote = ([r for r in remotes if r.kind == 'tags'] or [None])[0]
             if self.recent_tag_remote:
-                multi_sort(remotes, ('semver',))
-                greatest_tag_remote = [r for r in remotes if r['kind'] == 'tags'][0]
-                if RE_SEMVER.search(greatest_tag_remote['name']):
+                version_sort = version_sort_kind(sort)
+                multi_sort(remotes, (version_sort,))
+                greatest_tag_remote = [r for r in remotes if r.kind == 'tags'][0]
+                if (RE_PEP440 if version_sort == 'pep440' else RE_SEMVER).match(greatest_tag_remote.name):
                     self.greatest_tag_remote = greatest_tag_remote
 
     def __bool__(self):
@@ -165,10 +434,19 @@ class Versions(object):
     def __getitem__(self, item):
         """Retrieve a version dict from self.remotes by any of its attributes."""
         # First assume item is an attribute.
-        for key in ('id', 'sha', 'name', 'date'):
-            for remote in self.remotes:
-                if remote[key] == item:
-                    return remote
+        remotes = self.remotes
+        for remote in remotes:
+            if remote.id == item:
+                return remote
+        for remote in remotes:
+            if remote.sha == item:
+                return remote
+        for remote in remotes:
+            if remote.name == item:
+                return remote
+        for remote in remotes:
+            if remote.date == item:
+                return remote
         # Next assume item is a substring of a sha.
         try:
             length = len(item)
@@ -176,7 +454,7 @@ class Versions(object):
             length = 0
         if length >= 5:
             for remote in self.remotes:
-                if item in remote['sha']:
+                if item in remote.sha:
                     return remote
         # Finally assume it's an index. Raises IndexError if item is int.
         try:
@@ -188,19 +466,37 @@ class Versions(object):
 
     def __iter__(self):
         """Yield name and urls of branches and tags."""
-        for remote in self.remotes:
-            name = remote['name']
-            yield name, self.vpathto(name)
+        return iter(self.links()[0])
 
     @property
     def branches(self):
         """Return list of (name and urls) only branches."""
-        return [(r['name'], self.vpathto(r['name'])) for r in self.remotes if r['kind'] == 'heads']
+        return self.links()[1]
 
     @property
     def tags(self):
         """Return list of (name and urls) only tags."""
-        return [(r['name'], self.vpathto(r['name'])) for r in self.remotes if r['kind'] == 'tags']
+        return self.links()[2]
+
+    def links(self):
+        """Get names and urls of all remotes for the current page, computed once per page in one pass.
+
+        Templates evaluate versions.branches and versions.tags more than once per page (if and for).
+
+        :return: Lists of (name, url) tuples for all remotes, branches, and tags.
+        :rtype: tuple
+        """
+        if not self.remotes:
+            return list(), list(), list()
+        key = (self.context['current_version'], self.context['pagename'], self.context['scv_is_root'])
+        if self.links_cache[0] != key:
+            everything, branches, tags = list(), list(), list()
+            for remote in self.remotes:
+                link = (remote.name, self._vpathto_remote(remote))
+                everything.append(link)
+                (tags if remote.kind == 'tags' else branches).append(link)
+            self.links_cache = (key, (everything, branches, tags))
+        return self.links_cache[1]
 
     def vhasdoc(self, other_version):
         """Return True if the other version has the current document. Like Sphinx's hasdoc().
@@ -214,7 +510,7 @@ class Versions(object):
         """
         if self.context['current_version'] == other_version:
             return True
-        return self.context['pagename'] in self[other_version]['found_docs']
+        return self[other_version].has_doc(self.context['pagename'])
 
     def vpathto(self, other_version):
         """Return relative path to current document in another version. Like Sphinx's pathto().
@@ -225,17 +521,29 @@ class Versions(object):
 
         :param str other_version: Version to link to.
 
+        :return: Relative path.
+        :rtype: str
+        """
+        if self.context['current_version'] == other_version and not self.context['scv_is_root']:
+            return '{}.html'.format(self.context['pagename'].split('/')[-1])
+        return self._vpathto_remote(self[other_version])
+
+    def _vpathto_remote(self, other_remote):
+        """Return relative path to current document in another version, without looking it up by name.
+
+        :param Remote other_remote: Version to link to.
+
         :return: Relative path.
         :rtype: str
         """
         is_root = self.context['scv_is_root']
         pagename = self.context['pagename']
-        if self.context['current_version'] == other_version and not is_root:
+        is_current = self.context['current_version'] == other_remote.name
+        if is_current and not is_root:
             return '{}.html'.format(pagename.split('/')[-1])
 
-        other_remote = self[other_version]
-        other_root_dir = other_remote['root_dir']
+        other_root_dir = other_remote.root_dir
         components = ['..'] * pagename.count('/')
         components += [other_root_dir] if is_root else ['..', other_root_dir]
-        components += [pagename if self.vhasdoc(other_version) else other_remote['master_doc']]
+        components += [pagename if is_current or other_remote.has_doc(pagename) else other_remote.master_doc]
         return '{}.html'.format(__import__('posixpath').join(*components))
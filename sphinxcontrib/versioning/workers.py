@@ -0,0 +1,373 @@
+"""Run functions (Sphinx builds) in child processes for isolation."""
+
+import atexit
+import gc
+import logging
+import multiprocessing
+import sys
+import threading
+import time
+import traceback
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # Python 2.x.
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows.
+
+IDLE_WORKERS = list()  # Workers waiting for their next task.
+LOCK = threading.Lock()  # Guards IDLE_WORKERS, run() may be called from more than one thread (e.g. the watch daemon).
+POLL_INTERVAL = 0.5  # Seconds.
+PRELOAD = set()  # Modules the forkserver imports once before forking children (forkserver only).
+START_METHODS = ('fork', 'forkserver', 'spawn')
+
+
+def get_context(start_method=None):
+    """Get the multiprocessing context for a start method. The forkserver preloads the modules in PRELOAD.
+
+    :param str start_method: One of START_METHODS. None for the platform default.
+
+    :return: Multiprocessing context (or the multiprocessing module itself on Python 2.x).
+    """
+    if not hasattr(multiprocessing, 'get_context'):  # Python 2.x only supports the default.
+        return multiprocessing
+    ctx = multiprocessing.get_context(start_method)
+    if PRELOAD and ctx.get_start_method() == 'forkserver':
+        ctx.set_forkserver_preload(sorted(PRELOAD))
+    return ctx
+
+
+def pickles_tasks(start_method=None, max_builds=1):
+    """Determine if task arguments will be pickled to reach the child process.
+
+    Only children forked for a single task inherit their arguments without pickling.
+
+    :param str start_method: One of START_METHODS. None for the platform default.
+    :param int max_builds: Number of tasks each worker runs before exiting.
+
+    :return: If arguments are pickled.
+    :rtype: bool
+    """
+    if max_builds > 1:
+        return True
+    ctx = get_context(start_method)
+    return getattr(ctx, 'get_start_method', lambda: 'fork')() != 'fork'
+
+
+def available_memory():
+    """Get the amount of memory available for new processes without swapping.
+
+    :return: Bytes. None if unknown (only supported on Linux).
+    :rtype: int
+    """
+    try:
+        with open('/proc/meminfo') as handle:
+            for line in handle:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+
+def peak_child_memory():
+    """Get the peak resident set size of the largest child process that exited so far.
+
+    :return: Bytes. 0 if unknown.
+    :rtype: int
+    """
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Kilobytes everywhere else.
+
+
+def limit_memory(memory_limit):
+    """Limit the memory of the current process. Allocations beyond the limit raise MemoryError.
+
+    Sets RLIMIT_AS (address space, enforced by Linux) and RLIMIT_RSS (resident set size, enforced by some other
+    platforms). Ignored where neither is supported.
+
+    :param int memory_limit: Bytes.
+    """
+    if resource is None:
+        return
+    for name in ('RLIMIT_AS', 'RLIMIT_RSS'):
+        if not hasattr(resource, name):
+            continue
+        hard = resource.getrlimit(getattr(resource, name))[1]
+        soft = memory_limit if hard == resource.RLIM_INFINITY else min(memory_limit, hard)
+        try:
+            resource.setrlimit(getattr(resource, name), (soft, hard))
+        except (OSError, ValueError):
+            pass
+
+
+def _main(results, tasks, task, max_builds, memory_limit=None):
+    """Child process entry point. Run tasks and send (success, return value) tuples to the parent.
+
+    Exits after max_builds tasks or after the first failed task, since the process' state is unknown after a failure.
+
+    :param multiprocessing.queues.Queue results: Communication channel to parent process.
+    :param multiprocessing.queues.Queue tasks: Subsequent tasks from the parent process. None if max_builds is 1.
+    :param tuple task: First task to run. Function and tuple of arguments.
+    :param int max_builds: Run this many tasks before exiting.
+    :param int memory_limit: Limit the child's memory to this many bytes. None for no limit.
+    """
+    if hasattr(gc, 'freeze'):  # Python 3.7+.
+        gc.freeze()  # Objects inherited from the parent are never collected here, so their memory pages stay shared.
+    if memory_limit:
+        limit_memory(memory_limit)
+    for builds in range(1, max_builds + 1):
+        func, args = task
+        try:
+            results.put((True, func(*args)))
+        except SystemExit as exc:
+            results.put((not exc.code, None))
+            return
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            results.put((False, None))
+            return
+        if builds == max_builds:
+            return
+        task = tasks.get()
+        if task is None:
+            return
+
+
+class Worker(object):
+    """Child process which runs tasks sent to it by the parent process.
+
+    :ivar int builds: Number of tasks submitted to this worker.
+    :ivar float deadline: Unix time the current task must finish by. None for no time limit.
+    :ivar int max_builds: Exit the child process after this many tasks.
+    :ivar int memory_limit: Memory limit of the child process in bytes. None for no limit.
+    :ivar multiprocessing.Process process: The child process.
+    :ivar multiprocessing.queues.Queue results: Results of tasks sent by the child.
+    :ivar str start_method: Start method used for the child process.
+    :ivar multiprocessing.queues.Queue tasks: Tasks sent to the child after the first one.
+    :ivar int time_limit: Seconds each task may run before the child process is terminated. None for no limit.
+    """
+
+    def __init__(self, task, start_method=None, max_builds=1, limits=None):
+        """Constructor. Starts the child process with its first task.
+
+        :param tuple task: First task to run. Function and tuple of arguments.
+        :param str start_method: One of START_METHODS. None for the platform default.
+        :param int max_builds: Number of tasks to run before exiting.
+        :param dict limits: Optional time_limit and memory_limit, see run().
+        """
+        ctx = get_context(start_method)
+        self.builds = 1
+        self.max_builds = max_builds
+        self.memory_limit = (limits or dict()).get('memory_limit')
+        self.results = ctx.Queue()
+        self.start_method = start_method
+        self.tasks = ctx.Queue() if max_builds > 1 else None
+        self.time_limit = (limits or dict()).get('time_limit')
+        self.deadline = time.time() + self.time_limit if self.time_limit else None
+        self.process = ctx.Process(target=_main, args=(self.results, self.tasks, task, max_builds, self.memory_limit))
+        self.process.start()
+
+    @property
+    def exhausted(self):
+        """Return True if the worker won't accept any more tasks."""
+        return self.builds >= self.max_builds or not self.process.is_alive()
+
+    def submit(self, task):
+        """Send another task to the child process.
+
+        :param tuple task: Function and tuple of arguments.
+        """
+        self.builds += 1
+        self.deadline = time.time() + self.time_limit if self.time_limit else None
+        self.tasks.put(task)
+
+    def poll(self, timeout=0):
+        """Wait up to timeout seconds for the current task to finish or the child process to die.
+
+        Terminates the child process if the task runs past its deadline, which counts as a failed task.
+
+        :param float timeout: Seconds to wait.
+
+        :return: If the task succeeded and its return value. None if it's still running.
+        :rtype: tuple
+        """
+        if self.deadline is not None:
+            timeout = max(0, min(timeout, self.deadline - time.time()))
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            if self.process.is_alive() and (self.deadline is None or time.time() < self.deadline):
+                return None
+        if self.process.is_alive():
+            log = logging.getLogger(__name__)
+            log.error('Child process %d exceeded the time limit of %d seconds, terminating.', self.process.pid,
+                      self.time_limit)
+            self.process.terminate()
+            self.process.join()
+            return False, None
+        try:
+            return self.results.get(timeout=POLL_INTERVAL)  # Process exited right after sending its result.
+        except queue.Empty:
+            return False, None
+
+    def wait(self):
+        """Block until the current task finishes or the child process dies.
+
+        :return: If the task succeeded and its return value.
+        :rtype: tuple
+        """
+        result = None
+        while result is None:
+            result = self.poll(POLL_INTERVAL)
+        return result
+
+    def close(self):
+        """Tell the child process to exit and wait for it."""
+        if self.tasks is not None and self.process.is_alive():
+            self.tasks.put(None)
+        self.process.join()
+
+
+def close_idle_workers():
+    """Close all idle workers."""
+    with LOCK:
+        closing = IDLE_WORKERS[:]
+        del IDLE_WORKERS[:]
+    for worker in closing:
+        worker.close()
+
+
+atexit.register(close_idle_workers)
+
+
+def run(func, args, start_method=None, max_builds=1, limits=None):
+    """Run func(*args) in a child process and wait for it to finish.
+
+    Reuses an idle worker if max_builds is greater than 1, otherwise every task gets a fresh child process.
+
+    :param function func: Module level function (must be picklable by reference) to run in the child.
+    :param tuple args: Arguments for func.
+    :param str start_method: One of START_METHODS. None for the platform default.
+    :param int max_builds: Number of tasks each worker runs before it is replaced.
+    :param dict limits: Optional time_limit (seconds func may run before the child process is terminated) and
+        memory_limit (of the child process in bytes). Missing or None for no limit.
+
+    :return: If func succeeded and its return value.
+    :rtype: tuple
+    """
+    worker = _acquire((func, args), start_method, max_builds, limits)
+    success, value = worker.wait()
+    _release(worker, success)
+    return success, value
+
+
+def _acquire(task, start_method, max_builds, limits=None):
+    """Start task in an idle worker with matching settings or in a new one.
+
+    :param tuple task: Function and tuple of arguments.
+    :param str start_method: One of START_METHODS. None for the platform default.
+    :param int max_builds: Number of tasks each worker runs before it is replaced.
+    :param dict limits: Optional time_limit and memory_limit, see run().
+
+    :return: The worker running the task.
+    :rtype: Worker
+    """
+    limits = limits or dict()
+    worker = None
+    while worker is None:
+        with LOCK:
+            if not IDLE_WORKERS:
+                break
+            worker = IDLE_WORKERS.pop()
+        settings = (worker.start_method, worker.max_builds, worker.time_limit, worker.memory_limit)
+        if worker.exhausted or settings != (start_method, max_builds, limits.get('time_limit'),
+                                            limits.get('memory_limit')):
+            worker.close()
+            worker = None
+    if worker is None:
+        return Worker(task, start_method, max_builds, limits)
+    worker.submit(task)
+    return worker
+
+
+def _release(worker, success):
+    """Keep a worker for later tasks or close it.
+
+    :param Worker worker: Worker whose task finished.
+    :param bool success: If the task succeeded.
+    """
+    if success and not worker.exhausted:
+        with LOCK:
+            IDLE_WORKERS.append(worker)
+    else:
+        worker.close()
+
+
+def memory_allows_another(memory_limit=None):
+    """Check if there is enough available memory to start another task while others are running.
+
+    A task is expected to need memory_limit bytes, or as much as the largest child process so far if there is no limit.
+
+    :param int memory_limit: Memory limit of each child process in bytes. None for no limit.
+
+    :return: If another task may be started. Always True if available memory is unknown.
+    :rtype: bool
+    """
+    available = available_memory()
+    return available is None or available >= (memory_limit or peak_child_memory())
+
+
+def run_parallel(tasks, jobs, start_method=None, max_builds=1, started=None, limits=None):
+    """Run tasks in up to jobs child processes at the same time. Tasks are started in the order given.
+
+    Yields results as tasks finish. If the caller stops iterating early, tasks still running are terminated. While
+    available memory is low fewer tasks run at the same time (at least one), see memory_allows_another().
+
+    :param iter tasks: Function and tuple of arguments pairs, like the func and args of run().
+    :param int jobs: Maximum number of tasks running at the same time.
+    :param str start_method: One of START_METHODS. None for the platform default.
+    :param int max_builds: Number of tasks each worker runs before it is replaced.
+    :param function started: Called with the index of each task right before it's started.
+    :param dict limits: Optional time_limit and memory_limit of each task, see run().
+
+    :return: Yields index of the task in tasks, if it succeeded, its return value, and seconds it took to run.
+    :rtype: iter
+    """
+    log = logging.getLogger(__name__)
+    pending = list(enumerate(tasks))[::-1]
+    running = dict()  # Worker instances (keys) and task indexes and start times (values).
+    throttled = False
+    try:
+        while pending or running:
+            while pending and len(running) < jobs:
+                if running and not memory_allows_another((limits or dict()).get('memory_limit')):
+                    if not throttled:
+                        log.warning('Low on available memory, running %d tasks at a time.', len(running))
+                    throttled = True
+                    break
+                if running and throttled:
+                    log.info('Enough available memory again, running up to %d tasks at a time.', jobs)
+                    throttled = False
+                index, task = pending.pop()
+                if started:
+                    started(index)
+                worker = _acquire(task, start_method, max_builds, limits)
+                running[worker] = (index, time.time())
+            for worker in list(running):
+                result = worker.poll(POLL_INTERVAL / len(running))
+                if result is None:
+                    continue
+                index, start = running.pop(worker)
+                _release(worker, result[0])
+                yield index, result[0], result[1], time.time() - start
+    finally:
+        for worker in running:
+            worker.process.terminate()
+            worker.process.join()
@@ -227,9 +227,13 @@ def test_sub_command_options(local_empty, push, source_cli, source_conf):
     # Setup source(s).
     if source_cli:
         args += ['-itT', '-p', 'branches', '-r', 'feature', '-s', 'semver', '-w', 'master', '-W', '[0-9]']
-        args += ['-aAb', '-B', 'x']
+        args += ['-aAb', '-B', 'x', '--start-method', 'spawn', '--worker-builds', '3', '--build-jobs', '4']
+        args += ['--history-file', 'history.json', '--build-timeout', '600', '--memory-limit', '2048']
+        args += ['--timings', 'timings.json', '--profile-dir', 'profiles', '--metrics-file', 'm.prom']
+        args += ['--git-budget', 'export=5', '--git-budget', 'fetch=1', '--git-trace2-perf', 'perf.txt']
+        args += ['--jinja-cache-dir', 'jinja', '--doctree-cache-dir', 'doctrees']
         if push:
-            args += ['-e' 'README.md', '-P', 'rem']
+            args += ['-e' 'README.md', '-P', 'rem', '--early-push']
     if source_conf:
         local_empty.ensure('docs', 'contents.rst')
         local_empty.ensure('docs', 'conf.py').write(
@@ -237,16 +241,30 @@ def test_sub_command_options(local_empty, push, source_cli, source_conf):
             'scv_banner_greatest_tag = True\n'
             'scv_banner_main_ref = "y"\n'
             'scv_banner_recent_tag = True\n'
+            'scv_build_jobs = 2\n'
+            'scv_build_timeout = 300\n'
+            'scv_doctree_cache_dir = "d"\n'
+            'scv_early_push = True\n'
+            'scv_git_budget = ("export=9",)\n'
+            'scv_git_trace2_perf = "p.txt"\n'
             'scv_greatest_tag = True\n'
+            'scv_history_file = "h.json"\n'
             'scv_invert = True\n'
+            'scv_jinja_cache_dir = "j"\n'
+            'scv_memory_limit = 1024\n'
+            'scv_metrics_file = "metrics.prom"\n'
             'scv_priority = "tags"\n'
+            'scv_profile_dir = "p"\n'
             'scv_push_remote = "origin2"\n'
             'scv_recent_tag = True\n'
             'scv_root_ref = "other"\n'
             'scv_show_banner = True\n'
             'scv_sort = ("alpha",)\n'
+            'scv_start_method = "forkserver"\n'
+            'scv_timings = "t.json"\n'
             'scv_whitelist_branches = ("other",)\n'
             'scv_whitelist_tags = re.compile("^[0-9]$")\n'
+            'scv_worker_builds = 2\n'
             'scv_grm_exclude = ("README.rst",)\n'
         )
 
@@ -259,48 +277,90 @@ def test_sub_command_options(local_empty, push, source_cli, source_conf):
         assert config.banner_greatest_tag is True
         assert config.banner_main_ref == 'x'
         assert config.banner_recent_tag is True
+        assert config.build_jobs == 4
+        assert config.build_timeout == 600
+        assert config.doctree_cache_dir == 'doctrees'
+        assert config.git_budget == ('export=5', 'fetch=1')
+        assert config.git_trace2_perf == 'perf.txt'
         assert config.greatest_tag is True
+        assert config.history_file == 'history.json'
         assert config.invert is True
+        assert config.jinja_cache_dir == 'jinja'
+        assert config.memory_limit == 2048
+        assert config.metrics_file == 'm.prom'
         assert config.priority == 'branches'
+        assert config.profile_dir == 'profiles'
         assert config.recent_tag is True
         assert config.root_ref == 'feature'
         assert config.show_banner is True
         assert config.sort == ('semver',)
+        assert config.start_method == 'spawn'
+        assert config.timings == 'timings.json'
         assert config.whitelist_branches == ('master',)
         assert config.whitelist_tags == ('[0-9]',)
+        assert config.worker_builds == 3
         if push:
+            assert config.early_push is True
             assert config.grm_exclude == ('README.md',)
             assert config.push_remote == 'rem'
     elif source_conf:
         assert config.banner_greatest_tag is True
         assert config.banner_main_ref == 'y'
         assert config.banner_recent_tag is True
+        assert config.build_jobs == 2
+        assert config.build_timeout == 300
+        assert config.doctree_cache_dir == 'd'
+        assert config.git_budget == ('export=9',)
+        assert config.git_trace2_perf == 'p.txt'
         assert config.greatest_tag is True
+        assert config.history_file == 'h.json'
         assert config.invert is True
+        assert config.jinja_cache_dir == 'j'
+        assert config.memory_limit == 1024
+        assert config.metrics_file == 'metrics.prom'
         assert config.priority == 'tags'
+        assert config.profile_dir == 'p'
         assert config.recent_tag is True
         assert config.root_ref == 'other'
         assert config.show_banner is True
         assert config.sort == ('alpha',)
+        assert config.start_method == 'forkserver'
+        assert config.timings == 't.json'
         assert config.whitelist_branches == ('other',)
         assert config.whitelist_tags.pattern == '^[0-9]$'
+        assert config.worker_builds == 2
         if push:
+            assert config.early_push is True
             assert config.grm_exclude == ('README.rst',)
             assert config.push_remote == 'origin2'
     else:
         assert config.banner_greatest_tag is False
         assert config.banner_main_ref == 'master'
         assert config.banner_recent_tag is False
+        assert config.build_jobs == 1
+        assert config.build_timeout is None
+        assert config.doctree_cache_dir is None
+        assert config.git_budget == tuple()
+        assert config.git_trace2_perf is None
         assert config.greatest_tag is False
+        assert config.history_file is None
         assert config.invert is False
+        assert config.jinja_cache_dir is None
+        assert config.memory_limit is None
+        assert config.metrics_file is None
         assert config.priority is None
+        assert config.profile_dir is None
         assert config.recent_tag is False
         assert config.root_ref == 'master'
         assert config.show_banner is False
         assert config.sort == tuple()
+        assert config.start_method is None
+        assert config.timings is None
         assert config.whitelist_branches == tuple()
         assert config.whitelist_tags == tuple()
+        assert config.worker_builds == 1
         if push:
+            assert config.early_push is False
             assert config.grm_exclude == tuple()
             assert config.push_remote == 'origin'
 
@@ -326,3 +386,80 @@ def test_sub_command_options_other(push):
     assert config.sort == ('semver', 'time')
     if push:
         assert config.grm_exclude == ('one', 'two', 'three', 'four')
+
+
+@pytest.mark.parametrize('source_cli', [False, True])
+@pytest.mark.parametrize('source_conf', [False, True])
+def test_watch_options(local_empty, source_cli, source_conf):
+    """Test options only available to the watch sub command.
+
+    :param local_empty: conftest fixture.
+    :param bool source_cli: Set value from command line arguments.
+    :param bool source_conf: Set value from conf.py file.
+    """
+    args = ['watch', 'docs', join('docs', '_build', 'html')]
+
+    # Setup source(s).
+    if source_cli:
+        args += ['-I', '30', '--webhook-port', '8000', '-r', 'feature', '-W', 'v1.0']
+    if source_conf:
+        local_empty.ensure('docs', 'contents.rst')
+        local_empty.ensure('docs', 'conf.py').write('scv_poll_interval = 60\nscv_webhook_port = 9000\n')
+
+    # Run.
+    result = CliRunner().invoke(cli, args)
+    config, rel_source, destination = result.exception.args
+
+    # Verify.
+    assert rel_source == ('docs',)
+    assert destination == join('docs', '_build', 'html')
+    if source_cli:
+        assert config.poll_interval == 30
+        assert config.root_ref == 'feature'
+        assert config.webhook_port == 8000
+        assert config.whitelist_tags == ('v1.0',)
+    elif source_conf:
+        assert config.poll_interval == 60
+        assert config.webhook_port == 9000
+    else:
+        assert config.poll_interval == 600
+        assert config.webhook_port is None
+
+
+def test_shard_and_merge(local_empty):
+    """Test build --shard and merge sub command arguments.
+
+    :param local_empty: conftest fixture.
+    """
+    result = CliRunner().invoke(cli, ['build', '--shard', '2/4', 'docs', join('docs', '_build', 'html')])
+    assert result.exception.args[0].shard == '2/4'
+
+    result = CliRunner().invoke(cli, ['push', '--shard', '2/4', 'docs', 'gh-pages', '.'])
+    assert result.exit_code == 2
+    assert 'no such option' in result.output.lower()
+
+    local_empty.ensure_dir('one')
+    local_empty.ensure_dir('two')
+    result = CliRunner().invoke(cli, ['merge', 'one', 'two', 'html'])
+    config, shard_dir, destination = result.exception.args
+    assert shard_dir == ('one', 'two')
+    assert destination == 'html'
+    assert config.git_root is None
+
+    result = CliRunner().invoke(cli, ['merge', 'one', 'missing', 'html'])
+    assert result.exit_code == 2
+
+
+def test_state_dir_resume(local_empty):
+    """Test build --state-dir and --resume arguments.
+
+    :param local_empty: conftest fixture.
+    """
+    result = CliRunner().invoke(cli, ['build', 'docs', join('docs', '_build', 'html')])
+    assert result.exception.args[0].state_dir is None
+    assert result.exception.args[0].resume is False
+
+    args = ['build', '--state-dir', 'state', '--resume', 'docs', join('docs', '_build', 'html')]
+    result = CliRunner().invoke(cli, args)
+    assert result.exception.args[0].state_dir == 'state'
+    assert result.exception.args[0].resume is True
@@ -1,5 +1,6 @@
 """Test calls to main() with different command line options."""
 
+import json
 import time
 from subprocess import CalledProcessError
 
@@ -624,6 +625,152 @@ def test_banner_css_override(banner, local_docs):
     assert destination.join('other', '_static', 'banner.css').check(file=True)
 
 
+@pytest.mark.parametrize('count', [2, 3])
+def test_shards(tmpdir, local_docs, count):
+    """Test building shards in separate processes and merging them. Result must match a single build.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    :param int count: Number of shards.
+    """
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs, ['git', 'checkout', '-b', 'other'])
+    local_docs.join('one.rst').write('.. _one:\n\nOne\n===\n\nChanged sub page documentation 1.\n')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Changed one.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'master', 'other', 'v1.0.0'])
+
+    # Run.
+    single = tmpdir.ensure_dir('single')
+    pytest.run(local_docs, ['sphinx-versioning', 'build', '.', str(single)])
+    shard_dirs = list()
+    for shard in range(1, count + 1):
+        shard_dirs.append(str(tmpdir.ensure_dir('shard{}'.format(shard))))
+        output = pytest.run(local_docs, ['sphinx-versioning', 'build', '--shard', '{}/{}'.format(shard, count), '.',
+                                         shard_dirs[-1]])
+        assert 'Building shard {}/{}'.format(shard, count) in output
+    merged = tmpdir.ensure_dir('merged')
+    output = pytest.run(local_docs, ['sphinx-versioning', 'merge'] + shard_dirs + [str(merged)])
+    assert 'Traceback' not in output
+
+    # Verify.
+    def html(directory):
+        """Read all HTML files.
+
+        :param directory: Build output directory.
+
+        :return: Relative paths (keys) and HTML (values).
+        :rtype: dict
+        """
+        return {f.relto(directory): f.read() for f in directory.visit('*.html')}
+
+    expected = html(single)
+    assert len(expected) == 24  # Root, master, other, and v1.0.0.
+    assert html(merged) == expected
+    assert not merged.join('.scv_shard.json').check()
+
+
+def test_timings(tmpdir, local_docs):
+    """Test --timings report, also written when the build fails.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    """
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'v1.0.0'])
+    report_file = tmpdir.join('timings.json')
+
+    output = pytest.run(local_docs, ['sphinx-versioning', 'build', '--timings', str(report_file), '.', str(tmpdir)])
+    assert 'Timings: ' in output
+    assert 'Wrote timings report to: {}'.format(report_file) in output
+    report = json.loads(report_file.read())
+    assert [p['name'] for p in report['phases']] == ['list_remote', 'filter_and_date', 'export', 'pre_run',
+                                                     'read_config', 'build']
+    assert sorted((b['name'], b['root']) for b in report['builds']) == [
+        ('master', False), ('master', True), ('v1.0.0', False)]
+    assert all(b['cpu'] > 0 and b['wall'] > 0 for b in report['builds'])
+    assert all(b['pages'] == 6 and 'versions' in b['phases'] for b in report['builds'])
+    assert 'sphinx phases: startup ' in output
+    assert report['phases'][0]['git'] == {'ls-remote': 1}
+    assert report['git']['archive'] == 1  # Tag and master are the same commit.
+    assert report['git_total'] == sum(report['git'].values())
+    assert report['wall'] >= sum(p['wall'] for p in report['phases'])
+
+    report_file.remove()
+    with pytest.raises(CalledProcessError):
+        pytest.run(local_docs, ['sphinx-versioning', 'build', '--timings', str(report_file), '-r', 'unknown', '.',
+                                str(tmpdir)])
+    assert [p['name'] for p in json.loads(report_file.read())['phases']] == ['list_remote', 'filter_and_date']
+
+
+def test_metrics_file(tmpdir, local_docs):
+    """Test --metrics-file with and without --resume.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    """
+    metrics_file = tmpdir.join('docs.prom')
+    destination = tmpdir.join('html')
+    args = ['sphinx-versioning', 'build', '--metrics-file', str(metrics_file), '--state-dir', str(tmpdir.join('state'))]
+
+    output = pytest.run(local_docs, args + ['.', str(destination)])
+    assert 'Wrote metrics to: {}'.format(metrics_file) in output
+    assert 'Timings: ' not in output
+    samples = dict(line.rsplit(' ', 1) for line in metrics_file.read().splitlines() if not line.startswith('#'))
+    assert samples['sphinx_versioning_builds{result="built"}'] == '2'
+    assert samples['sphinx_versioning_builds{result="cached"}'] == '0'
+    assert samples['sphinx_versioning_git_subprocesses{command="archive"}'] == '1'
+    assert 'sphinx_versioning_phase_duration_seconds{phase="build"}' in samples
+    assert int(samples['sphinx_versioning_exported_bytes']) > 0
+    assert int(samples['sphinx_versioning_output_bytes']) > int(samples['sphinx_versioning_exported_bytes'])
+
+    pytest.run(local_docs, args + ['--resume', '.', str(destination)])
+    samples = dict(line.rsplit(' ', 1) for line in metrics_file.read().splitlines() if not line.startswith('#'))
+    assert samples['sphinx_versioning_builds{result="built"}'] == '0'
+    assert samples['sphinx_versioning_builds{result="cached"}'] == '2'
+
+
+def test_git_budget(tmpdir, local_docs):
+    """Test --git-budget and --git-trace2-perf.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    """
+    perf = tmpdir.join('perf.txt')
+    args = ['sphinx-versioning', 'build', '--git-budget', 'list_remote=0', '--git-budget', 'export=100',
+            '--git-trace2-perf', str(perf), '.', str(tmpdir.join('html'))]
+    output = pytest.run(local_docs, args)
+    assert 'Phase list_remote exceeded its budget of 0 git commands with: git ls-remote' in output
+    assert 'Phase list_remote ran 1 git commands, over its budget of 0.' in output
+    assert 'Phase export ran' not in output
+    assert 'Git commands: ' in output
+    assert 'archive' in perf.read()
+
+    with pytest.raises(CalledProcessError) as exc:
+        pytest.run(local_docs, ['sphinx-versioning', 'build', '--git-budget', 'export', '.', str(tmpdir)])
+    assert 'Invalid git budget "export", expected phase=count (e.g. export=20).' in exc.value.output
+
+
+def test_profile_dir(tmpdir, local_docs):
+    """Test --profile-dir profiles of every ref and phase, merged per phase.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    """
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'v1.0.0'])
+    profile_dir = tmpdir.join('profiles')
+    destination = tmpdir.join('html')
+
+    output = pytest.run(local_docs, ['sphinx-versioning', 'build', '--profile-dir', str(profile_dir), '.',
+                                     str(destination)])
+    assert 'Merged 2 build profiles into: {}'.format(profile_dir.join('build.prof')) in output
+    names = sorted(p.basename for p in profile_dir.listdir())
+    assert names == ['build.prof', 'local-read_config.prof', 'master-build.prof', 'master-read_config.prof',
+                     'master-root-2.prof', 'master-root.prof', 'read_config.prof', 'root.prof',
+                     'v1.0.0-build.prof', 'v1.0.0-read_config.prof']  # Root ref is built in pre_build() too.
+    assert not destination.join('master-build.prof').check()
+
+
 def test_error_bad_path(tmpdir):
     """Test handling of bad paths.
 
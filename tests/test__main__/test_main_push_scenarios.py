@@ -102,6 +102,47 @@ def test_root_ref(local_docs_ghp):
     assert 'Root ref is: v1.0.0' in output
 
 
+def test_early_push(local_docs_ghp):
+    """Test --early-push with parallel builds only pushing versions that finished building.
+
+    :param local_docs_ghp: conftest fixture.
+    """
+    # Slow down writing pages of the root build, so it's still running when master is done.
+    local_docs_ghp.join('conf.py').write(
+        '\nimport time\n\n\n'
+        'def slow(app, *_):\n'
+        '    if not app.outdir.endswith(("master", "old1", "old2", "old3")):\n'
+        '        time.sleep(0.5)\n\n\n'
+        'def setup(app):\n'
+        '    app.connect("html-page-context", slow)\n', mode='a'
+    )
+    pytest.run(local_docs_ghp, ['git', 'commit', '-am', 'Slow root.'])
+    pytest.run(local_docs_ghp, ['git', 'push', 'origin', 'master'])
+    for offset, branch in enumerate(('old1', 'old2', 'old3')):
+        pytest.run(local_docs_ghp, ['git', 'checkout', '-b', branch, 'master'])
+        local_docs_ghp.join('contents.rst').write('\n{}\n'.format(branch), mode='a')
+        dates = pytest.author_committer_dates(-10 - offset)
+        pytest.run(local_docs_ghp, ['git', 'commit', '-am', branch], environ=dates)
+        pytest.run(local_docs_ghp, ['git', 'push', 'origin', branch])
+    pytest.run(local_docs_ghp, ['git', 'checkout', 'master'])
+
+    # Run.
+    args = ['sphinx-versioning', 'push', '--early-push', '--build-jobs', '2', '.', 'gh-pages', '.']
+    output = pytest.run(local_docs_ghp, args)
+    assert 'Traceback' not in output
+    assert 'Attempting to push the most important versions early.' in output
+
+    # Early commit has the complete root and master. Only other versions are added by the final commit.
+    pytest.run(local_docs_ghp, ['git', 'fetch', 'origin', 'gh-pages'])
+    final, early = pytest.run(local_docs_ghp, ['git', 'rev-list', '-n2', 'origin/gh-pages']).split()
+    tree = set(pytest.run(local_docs_ghp, ['git', 'ls-tree', '--name-only', early]).split())
+    assert 'master' in tree
+    assert 'contents.html' in tree
+    assert not tree & {'old1', 'old2', 'old3'}
+    changed = pytest.run(local_docs_ghp, ['git', 'diff', '--name-only', early, final]).split()
+    assert {p.split('/')[0] for p in changed} == {'old1', 'old2', 'old3'}
+
+
 @pytest.mark.parametrize('give_up', [False, True])
 def test_race(tmpdir, local_docs_ghp, remote, urls, give_up):
     """Test with race condition where another process pushes to gh-pages causing a retry.
@@ -0,0 +1,300 @@
+"""Test objects in module."""
+
+import json
+from subprocess import CalledProcessError
+
+import pytest
+
+try:
+    from urllib.request import Request, urlopen
+except ImportError:
+    from urllib2 import Request, urlopen  # Python 2.x.
+
+from sphinxcontrib.versioning import daemon
+from sphinxcontrib.versioning.routines import build_all, gather_git_info, pre_build
+from sphinxcontrib.versioning.versions import Versions
+
+
+@pytest.fixture(name='watcher')
+def fx_watcher(monkeypatch, tmpdir, config, local_docs):
+    """Daemon instance with a full build already done. Records full builds and built versions.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib.versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+
+    :return: Daemon instance with additional full_builds and built attributes.
+    :rtype: sphinxcontrib.versioning.daemon.Daemon
+    """
+    config.git_root = str(local_docs)
+    destination = tmpdir.ensure_dir('destination')
+
+    def full_build():
+        """Build everything like the build sub command does.
+
+        :return: Versions class instance.
+        :rtype: sphinxcontrib.versioning.versions.Versions
+        """
+        instance.full_builds += 1
+        versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()))
+        build_all(pre_build(str(local_docs), versions), str(destination), versions)
+        return versions
+
+    def build(source, target, versions, current_name, is_root):
+        """Record and build.
+
+        :param str source: Source directory to pass to sphinx-build.
+        :param str target: Destination directory to write documentation to (passed to sphinx-build).
+        :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+        :param str current_name: The ref name of the current version being built.
+        :param bool is_root: Is this build in the web root?
+        """
+        instance.built.append((current_name, is_root))
+        original_build(source, target, versions, current_name, is_root)
+
+    original_build = daemon.build
+    monkeypatch.setattr(daemon, 'build', build)
+    instance = daemon.Daemon(full_build, ('.',), str(destination))
+    instance.full_builds = 0
+    instance.built = list()
+    instance.rebuild_all()
+    return instance
+
+
+def test_no_changes(watcher):
+    """Nothing is rebuilt without remote changes.
+
+    :param watcher: local fixture.
+    """
+    assert watcher.full_builds == 1
+    assert watcher.poll() is False
+    assert watcher.full_builds == 1
+    assert watcher.built == list()
+
+
+def test_changed_page(tmpdir, local_docs, watcher):
+    """Only the changed version is rebuilt. Committed before master so the most recent version doesn't change.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    :param watcher: local fixture.
+    """
+    pytest.run(local_docs, ['git', 'checkout', '-b', 'other'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'other'])
+    assert watcher.poll() is True  # New branch.
+    assert watcher.full_builds == 2
+    assert sorted(r['name'] for r in watcher.versions.remotes) == ['master', 'other']
+
+    local_docs.join('one.rst').write('.. _one:\n\nOne\n===\n\nChanged sub page documentation 1.\n')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Changed one.'], environ=pytest.author_committer_dates(2))
+    pytest.run(local_docs, ['git', 'push', 'origin', 'other'])
+    watcher.built[:] = list()
+    assert watcher.poll() is True
+    assert watcher.full_builds == 2
+    assert watcher.built == [('other', False)]
+
+    destination = tmpdir.join('destination')
+    assert 'Changed sub page' in destination.join('other', 'one.html').read()
+    assert 'Changed sub page' not in destination.join('master', 'one.html').read()
+    assert 'Changed sub page' not in destination.join('one.html').read()
+    assert watcher.poll() is False
+
+
+def test_root_ref(tmpdir, local_docs, watcher):
+    """Root is rebuilt with its version. Commits without file changes aren't rebuilt.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    :param watcher: local fixture.
+    """
+    local_docs.join('one.rst').write('.. _one:\n\nOne\n===\n\nChanged sub page documentation 1.\n')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Changed one.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'master'])
+    assert watcher.poll() is True
+    assert watcher.full_builds == 1
+    assert watcher.built == [('master', True), ('master', False)]
+    assert 'Changed sub page' in tmpdir.join('destination', 'one.html').read()
+
+    pytest.run(local_docs, ['git', 'commit', '--allow-empty', '-m', 'Empty commit.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'master'])
+    watcher.built[:] = list()
+    assert watcher.poll() is True
+    assert watcher.full_builds == 1
+    assert watcher.built == list()
+    assert watcher.refs['heads/master'] == pytest.run(local_docs, ['git', 'rev-parse', 'HEAD']).strip()
+
+
+def test_new_page(local_docs, watcher):
+    """Adding a page changes versions menus. Everything is rebuilt.
+
+    :param local_docs: conftest fixture.
+    :param watcher: local fixture.
+    """
+    local_docs.join('four.rst').write('.. _four:\n\nFour\n====\n\nSub page documentation 4.\n')
+    local_docs.join('contents.rst').write('    four\n', mode='a')
+    pytest.run(local_docs, ['git', 'add', 'four.rst', 'contents.rst'])
+    pytest.run(local_docs, ['git', 'commit', '-m', 'Added four.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'master'])
+    assert watcher.poll() is True
+    assert watcher.full_builds == 2
+    assert 'four' in watcher.versions['master']['found_docs']
+
+
+def test_failure(tmpdir, local_docs, watcher):
+    """A failed rebuild doesn't raise. The last built refs are kept so the next poll retries.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    :param watcher: local fixture.
+    """
+    refs = dict(watcher.refs)
+    local_docs.join('conf.py').write('undefined_name\n', mode='a')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Broken conf.py.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'master'])
+    assert watcher.poll() is False
+    assert watcher.refs == refs
+    assert watcher.get_status()['failures'] == 2  # Changed version only, then all versions.
+
+    local_docs.join('conf.py').write(local_docs.join('conf.py').read().replace('undefined_name\n', ''))
+    local_docs.join('one.rst').write('.. _one:\n\nOne\n===\n\nChanged sub page documentation 1.\n')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Fixed conf.py.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'master'])
+    assert watcher.poll() is True
+    assert watcher.refs['heads/master'] == pytest.run(local_docs, ['git', 'rev-parse', 'HEAD']).strip()
+    assert watcher.get_status()['builds'] == 2
+    assert 'Changed sub page' in tmpdir.join('destination', 'one.html').read()
+    assert watcher.poll() is False
+
+
+@pytest.mark.parametrize('name', ['export', 'tree_hashes'])
+def test_git_failure(monkeypatch, local_docs, watcher, name):
+    """git failing during a rebuild doesn't raise. Failing exports fall back to rebuilding everything.
+
+    :param monkeypatch: pytest fixture.
+    :param local_docs: conftest fixture.
+    :param watcher: local fixture.
+    :param str name: Function in the daemon module to fail.
+    """
+    def fail(*_):
+        """Fail like git commands do.
+
+        :raise CalledProcessError: Always.
+        """
+        raise CalledProcessError(128, ['git', name])
+
+    monkeypatch.setattr(daemon, name, fail)
+    local_docs.join('one.rst').write('.. _one:\n\nOne\n===\n\nChanged sub page documentation 1.\n')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Changed one.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'master'])
+    assert watcher.poll() is (name == 'export')
+    assert watcher.full_builds == 2
+    assert watcher.get_status()['failures'] == (1 if name == 'export' else 2)
+
+
+def test_run(monkeypatch, watcher):
+    """Test run() loop.
+
+    :param monkeypatch: pytest fixture.
+    :param watcher: local fixture.
+    """
+    waits = list()
+    monkeypatch.setattr(watcher.wake, 'wait', lambda timeout: waits.append(timeout))
+    watcher.run(30, iterations=3)
+    assert waits == [30, 30, 30]
+    assert watcher.full_builds == 2
+
+
+@pytest.mark.parametrize('ref', ['other', 'heads/other', 'refs/heads/other'])
+def test_parse_ref(ref):
+    """Test parse_ref().
+
+    :param str ref: Ref to parse.
+    """
+    assert daemon.parse_ref(ref) == 'other'
+
+
+def test_only(local_docs, watcher):
+    """Changes to refs not notified are left for the next regular poll.
+
+    :param local_docs: conftest fixture.
+    :param watcher: local fixture.
+    """
+    pytest.run(local_docs, ['git', 'checkout', '-b', 'other'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'other'])
+    assert watcher.poll() is True
+    watcher.built[:] = list()
+
+    for branch in ('other', 'master'):
+        pytest.run(local_docs, ['git', 'checkout', branch])
+        local_docs.join('one.rst').write('.. _one:\n\nOne\n===\n\nChanged in {}.\n'.format(branch))
+        pytest.run(local_docs, ['git', 'commit', '-am', 'Changed one.'], environ=pytest.author_committer_dates(2))
+        pytest.run(local_docs, ['git', 'push', 'origin', branch])
+
+    assert watcher.poll(only={'other'}) is True
+    assert watcher.built == [('other', False)]
+    assert watcher.poll(only={'other'}) is False
+    assert watcher.poll() is True
+    assert watcher.built == [('other', False), ('master', True), ('master', False)]
+    assert watcher.full_builds == 2
+
+
+def test_webhook(monkeypatch, local_docs, watcher):
+    """Test notifications and status through HTTP, and coalescing notifications in run().
+
+    :param monkeypatch: pytest fixture.
+    :param local_docs: conftest fixture.
+    :param watcher: local fixture.
+    """
+    server = watcher.serve(0)
+    url = 'http://127.0.0.1:{}/'.format(server.server_address[1])
+
+    def request(path='', payload=None):
+        """Send a request to the webhook.
+
+        :param str path: URL path.
+        :param dict payload: JSON body to POST. GET if None.
+
+        :return: HTTP status code and decoded JSON response.
+        :rtype: tuple
+        """
+        data = None if payload is None else json.dumps(payload).encode('utf-8')
+        response = urlopen(Request(url + path, data))
+        return response.getcode(), json.loads(response.read().decode('utf-8'))
+
+    try:
+        code, status = request('status')
+        assert code == 200
+        assert status['builds'] == 1
+        assert status['queue_depth'] == 0
+        assert status['state'] == 'idle'
+
+        local_docs.join('one.rst').write('.. _one:\n\nOne\n===\n\nChanged sub page documentation 1.\n')
+        pytest.run(local_docs, ['git', 'commit', '-am', 'Changed one.'])
+        pytest.run(local_docs, ['git', 'push', 'origin', 'master'])
+        request(payload=dict(ref='master', sha='0' * 40))
+        code, status = request(payload=dict(ref='refs/heads/master', after='1' * 40))
+        assert code == 202
+        assert status['queue'] == ['master']
+        assert status['queue_depth'] == 1
+
+        # Bad requests.
+        with pytest.raises(Exception) as exc:
+            request(payload=['master'])
+        assert exc.value.code == 400
+        with pytest.raises(Exception) as exc:
+            request('unknown')
+        assert exc.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # Process notification.
+    monkeypatch.setattr(daemon, 'COALESCE_DELAY', 0)
+    monkeypatch.setattr(watcher, 'rebuild_all', lambda: None)
+    watcher.run(3600, iterations=1)
+    assert watcher.built == [('master', True), ('master', False)]
+    status = watcher.get_status()
+    assert status['builds'] == 2
+    assert status['queue_depth'] == 0
+    assert not watcher.wake.is_set()
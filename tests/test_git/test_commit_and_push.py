@@ -114,6 +114,30 @@ def test_changes(monkeypatch, local):
     assert body == 'LANG: en_US.UTF-8\nTRAVIS_BRANCH: master\nTRAVIS_BUILD_ID: 12345'
 
 
+def test_partial(local):
+    """Test partial commit. Files staged for deletion (by "git rm" in clone()) are kept until the final commit.
+
+    :param local: conftest fixture.
+    """
+    pytest.run(local, ['git', 'rm', 'README'])
+    local.ensure('new', 'new.txt')
+
+    actual = commit_and_push(str(local), 'origin', Versions(REMOTES), partial=True)
+    assert actual is True
+    subject = pytest.run(local, ['git', 'log', '-n1', '--pretty=%s']).strip()
+    assert subject == 'AUTO sphinxcontrib-versioning 20160722 0772e5ff32a (partial)'
+    files = pytest.run(local, ['git', 'ls-tree', '--name-only', '-r', 'HEAD']).split()
+    assert 'README' in files
+    assert 'new/new.txt' in files
+
+    actual = commit_and_push(str(local), 'origin', Versions(REMOTES))
+    assert actual is True
+    files = pytest.run(local, ['git', 'ls-tree', '--name-only', '-r', 'HEAD']).split()
+    assert 'README' not in files
+    assert 'new/new.txt' in files
+    pytest.run(local, ['git', 'diff-index', '--quiet', 'HEAD', '--'])  # Exit 0 if nothing changed.
+
+
 def test_branch_deleted(local):
     """Test scenario where branch is deleted by someone.
 
@@ -1,5 +1,6 @@
 """Test function in module."""
 
+import json
 import time
 from datetime import datetime
 from os.path import join
@@ -7,7 +8,7 @@ from subprocess import CalledProcessError
 
 import pytest
 
-from sphinxcontrib.versioning.git import export, fetch_commits, IS_WINDOWS, list_remote
+from sphinxcontrib.versioning.git import export, fetch_commits, IS_WINDOWS, LAST_COMMITS_FILE, list_remote
 
 
 def test_simple(tmpdir, local):
@@ -49,6 +50,7 @@ def test_overwrite(tmpdir, local):
     pytest.run(local, ['git', 'diff-index', '--quiet', 'HEAD', '--'])
 
     expected = [
+        '.scv_last_commits.json',
         'README',
         'docs',
         join('docs', '_templates'),
@@ -119,6 +121,58 @@ def test_symlink(tmpdir, local):
     assert files == ['README', 'good_symlink']
 
 
+def test_last_commits(tmpdir, local):
+    """Test dates of the last commit of each RST file, including one git quotes in "git log" output.
+
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    """
+    names = ['one.rst', 'sub/two.rst', u'sub/\u00fcnicode.rst', 'sub/three.rst']
+    for offset, name in enumerate(names):
+        local.ensure(name).write(name)
+        pytest.run(local, ['git', 'add', name])
+        pytest.run(local, ['git', 'commit', '-m', 'Added ' + name], environ=pytest.author_committer_dates(offset))
+    local.join('one.rst').write('Changed\n', mode='a')
+    pytest.run(local, ['git', 'commit', '-am', 'Changed one.'], environ=pytest.author_committer_dates(10))
+    sha = pytest.run(local, ['git', 'rev-parse', 'HEAD']).strip()
+    local.join('sub', 'two.rst').write('Changed later\n', mode='a')
+    pytest.run(local, ['git', 'commit', '-am', 'Changed two.'], environ=pytest.author_committer_dates(20))
+
+    target = tmpdir.ensure_dir('target')
+    dates = export(str(local), sha, str(target))
+
+    expected = {n: int(pytest.run(local, ['git', 'log', '-n1', '--format=%at', sha, '--', n])) for n in names}
+    assert dates == expected
+    assert dates['one.rst'] > dates['sub/three.rst'] > dates['sub/two.rst']
+    assert json.loads(target.join(LAST_COMMITS_FILE).read()) == expected
+    assert {n: int(target.join(n).mtime()) for n in names} == expected
+
+
+def test_last_commits_merge(tmpdir, local):
+    """Test dates with a merge. Merged changes get the date of the commit on the merged branch, like "git log -n1".
+
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    """
+    for name in ('one.rst', 'two.rst'):
+        local.ensure(name).write(name)
+        pytest.run(local, ['git', 'add', name])
+    pytest.run(local, ['git', 'commit', '-m', 'Added.'], environ=pytest.author_committer_dates(0))
+    pytest.run(local, ['git', 'checkout', '-b', 'other', 'master'])
+    local.join('one.rst').write('Changed\n', mode='a')
+    pytest.run(local, ['git', 'commit', '-am', 'Changed one.'], environ=pytest.author_committer_dates(1))
+    pytest.run(local, ['git', 'checkout', 'master'])
+    local.join('two.rst').write('Changed\n', mode='a')
+    pytest.run(local, ['git', 'commit', '-am', 'Changed two.'], environ=pytest.author_committer_dates(2))
+    pytest.run(local, ['git', 'merge', '--no-ff', 'other', '-m', 'Merge.'], environ=pytest.author_committer_dates(3))
+    sha = pytest.run(local, ['git', 'rev-parse', 'HEAD']).strip()
+
+    dates = export(str(local), sha, str(tmpdir.ensure_dir('target')))
+    expected = {n: int(pytest.run(local, ['git', 'log', '-n1', '--format=%at', sha, '--', n])) for n in dates}
+    assert dates == expected
+    assert dates['one.rst'] < dates['two.rst'] < int(pytest.run(local, ['git', 'log', '-n1', '--format=%at', sha]))
+
+
 def test_timezones(tmpdir, local):
     """Test mtime on RST files with different git commit timezones.
 
@@ -0,0 +1,28 @@
+"""Test function in module."""
+
+import sys
+
+from sphinxcontrib.versioning.git import run_command
+
+
+def test_pipeto_stopped(tmpdir):
+    """Test terminating a command once pipeto stops reading early.
+
+    :param tmpdir: pytest fixture.
+    """
+    chunks = list()
+
+    def pipeto(stdout):
+        """Read only the start of the output.
+
+        :param file stdout: Handle to the command's stdout pipe.
+
+        :return: Stopped early.
+        :rtype: bool
+        """
+        chunks.append(stdout.read(5))
+        return True
+
+    command = [sys.executable, '-c', 'while True: print("endless")']
+    run_command(str(tmpdir), command, env_var=False, pipeto=pipeto)  # Doesn't hang or raise CalledProcessError.
+    assert chunks == [b'endle']
@@ -0,0 +1,38 @@
+"""Test function in module."""
+
+import pytest
+
+from sphinxcontrib.versioning.git import tree_hashes
+
+
+def test(local):
+    """Test function.
+
+    :param local: conftest fixture.
+    """
+    sha = pytest.run(local, ['git', 'rev-parse', 'HEAD']).strip()
+    tree = pytest.run(local, ['git', 'rev-parse', 'HEAD^{tree}']).strip()
+    assert tree_hashes(str(local), []) == dict()
+    assert tree_hashes(str(local), [sha]) == {sha: tree}
+
+    # Same files in a new commit.
+    pytest.run(local, ['git', 'commit', '--allow-empty', '-m', 'Empty commit.'])
+    sha2 = pytest.run(local, ['git', 'rev-parse', 'HEAD']).strip()
+    assert sha2 != sha
+    assert tree_hashes(str(local), [sha, sha2]) == {sha: tree, sha2: tree}
+
+
+def test_subdirectory(local):
+    """Test "SHA:path" revisions.
+
+    :param local: conftest fixture.
+    """
+    local.ensure('sub', 'file.txt').write('data')
+    pytest.run(local, ['git', 'add', 'sub'])
+    pytest.run(local, ['git', 'commit', '-m', 'Added sub.'])
+    sha = pytest.run(local, ['git', 'rev-parse', 'HEAD']).strip()
+    tree = pytest.run(local, ['git', 'rev-parse', 'HEAD^{tree}']).strip()
+    sub_tree = pytest.run(local, ['git', 'rev-parse', 'HEAD:sub']).strip()
+
+    actual = tree_hashes(str(local), [sha, sha + ':sub', sha + ':'])
+    assert actual == {sha: tree, sha + ':sub': sub_tree, sha + ':': tree}
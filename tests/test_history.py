@@ -0,0 +1,80 @@
+"""Test objects in module."""
+
+import json
+
+import pytest
+
+from sphinxcontrib.versioning import history
+
+
+def test_history_file(tmpdir, config, local):
+    """Test history_file().
+
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local: conftest fixture.
+    """
+    assert history.history_file(config) is None
+    config.git_root = str(tmpdir.ensure_dir('not_a_repo'))
+    assert history.history_file(config) is None
+    config.git_root = str(local)
+    assert history.history_file(config) is None  # Only one build job.
+    config.build_jobs = 2
+    assert history.history_file(config) == str(local.join('.git', history.FILE_NAME))
+    config.history_file = 'other.json'
+    assert history.history_file(config) == 'other.json'
+    config.build_jobs = 1
+    assert history.history_file(config) == 'other.json'
+
+
+def test_estimate():
+    """Test estimates for known and unknown trees."""
+    instance = history.BuildHistory()
+    assert instance.estimate('tree1', 10) == 10 * history.SECONDS_PER_PAGE
+    assert instance.estimate(None, 10) == 10 * history.SECONDS_PER_PAGE
+
+    instance.record('tree1', 30, 10)
+    instance.record('tree2', 10, 10)
+    instance.record(None, 1000, 1)
+    assert instance.estimate('tree1', 10) == 30
+    assert instance.estimate('tree2', 0) == 10
+    assert instance.estimate('tree3', 5) == 10  # 2 seconds per page.
+
+
+def test_save_load(monkeypatch, tmpdir):
+    """Test persisting and dropping old entries.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    """
+    path = tmpdir.join('history.json')
+    monkeypatch.setattr(history, 'MAX_ENTRIES', 2)
+    instance = history.BuildHistory(str(path))
+    assert instance.entries == dict()
+    for i, tree in enumerate(('tree1', 'tree2', 'tree3')):
+        monkeypatch.setattr('time.time', lambda i=i: 1000 + i)
+        instance.record(tree, 1.23456, 2)
+    instance.save()
+
+    assert json.loads(path.read()) == {'tree2': [1.235, 2, 1001], 'tree3': [1.235, 2, 1002]}
+    assert [p.basename for p in tmpdir.listdir()] == ['history.json']  # Written to history.json.tmp first.
+    assert history.BuildHistory(str(path)).entries == {'tree2': [1.235, 2, 1001], 'tree3': [1.235, 2, 1002]}
+
+
+@pytest.mark.parametrize('contents', ['', '[1, 2]', '{"tree1": 5, "tree2": [1, 2, 3]}'])
+def test_bad_file(caplog, tmpdir, contents):
+    """Test corrupt files.
+
+    :param caplog: pytest extension fixture.
+    :param tmpdir: pytest fixture.
+    :param str contents: File contents.
+    """
+    path = tmpdir.join('history.json')
+    path.write(contents)
+    instance = history.BuildHistory(str(path))
+    if contents.startswith('{'):
+        assert instance.entries == {'tree2': [1, 2, 3]}
+    else:
+        assert instance.entries == dict()
+        records = [(r.levelname, r.message) for r in caplog.records]
+        assert ('WARNING', 'Ignoring unreadable build history file: {}'.format(path)) in records
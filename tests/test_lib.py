@@ -2,7 +2,7 @@
 
 import pytest
 
-from sphinxcontrib.versioning.lib import Config
+from sphinxcontrib.versioning.lib import Config, write_file
 
 
 def test_config():
@@ -26,24 +26,43 @@ def test_config():
         ('banner_greatest_tag', False),
         ('banner_main_ref', 'master'),
         ('banner_recent_tag', False),
+        ('build_jobs', 1),
+        ('build_timeout', None),
         ('chdir', None),
+        ('doctree_cache_dir', None),
+        ('early_push', False),
+        ('git_budget', tuple()),
         ('git_root', None),
+        ('git_trace2_perf', None),
         ('greatest_tag', False),
         ('grm_exclude', tuple()),
+        ('history_file', None),
         ('invert', True),
+        ('jinja_cache_dir', None),
         ('local_conf', None),
+        ('memory_limit', None),
+        ('metrics_file', None),
         ('no_colors', False),
         ('no_local_conf', False),
         ('overflow', ('-D', 'key=value')),
+        ('poll_interval', 600),
         ('priority', None),
+        ('profile_dir', None),
         ('push_remote', 'origin'),
         ('recent_tag', False),
+        ('resume', False),
         ('root_ref', 'master'),
+        ('shard', None),
         ('show_banner', False),
         ('sort', tuple()),
+        ('start_method', None),
+        ('state_dir', None),
+        ('timings', None),
         ('verbose', 1),
+        ('webhook_port', None),
         ('whitelist_branches', tuple()),
         ('whitelist_tags', tuple()),
+        ('worker_builds', 1),
     ]
     assert actual == expected
 
@@ -70,3 +89,16 @@ def test_config():
     with pytest.raises(AttributeError) as exc:
         config.update(dict(invert=False))
     assert exc.value.args[0] == "'Config' object does not support item re-assignment on 'invert'"
+
+
+def test_write_file(tmpdir):
+    """Test writing a new file and replacing an existing one.
+
+    :param tmpdir: pytest fixture.
+    """
+    path = tmpdir.join('file.json')
+    write_file(str(path), 'new')
+    assert path.read() == 'new'
+    write_file(str(path), 'replaced')
+    assert path.read() == 'replaced'
+    assert [p.basename for p in tmpdir.listdir()] == ['file.json']
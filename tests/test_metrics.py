@@ -0,0 +1,86 @@
+"""Test objects in module."""
+
+from sphinxcontrib.versioning import metrics
+
+
+def report():
+    """Get a report like sphinxcontrib.versioning.timings.Timings.report() returns.
+
+    :return: Report.
+    :rtype: dict
+    """
+    return dict(
+        builds=[
+            dict(cpu=2.0, name='master', pages=4, peak_rss=None, phases=None, root=True, wall=2.5),
+            dict(cpu=1.0, name='v1.0', pages=4, peak_rss=None, phases=None, root=False, wall=1.5),
+            dict(cpu=None, name='feature"x', pages=None, peak_rss=None, phases=None, root=False, wall=0.5),
+        ],
+        cached=[dict(name='v0.9', root=False)],
+        cpu=3.5,
+        failures=[dict(name='feature"x', phase='build'), dict(name='old', phase='read_config')],
+        git={'archive': 2, 'ls-remote': 1},
+        git_total=3,
+        peak_rss=None,
+        phases=[dict(name='export', wall=0.25), dict(name='build', wall=4.5), dict(name='export', wall=0.5)],
+        sizes=dict(exported=1000, output=2000),
+        started=1500000000.0,
+        wall=6.0,
+    )
+
+
+def test_format_metrics():
+    """Test the text exposition format."""
+    lines = metrics.format_metrics(report()).splitlines()
+    assert lines[:2] == [
+        '# HELP sphinx_versioning_last_run_timestamp_seconds Unix time the last run started.',
+        '# TYPE sphinx_versioning_last_run_timestamp_seconds gauge',
+    ]
+    samples = [line for line in lines if not line.startswith('#')]
+    assert samples == [
+        'sphinx_versioning_last_run_timestamp_seconds 1500000000.0',
+        'sphinx_versioning_run_duration_seconds 6.0',
+        'sphinx_versioning_run_cpu_seconds 3.5',
+        'sphinx_versioning_phase_duration_seconds{phase="build"} 4.5',
+        'sphinx_versioning_phase_duration_seconds{phase="export"} 0.75',
+        'sphinx_versioning_builds{result="built"} 2',
+        'sphinx_versioning_builds{result="cached"} 1',
+        'sphinx_versioning_builds{result="failed"} 1',
+        'sphinx_versioning_build_duration_seconds{ref="master",root="true"} 2.5',
+        'sphinx_versioning_build_duration_seconds{ref="v1.0",root="false"} 1.5',
+        'sphinx_versioning_build_duration_seconds{ref="feature\\"x",root="false"} 0.5',
+        'sphinx_versioning_ref_failures{phase="build",ref="feature\\"x"} 1',
+        'sphinx_versioning_ref_failures{phase="read_config",ref="old"} 1',
+        'sphinx_versioning_git_subprocesses{command="archive"} 2',
+        'sphinx_versioning_git_subprocesses{command="ls-remote"} 1',
+        'sphinx_versioning_exported_bytes 1000',
+        'sphinx_versioning_output_bytes 2000',
+    ]
+
+
+def test_repeated_builds():
+    """Versions built more than once (e.g. rebuilding everything after a failure) have one sample each."""
+    data = report()
+    data['builds'] += [
+        dict(cpu=2.0, name='master', pages=4, peak_rss=None, phases=None, root=True, wall=3.0),
+        dict(cpu=1.0, name='v1.0', pages=4, peak_rss=None, phases=None, root=False, wall=1.25),
+    ]
+    samples = [line for line in metrics.format_metrics(data).splitlines() if not line.startswith('#')]
+    assert 'sphinx_versioning_builds{result="built"} 2' in samples
+    assert 'sphinx_versioning_builds{result="failed"} 1' in samples
+    assert [s for s in samples if s.startswith('sphinx_versioning_build_duration_seconds')] == [
+        'sphinx_versioning_build_duration_seconds{ref="master",root="true"} 3.0',
+        'sphinx_versioning_build_duration_seconds{ref="v1.0",root="false"} 1.25',
+        'sphinx_versioning_build_duration_seconds{ref="feature\\"x",root="false"} 0.5',
+    ]
+
+
+def test_write(tmpdir):
+    """Test writing and replacing the file.
+
+    :param tmpdir: pytest fixture.
+    """
+    path = tmpdir.join('docs.prom')
+    path.write('old')
+    metrics.write(str(path), report())
+    assert path.read() == metrics.format_metrics(report())
+    assert [p.basename for p in tmpdir.listdir()] == ['docs.prom']
@@ -0,0 +1,88 @@
+"""Test objects in module."""
+
+import logging
+import pstats
+
+import pytest
+
+from sphinxcontrib.versioning import profiles
+
+
+@pytest.fixture(autouse=True)
+def clear_assigned():
+    """Don't leave assigned paths behind for other tests."""
+    yield
+    profiles.ASSIGNED.clear()
+
+
+def work(count):
+    """Function to profile.
+
+    :param int count: Return value.
+
+    :return: count
+    :rtype: int
+    """
+    return sum(1 for _ in range(count))
+
+
+def fail():
+    """Function to profile that raises."""
+    raise ValueError('failed')
+
+
+def test_profile_path(tmpdir):
+    """Test file names.
+
+    :param tmpdir: pytest fixture.
+    """
+    directory = str(tmpdir.join('profiles'))
+    assert profiles.profile_path(directory, 'master', 'build') == str(tmpdir.join('profiles', 'master-build.prof'))
+    assert tmpdir.join('profiles').check(dir=True)
+    assert profiles.profile_path(directory, 'master', 'root') == str(tmpdir.join('profiles', 'master-root.prof'))
+    assert profiles.profile_path(directory, 'master', 'build') == str(tmpdir.join('profiles', 'master-build-2.prof'))
+    assert profiles.profile_path(directory, 'master', 'build') == str(tmpdir.join('profiles', 'master-build-3.prof'))
+    expected = str(tmpdir.join('profiles', 'feature_one-read_config.prof'))
+    assert profiles.profile_path(directory, 'feature/one', 'read_config') == expected
+
+
+def test_run_profiled(tmpdir):
+    """Test profiling functions that return and raise.
+
+    :param tmpdir: pytest fixture.
+    """
+    path = str(tmpdir.join('good.prof'))
+    assert profiles.run_profiled(path, work, (5,)) == 5
+    assert any(k[2] == 'work' for k in pstats.Stats(path).stats)
+
+    path = str(tmpdir.join('bad.prof'))
+    with pytest.raises(ValueError):
+        profiles.run_profiled(path, fail, ())
+    assert any(k[2] == 'fail' for k in pstats.Stats(path).stats)
+
+
+def test_merge(caplog, tmpdir):
+    """Test merging profiles per phase.
+
+    :param caplog: pytest fixture.
+    :param tmpdir: pytest fixture.
+    """
+    caplog.set_level(logging.INFO)
+    directory = str(tmpdir)
+    profiles.run_profiled(profiles.profile_path(directory, 'master', 'build'), work, (1,))
+    profiles.run_profiled(profiles.profile_path(directory, 'v1.0', 'build'), work, (2,))
+    profiles.run_profiled(profiles.profile_path(directory, 'master', 'root'), work, (3,))
+    profiles.profile_path(directory, 'v2.0', 'build')  # Child process terminated before writing.
+    tmpdir.join('v3.0-read_config.prof').write('')
+    profiles.ASSIGNED[str(tmpdir.join('v3.0-read_config.prof'))] = 'read_config'
+
+    merged = profiles.merge(directory)
+    assert merged == [str(tmpdir.join('build.prof')), str(tmpdir.join('root.prof'))]
+    stats = pstats.Stats(merged[0]).stats
+    assert [v[1] for k, v in stats.items() if k[2] == 'work'] == [2]  # Called once in each of the two refs.
+    assert not profiles.ASSIGNED
+    records = [(r.levelname, r.getMessage()) for r in caplog.records]
+    assert ('WARNING', 'Skipping unreadable profile: {}'.format(tmpdir.join('v3.0-read_config.prof'))) in records
+    assert ('INFO', 'Merged 2 build profiles into: {}'.format(tmpdir.join('build.prof'))) in records
+
+    assert profiles.merge(directory) == list()  # Nothing new.
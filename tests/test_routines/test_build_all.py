@@ -1,13 +1,15 @@
 """Test function in module."""
 
 import re
-from os.path import join
+from os.path import basename, join
 
 import pytest
 
+from sphinxcontrib.versioning import routines
 from sphinxcontrib.versioning.git import export
 from sphinxcontrib.versioning.lib import HandledError
-from sphinxcontrib.versioning.routines import build_all, gather_git_info
+from sphinxcontrib.versioning.routines import build_all, gather_git_info, pre_build
+from sphinxcontrib.versioning.state import BuildState, cache_dir
 from sphinxcontrib.versioning.versions import Versions
 
 RE_LAST_UPDATED = re.compile(r'Last updated[^\n]+\n')
@@ -299,6 +301,8 @@ def test_last_updated(tmpdir, local_docs):
     exported_root = tmpdir.ensure_dir('exported_root')
     export(str(local_docs), versions['master']['sha'], str(exported_root.join(versions['master']['sha'])))
     export(str(local_docs), versions['other']['sha'], str(exported_root.join(versions['other']['sha'])))
+    for path in exported_root.visit('*.rst'):
+        path.setmtime(0)  # Dates come from the last commits export() recorded, not mtimes.
 
     # Run.
     destination = tmpdir.ensure_dir('destination')
@@ -321,8 +325,9 @@ def test_last_updated(tmpdir, local_docs):
     assert three == ['Last updated on Dec 5, 2016, 3:28:05 AM.\n']
 
 
+@pytest.mark.parametrize('jobs', [1, 3])
 @pytest.mark.parametrize('parallel', [False, True])
-def test_error(tmpdir, config, local_docs, urls, parallel):
+def test_error(tmpdir, config, local_docs, urls, parallel, jobs):
     """Test with a bad root ref. Also test skipping bad non-root refs.
 
     :param tmpdir: pytest fixture.
@@ -330,7 +335,9 @@ def test_error(tmpdir, config, local_docs, urls, parallel):
     :param local_docs: conftest fixture.
     :param urls: conftest fixture.
     :param bool parallel: Run sphinx-build with -j option.
+    :param int jobs: Number of versions to build at the same time.
     """
+    config.build_jobs = jobs
     config.overflow = ('-j', '2') if parallel else tuple()
     pytest.run(local_docs, ['git', 'checkout', '-b', 'a_good', 'master'])
     pytest.run(local_docs, ['git', 'checkout', '-b', 'c_good', 'master'])
@@ -386,6 +393,28 @@ def test_error(tmpdir, config, local_docs, urls, parallel):
     ])
 
 
+def test_timeout(tmpdir, config, local_docs):
+    """Test skipping a ref that takes too long to build.
+
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    config.build_timeout = 5
+    pytest.run(local_docs, ['git', 'checkout', '-b', 'hangs', 'master'])
+    local_docs.join('conf.py').write('import time\ntime.sleep(60)\n')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Hanging version.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'hangs'])
+
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()))
+    exported_root = tmpdir.ensure_dir('exported_root')
+    for name in ('hangs', 'master'):
+        export(str(local_docs), versions[name]['sha'], str(exported_root.join(versions[name]['sha'])))
+
+    build_all(str(exported_root), str(tmpdir.ensure_dir('destination')), versions)
+    assert [r['name'] for r in versions.remotes] == ['master']
+
+
 def test_all_errors(tmpdir, local_docs, urls):
     """Test good root ref with all bad non-root refs.
 
@@ -413,3 +442,149 @@ def test_all_errors(tmpdir, local_docs, urls):
     # Verify root HTML links.
     urls(destination.join('contents.html'), ['<li><a href="master/contents.html">master</a></li>'])
     urls(destination.join('master', 'contents.html'), ['<li><a href="contents.html">master</a></li>'])
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_order_checkpoint(monkeypatch, tmpdir, config, jobs):
+    """Test build order and calling checkpoint once after the important versions.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param int jobs: Number of builds at the same time.
+    """
+    built = list()
+
+    def build_parallel(builds, build_jobs):
+        """Record order and "build" in no time.
+
+        :param list builds: Tuples of build() arguments.
+        :param int build_jobs: Number of builds at the same time.
+        """
+        assert build_jobs == jobs
+        for args in builds:
+            built.append(args[3:])
+            yield args, True, 1.0
+
+    monkeypatch.setattr('sphinxcontrib.versioning.routines.build_parallel', build_parallel)
+    config.banner_main_ref = None
+    config.build_jobs = jobs
+    config.history_file = str(tmpdir.join('history.json'))
+    versions = Versions([
+        ('sha1', 'master', 'heads', 1000, 'conf.py'),
+        ('sha2', 'v1.0.0', 'tags', 1100, 'conf.py'),
+        ('sha3', 'old', 'heads', 900, 'conf.py'),
+        ('sha4', 'older', 'heads', 800, 'conf.py'),
+    ])
+    for remote, pages in zip(versions.remotes, (1, 1, 2, 5)):
+        remote['found_docs'] = tuple(str(i) for i in range(pages))
+
+    build_all('exported_root', 'destination', versions, lambda v: built.append(('checkpoint', v is versions)))
+    expected = [
+        ('master', True),
+        ('master', False),
+        ('v1.0.0', False),
+        ('checkpoint', True),
+        ('old', False),
+        ('older', False),
+    ]
+    if jobs > 1:
+        expected[-2:] = expected[-2:][::-1]  # More pages, built first.
+    assert built == expected
+
+
+def test_resume(monkeypatch, tmpdir, config, local_docs):
+    """Test skipping builds recorded in the state directory.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    built = list()
+    real_build_parallel = routines.build_parallel
+
+    def build_parallel(builds, build_jobs):
+        """Record builds, then build.
+
+        :param list builds: Tuples of build() arguments.
+        :param int build_jobs: Number of builds at the same time.
+        """
+        built.extend(args[3:] for args in builds)
+        return real_build_parallel(builds, build_jobs)
+
+    monkeypatch.setattr('sphinxcontrib.versioning.routines.build_parallel', build_parallel)
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'v1.0.0'])
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()))
+    exported_root = tmpdir.ensure_dir('exported_root')
+    export(str(local_docs), versions['master']['sha'], str(exported_root.join(versions['master']['sha'])))
+    destination = tmpdir.ensure_dir('destination')
+    state = BuildState(str(tmpdir.join('state')))
+    everything = [('master', True), ('master', False), ('v1.0.0', False)]
+
+    # Without --resume everything is built and recorded.
+    build_all(str(exported_root), str(destination), versions, state=state)
+    assert built == everything
+    assert sorted(state.builds) == ['', 'master', 'v1.0.0']
+    assert 'contents.html' in state.builds[''][1]
+    assert not any(p.startswith('master/') for p in state.builds[''][1])  # Other versions not part of root's files.
+
+    # Resume, nothing to do.
+    config.resume = True
+    del built[:]
+    build_all(str(exported_root), str(destination), versions, state=BuildState(str(tmpdir.join('state'))))
+    assert built == []
+
+    # Missing or truncated files.
+    destination.join('v1.0.0', 'contents.html').remove()
+    destination.join('contents.html').write('')
+    build_all(str(exported_root), str(destination), versions, state=state)
+    assert built == [('master', True), ('v1.0.0', False)]
+
+    # Different settings.
+    del built[:]
+    config.show_banner = True
+    build_all(str(exported_root), str(destination), versions, state=state)
+    assert built == everything
+
+
+def test_doctree_cache_dir(tmpdir, config, local_docs):
+    """Test incremental builds in later runs with --doctree-cache-dir, only re-reading changed docs.
+
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    config.doctree_cache_dir = str(tmpdir.join('cache'))
+    cache = tmpdir.join('cache', basename(cache_dir(config.doctree_cache_dir, 'master')))
+
+    def run(number):
+        """Run pre_build() and build_all() like the build sub command, into a new destination.
+
+        :param int number: Number of the run, for the destination directory name.
+
+        :return: Destination directory.
+        """
+        versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()))
+        exported_root = pre_build(str(local_docs), versions)
+        destination = tmpdir.ensure_dir('destination{}'.format(number))
+        build_all(exported_root, str(destination), versions)
+        return destination
+
+    run(1)
+    assert not tmpdir.join('destination1', 'master', '.doctrees').check()
+    for path in cache.visit('*.doctree'):
+        path.setmtime(1)
+
+    local_docs.join('two.rst').write('Changed\n', mode='a')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Changed two.'], environ=pytest.author_committer_dates(-10))
+    pytest.run(local_docs, ['git', 'push', 'origin', 'master'])
+    destination = run(2)
+
+    for doctrees in ('doctrees', 'root_doctrees'):
+        reread = sorted(p.purebasename for p in cache.join(doctrees).visit('*.doctree') if p.mtime() > 1)
+        assert reread == ['two']
+    assert 'Changed' in destination.join('two.html').read()
+    assert 'Changed' in destination.join('master', 'two.html').read()
+    assert 'Changed' not in destination.join('one.html').read()
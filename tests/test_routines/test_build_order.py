@@ -0,0 +1,48 @@
+"""Test function in module."""
+
+import pytest
+
+from sphinxcontrib.versioning.routines import build_order
+from sphinxcontrib.versioning.versions import Versions
+
+REMOTES = [
+    ('sha1', 'master', 'heads', 1000, 'conf.py'),
+    ('sha2', 'v1.0.0', 'tags', 1100, 'conf.py'),
+    ('sha3', 'v2.0.0', 'tags', 1200, 'conf.py'),
+    ('sha4', 'old', 'heads', 900, 'conf.py'),
+    ('sha5', 'feature', 'heads', 1300, 'conf.py'),
+    ('sha6', 'older', 'heads', 800, 'conf.py'),
+    ('sha7', 'v0.9.0', 'tags', 950, 'conf.py'),
+]
+
+
+@pytest.mark.parametrize('banner_main_ref', [None, 'old'])
+def test_order(config, banner_main_ref):
+    """Test order.
+
+    :param config: conftest fixture.
+    :param str banner_main_ref: Banner main ref config value.
+    """
+    config.banner_main_ref = banner_main_ref
+    versions = Versions(REMOTES, sort=('alpha',))
+    important, others = build_order(versions)
+
+    if banner_main_ref:
+        assert [r['name'] for r in important] == ['master', 'old', 'feature', 'v2.0.0']
+        assert [r['name'] for r in others] == ['v1.0.0', 'v0.9.0', 'older']
+    else:
+        assert [r['name'] for r in important] == ['master', 'feature', 'v2.0.0']
+        assert [r['name'] for r in others] == ['v1.0.0', 'v0.9.0', 'old', 'older']
+
+
+def test_root_ref_missing(config):
+    """Root ref not in remotes (e.g. removed after failing to build) is skipped.
+
+    :param config: conftest fixture.
+    """
+    config.root_ref = 'missing'
+    config.banner_main_ref = None
+    versions = Versions(REMOTES[:2])
+    important, others = build_order(versions)
+    assert [r['name'] for r in important] == ['v1.0.0', 'master']
+    assert others == list()
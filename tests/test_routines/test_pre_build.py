@@ -5,8 +5,10 @@ import posixpath
 import py
 import pytest
 
+from sphinxcontrib.versioning import tracing
 from sphinxcontrib.versioning.lib import HandledError
 from sphinxcontrib.versioning.routines import gather_git_info, pre_build
+from sphinxcontrib.versioning.state import BuildState
 from sphinxcontrib.versioning.versions import Versions
 
 
@@ -119,3 +121,56 @@ def test_error(config, local_docs):
     config.root_ref = 'master'
     pre_build(str(local_docs), versions)
     assert [r['name'] for r in versions.remotes] == ['a_good', 'c_good', 'master']
+
+
+def test_state(monkeypatch, tmpdir, config, local_docs):
+    """Test reusing exports and configs of an interrupted build.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    state = BuildState(str(tmpdir.join('state')))
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()))
+    exported_root = py.path.local(pre_build(str(local_docs), versions, state))
+    assert exported_root == tmpdir.join('state', 'exported')
+    assert state.exported == [versions['master']['sha']]
+    assert len(state.configs) == 1
+
+    # Not resuming, config read again.
+    read = list()
+    monkeypatch.setattr('sphinxcontrib.versioning.routines.export', lambda *a: read.append('export'))
+    monkeypatch.setattr('sphinxcontrib.versioning.routines.read_config', lambda *a: read.append('read') or dict(
+        found_docs=('contents',), html_theme='default', master_doc='contents'))
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()))
+    pre_build(str(local_docs), versions, BuildState(str(tmpdir.join('state'))))
+    assert read == ['read']
+    assert versions['master']['found_docs'] == ('contents',)
+
+    # Resuming.
+    del read[:]
+    config.resume = True
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()))
+    pre_build(str(local_docs), versions, BuildState(str(tmpdir.join('state'))))
+    assert read == []
+    assert versions['master']['found_docs'] == ('contents',)  # Recorded by the previous run.
+
+
+def test_git_commands(local_docs):
+    """Count git commands per phase, to catch e.g. running git once per file.
+
+    :param local_docs: conftest fixture.
+    """
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'v1.0.0'])
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()))
+
+    with tracing.trace() as tracer:
+        pre_build(str(local_docs), versions)
+    commands = [(r['phase'], r['command'][1]) for r in tracer.records]
+    rst_files = len(local_docs.listdir('*.rst'))
+    assert commands.count(('export', 'archive')) == 1  # Tag and master are the same commit.
+    assert rst_files > 1
+    assert commands.count(('export', 'log')) == 1  # Last commit date of all files.
+    assert tracer.counts == dict(export=2)  # No git commands while building.
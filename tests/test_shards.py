@@ -0,0 +1,118 @@
+"""Test objects in module."""
+
+import json
+
+import pytest
+
+from sphinxcontrib.versioning import shards
+from sphinxcontrib.versioning.lib import HandledError
+from sphinxcontrib.versioning.versions import Versions
+
+
+@pytest.mark.parametrize('value,expected', [('1/1', (1, 1)), ('2/4', (2, 4)), ('10/10', (10, 10))])
+def test_parse_shard(value, expected):
+    """Test valid values.
+
+    :param str value: Value to parse.
+    :param tuple expected: Expected return value.
+    """
+    assert shards.parse_shard(value) == expected
+
+
+@pytest.mark.parametrize('value', [None, '', '1', '0/2', '3/2', '1/0', 'a/b', '1/2/3'])
+def test_parse_shard_invalid(value):
+    """Test invalid values.
+
+    :param str value: Value to parse.
+    """
+    with pytest.raises(ValueError):
+        shards.parse_shard(value)
+
+
+def test_assign_shards():
+    """Test balancing by pages and determinism."""
+    remotes = [('sha{}'.format(i), 'v{}'.format(i), 'tags', i, 'conf.py') for i in range(6)]
+    versions = Versions(remotes)
+    for remote, pages in zip(versions.remotes, (10, 1, 1, 5, 4, 1)):
+        remote['found_docs'] = tuple(str(i) for i in range(pages))
+
+    assert shards.assign_shards(versions, 'v1', 1) == [['v0', 'v3', 'v4', 'v1', 'v2', 'v5']]
+    assert shards.assign_shards(versions, 'v1', 2) == [['v3', 'v4', 'v2'], ['v0', 'v1', 'v5']]
+    assert sorted(n for s in shards.assign_shards(versions, 'v1', 4) for n in s) == ['v0', 'v1', 'v2', 'v3', 'v4', 'v5']
+    assert [len(s) for s in shards.assign_shards(versions, 'v1', 8)] == [0, 1, 1, 1, 1, 1, 1, 0]  # Root in first.
+
+
+@pytest.fixture(name='shard_dirs')
+def fx_shard_dirs(tmpdir):
+    """Two shard output directories with manifests.
+
+    :param tmpdir: pytest fixture.
+
+    :return: Both directories.
+    :rtype: list
+    """
+    versions = Versions([('sha1', 'master', 'heads', 1, 'conf.py'), ('sha2', 'v1', 'tags', 2, 'conf.py')])
+    one, two = tmpdir.ensure_dir('one'), tmpdir.ensure_dir('two')
+    one.ensure('index.html').write('root')
+    one.ensure('master', 'index.html').write('master')
+    one.ensure('_static', 'style.css').write('css')
+    two.ensure('v1', 'index.html').write('v1')
+    shards.write_manifest(str(one), versions, 'master', 1, 2, ['master'])
+    shards.write_manifest(str(two), versions, 'master', 2, 2, ['v1'])
+    return [one, two]
+
+
+def test_merge(tmpdir, shard_dirs):
+    """Test merging.
+
+    :param tmpdir: pytest fixture.
+    :param list shard_dirs: local fixture.
+    """
+    destination = tmpdir.ensure_dir('destination')
+    destination.ensure('old.html').write('old')
+    destination.ensure('v1', 'index.html').write('old')
+    shards.merge([str(d) for d in shard_dirs[::-1]], str(destination))
+    actual = sorted(f.relto(destination) for f in destination.visit() if f.check(file=True))
+    assert actual == [
+        tmpdir.join('_static', 'style.css').relto(tmpdir),
+        'index.html',
+        tmpdir.join('master', 'index.html').relto(tmpdir),
+        'old.html',
+        tmpdir.join('v1', 'index.html').relto(tmpdir),
+    ]
+    assert destination.join('v1', 'index.html').read() == 'v1'
+
+
+@pytest.mark.parametrize('problem', ['missing_shard', 'duplicate_shard', 'root_dir', 'built', 'no_manifest',
+                                     'conflict'])
+def test_merge_errors(caplog, tmpdir, shard_dirs, problem):
+    """Test verification failures.
+
+    :param caplog: pytest extension fixture.
+    :param tmpdir: pytest fixture.
+    :param list shard_dirs: local fixture.
+    :param str problem: What's wrong with the shards.
+    """
+    one, two = shard_dirs
+    manifest = json.loads(two.join(shards.MANIFEST).read())
+    if problem == 'missing_shard':
+        shard_dirs = [one]
+    elif problem == 'duplicate_shard':
+        shard_dirs = [one, one]
+    elif problem == 'root_dir':
+        manifest['versions']['v1']['root_dir'] = 'v1_'
+    elif problem == 'built':
+        manifest['built'] = list()
+    elif problem == 'no_manifest':
+        two.join(shards.MANIFEST).remove()
+    else:
+        two.ensure('_static', 'style.css').write('different')
+    if two.join(shards.MANIFEST).check():
+        two.join(shards.MANIFEST).write(json.dumps(manifest))
+
+    destination = tmpdir.ensure_dir('destination')
+    with pytest.raises(HandledError):
+        shards.merge([str(d) for d in shard_dirs], str(destination))
+    assert [r.levelname for r in caplog.records].count('ERROR') == 1
+    if problem != 'conflict':
+        assert not destination.listdir()
@@ -1,10 +1,18 @@
 """Test function."""
 
+import json
+import os
+
+import pkg_resources
 import pytest
 
+from sphinxcontrib.versioning import timings
+from sphinxcontrib.versioning.git import LAST_COMMITS_FILE
 from sphinxcontrib.versioning.lib import HandledError
-from sphinxcontrib.versioning.sphinx_ import build
+from sphinxcontrib.versioning.sphinx_ import (build, build_parallel, EventHandlers, PLACEHOLDER, read_last_commits,
+                                              VersionsSnapshot, WARM_MODULES, warm_up)
 from sphinxcontrib.versioning.versions import Versions
+from sphinxcontrib.versioning.workers import close_idle_workers
 
 
 @pytest.mark.parametrize('no_feature', [True, False])
@@ -70,6 +78,25 @@ def test_overflow(tmpdir, config, local_docs):
     assert '2016, SCV' in contents
 
 
+def test_jinja_cache_dir(tmpdir, config, local_docs):
+    """Test sharing compiled Jinja2 templates between builds.
+
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib.versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    config.jinja_cache_dir = str(tmpdir.join('jinja', 'cache'))
+    versions = Versions([('', 'master', 'heads', 1, 'conf.py'), ('', 'feature', 'heads', 2, 'conf.py')])
+
+    build(str(local_docs), str(tmpdir.ensure_dir('master')), versions, 'master', False)
+    cached = {p.basename: p.mtime() for p in tmpdir.join('jinja', 'cache').listdir()}
+    assert len(cached) > 2  # Theme templates, versions.html, etc.
+
+    build(str(local_docs), str(tmpdir.ensure_dir('feature')), versions, 'feature', False)
+    assert {p.basename: p.mtime() for p in tmpdir.join('jinja', 'cache').listdir()} == cached
+    assert '<li><a href="../master/contents.html">master</a></li>' in tmpdir.join('feature', 'contents.html').read()
+
+
 def test_sphinx_error(tmpdir, local_docs):
     """Test error handling.
 
@@ -210,3 +237,234 @@ def test_subdirs(tmpdir, local_docs, urls):
             '<li><a href="{}master/{}sub.html">master</a></li>'.format('../' * i, 'subdir/' * i),
             '<li><a href="{}feature/{}sub.html">feature</a></li>'.format('../' * i, 'subdir/' * i),
         ])
+
+
+def test_rewrite_changed_menus(tmpdir, local_docs):
+    """Make sure rebuilding in the same directory only rewrites pages whose links to other versions changed.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    """
+    target = tmpdir.ensure_dir('target')
+    pages = tuple(sorted(p.purebasename for p in local_docs.listdir('*.rst')))
+    remotes = [('', 'master', 'heads', 1, 'conf.py'), ('', 'feature', 'heads', 2, 'conf.py')]
+
+    def rebuild(remote_tuples, feature_docs):
+        """Build after marking all pages as written in the future, to find rewritten ones.
+
+        :param list remote_tuples: Remotes passed to Versions.
+        :param tuple feature_docs: Found docs of the feature branch.
+
+        :return: Names of rewritten pages.
+        :rtype: list
+        """
+        for page in target.listdir('*.html'):
+            page.setmtime(4102444800)  # 2100-01-01.
+        versions = Versions(remote_tuples)
+        for remote in versions.remotes:
+            remote['found_docs'] = feature_docs if remote['name'] == 'feature' else pages
+        build(str(local_docs), str(target), versions, 'master', False)
+        return sorted(p.purebasename for p in target.listdir('*.html') if p.mtime() < 4102444800)
+
+    assert set(pages) < set(rebuild(remotes, pages))  # All pages written in the first build.
+    assert rebuild(remotes, pages) == []
+    rewritten = rebuild(remotes, tuple(p for p in pages if p != 'two'))
+    assert 'two' in rewritten
+    assert 'one' not in rewritten  # Unlike contents, its toctree doesn't include two.
+    assert 'three' not in rewritten
+    assert set(pages) <= set(rebuild(remotes + [('', 'v1.0.0', 'tags', 3, 'conf.py')], pages))
+
+
+def test_warm_up(monkeypatch):
+    """Verify modules are imported once, only themes that are importable are imported, and failures are ignored.
+
+    :param monkeypatch: pytest fixture.
+    """
+    monkeypatch.setattr('sphinxcontrib.versioning.sphinx_.WARMED', set())
+    monkeypatch.setattr('sphinxcontrib.versioning.workers.PRELOAD', set())
+    imported = list()
+
+    def import_module(name):
+        """Record imports and fail like a broken theme package would.
+
+        :param str name: Module name.
+        """
+        imported.append(name)
+        if name == 'sphinx_rtd_theme':
+            raise RuntimeError('Broken theme.')
+
+    monkeypatch.setattr('importlib.import_module', import_module)
+    entry_point = pkg_resources.EntryPoint.parse('registered = registered_theme.module')
+    monkeypatch.setattr(pkg_resources, 'iter_entry_points', lambda _: [entry_point])
+
+    warm_up('sphinx_rtd_theme', 'classic', 'does_not_exist')
+    assert imported == list(WARM_MODULES) + ['sphinx_rtd_theme']
+
+    imported[:] = list()
+    warm_up('sphinx_rtd_theme', 'registered')
+    assert imported == ['registered_theme.module']  # Registered through the sphinx.html_themes entry point.
+
+
+@pytest.mark.parametrize('start_method,worker_builds', [('fork', 1), ('fork', 2), ('forkserver', 2), ('spawn', 1)])
+def test_start_method(tmpdir, config, local_docs, urls, start_method, worker_builds):
+    """Verify builds work with every start method and with workers building more than once.
+
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib.versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param urls: conftest fixture.
+    :param str start_method: Start method for child processes.
+    :param int worker_builds: Builds per child process.
+    """
+    config.start_method = start_method
+    config.worker_builds = worker_builds
+    versions = Versions([('', 'master', 'heads', 1, 'conf.py'), ('', 'feature', 'heads', 2, 'conf.py')])
+    versions['master']['found_docs'] = ('contents',)
+    versions['feature']['found_docs'] = ('contents',)
+
+    try:
+        build(str(local_docs), str(tmpdir.join('root')), versions, 'master', True)
+        build(str(local_docs), str(tmpdir.join('feature')), versions, 'feature', False)
+    finally:
+        close_idle_workers()
+
+    urls(tmpdir.join('root', 'contents.html'), [
+        '<li><a href="master/contents.html">master</a></li>',
+        '<li><a href="feature/contents.html">feature</a></li>',
+    ])
+    urls(tmpdir.join('feature', 'contents.html'), [
+        '<li><a href="../master/contents.html">master</a></li>',
+        '<li><a href="contents.html">feature</a></li>',
+    ])
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_phases(tmpdir, config, local_docs, parallel):
+    """Verify children report time spent in each Sphinx phase.
+
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib.versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param bool parallel: Run sphinx-build with -j option.
+    """
+    config.overflow = ('-j', '2') if parallel else tuple()
+    versions = Versions([('', 'master', 'heads', 1, 'conf.py')])
+    versions['master']['found_docs'] = ('contents',)
+    builds = [(str(local_docs), str(tmpdir.join('root')), versions, 'master', True)]
+
+    timings.start()
+    try:
+        assert [r[1] for r in build_parallel(builds, 1)] == [True]
+        recorded = timings.CURRENT.builds
+    finally:
+        timings.CURRENT = None
+    assert len(recorded) == 1
+    phases = recorded[0]['phases']
+    assert set(phases) == {'environment', 'read', 'resolve', 'startup', 'versions', 'write'}
+    assert all(s >= 0 for s in phases.values())
+    assert sum(phases.values()) <= recorded[0]['wall']
+    if not parallel:
+        assert recorded[0]['pages'] == 6  # 4 docs, genindex, search.
+    else:
+        assert recorded[0]['pages'] > 0  # Docs written in Sphinx's own subprocesses aren't counted.
+
+
+def test_phases_template(tmpdir, config, local_docs):
+    """Verify rendering page templates counts towards the write phase, not the resolve phase of the next page.
+
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib.versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    local_docs.ensure('_templates', 'layout.html').write(
+        '{% extends "!layout.html" %}\n'
+        '{% block footer %}'
+        '{% for i in range(90000) %}{% for j in range(3) %}{% endfor %}{% endfor %}'
+        '{{ super() }}{% endblock %}\n'
+    )
+    local_docs.join('conf.py').write('templates_path = ["_templates"]\n')
+    config.overflow = tuple()
+    versions = Versions([('', 'master', 'heads', 1, 'conf.py')])
+    versions['master']['found_docs'] = ('contents',)
+    builds = [(str(local_docs), str(tmpdir.join('root')), versions, 'master', True)]
+
+    timings.start()
+    try:
+        assert [r[1] for r in build_parallel(builds, 1)] == [True]
+        phases = timings.CURRENT.builds[0]['phases']
+    finally:
+        timings.CURRENT = None
+    assert phases['write'] > 0
+    assert phases['resolve'] < phases['write'] / 10
+
+
+def test_render_cached():
+    """Verify templates are rendered once per key and URLs of each page are filled in."""
+    rendered = list()
+
+    class Templates(object):
+        """Stands in for app.builder.templates."""
+
+        @staticmethod
+        def render(template, context):
+            """Render a fake template.
+
+            :param str template: Template name.
+            :param dict context: Jinja2 context.
+
+            :return: HTML.
+            :rtype: str
+            """
+            rendered.append(template)
+            return ''.join('<a href="{}">{}</a>'.format(context['vpathto'](n), n) for n in context['names'])
+
+    app = type('App', (object,), dict(builder=type('Builder', (object,), dict(templates=Templates()))))
+    EventHandlers.FRAGMENTS = dict()
+    context = dict(names=['a', 'b'], vpathto=None)
+    overrides = dict(vpathto=lambda n: PLACEHOLDER.format(['a', 'b'].index(n)))
+
+    html = EventHandlers.render_cached(app, 'menu.html', context, ('menu',), overrides, ['a.html', '../b/c.html'])
+    assert html == '<a href="a.html">a</a><a href="../b/c.html">b</a>'
+    html = EventHandlers.render_cached(app, 'menu.html', context, ('menu',), overrides, ['../a/d.html', 'd.html'])
+    assert html == '<a href="../a/d.html">a</a><a href="d.html">b</a>'
+    assert rendered == ['menu.html']
+    assert context['vpathto'] is None
+
+
+def test_versions_snapshot(monkeypatch):
+    """Verify snapshots are reused only while versions are unchanged, and old snapshots are deleted.
+
+    :param monkeypatch: pytest fixture.
+    """
+    monkeypatch.setattr(VersionsSnapshot, 'LOADED', dict())
+    monkeypatch.setattr(VersionsSnapshot, 'SNAPSHOTS', dict())
+    versions = Versions([('', 'master', 'heads', 1, 'conf.py')])
+    first = VersionsSnapshot.get(versions)
+    assert VersionsSnapshot.get(versions) is first
+    assert VersionsSnapshot.get(Versions([('', 'master', 'heads', 1, 'conf.py')])) is first
+    assert first.load()['master']['date'] == 1
+
+    # Change a value that doesn't affect build order.
+    versions['master']['date'] = 2
+    second = VersionsSnapshot.get(versions)
+    assert second is not first
+    assert second.load()['master']['date'] == 2
+    assert not os.path.exists(first.path)
+    assert list(VersionsSnapshot.SNAPSHOTS.values()) == [second]
+    assert list(VersionsSnapshot.LOADED) == [second.path]
+
+
+@pytest.mark.parametrize('source_suffix', ['.rst', ['.rst']])
+def test_read_last_commits(tmpdir, source_suffix):
+    """Verify files outside the conf.py directory or with other extensions are ignored.
+
+    :param tmpdir: pytest fixture.
+    :param source_suffix: Sphinx config value, a string or a list.
+    """
+    dates = {'docs/index.rst': 1, 'docs/sub/page.rst': 2, 'docs/script.rs': 3, 'README.rst': 4}
+    tmpdir.join(LAST_COMMITS_FILE).write(json.dumps(dates))
+    srcdir = tmpdir.ensure_dir('docs')
+
+    assert read_last_commits(str(srcdir), 'docs/conf.py', source_suffix) == {'index': 1, 'sub/page': 2}
+    expected = {'docs/index': 1, 'docs/sub/page': 2, 'README': 4}
+    assert read_last_commits(str(tmpdir), 'conf.py', source_suffix) == expected
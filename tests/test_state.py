@@ -0,0 +1,120 @@
+"""Test objects in module."""
+
+from sphinxcontrib.versioning import state
+from sphinxcontrib.versioning.versions import Versions
+
+
+def test_hashes(config):
+    """Test settings_hash() and versions_hash().
+
+    :param config: conftest fixture.
+    """
+    before = state.settings_hash(config)
+    config.verbose = 2
+    assert state.settings_hash(config) == before  # Doesn't affect output.
+    config.overflow = ('-D', 'key=value')
+    assert state.settings_hash(config) != before
+
+    versions = Versions([('sha1', 'master', 'heads', 1, 'conf.py'), ('sha2', 'v1.0.0', 'tags', 2, 'conf.py')])
+    before = state.versions_hash(versions)
+    versions['master']['sha'] = 'sha3'
+    assert state.versions_hash(versions) == before  # Each version's own commit is hashed separately.
+    versions['master']['found_docs'] = ('contents', 'one')
+    assert state.versions_hash(versions) != before
+
+
+def test_save_load(tmpdir):
+    """Test saving and reading the state file.
+
+    :param tmpdir: pytest fixture.
+    """
+    directory = tmpdir.join('state')
+    instance = state.BuildState(str(directory))
+    assert directory.check(dir=True)
+    assert not directory.join(state.FILE_NAME).check()
+    instance.configs['key'] = dict(found_docs=['contents'], html_theme='alabaster', master_doc='contents')
+    instance.exported.append('sha1')
+    instance.save()
+
+    instance = state.BuildState(str(directory))
+    assert instance.configs == dict(key=dict(found_docs=['contents'], html_theme='alabaster', master_doc='contents'))
+    assert instance.exported == ['sha1']
+    assert not directory.join(state.FILE_NAME + '.tmp').check()
+
+    directory.join(state.FILE_NAME).write('{"builds": ')  # Killed while writing with an older version.
+    instance = state.BuildState(str(directory))
+    assert instance.builds == instance.configs == dict()
+    assert instance.exported == list()
+
+
+def test_record_complete(tmpdir):
+    """Test record(), is_complete(), and cleanup().
+
+    :param tmpdir: pytest fixture.
+    """
+    destination = tmpdir.ensure_dir('destination')
+    destination.ensure('contents.html').write('root')
+    destination.ensure('_static', 'style.css').write('css')
+    destination.ensure('v1', 'contents.html').write('v1')
+    instance = state.BuildState(str(tmpdir.join('state')))
+    instance.exported.append('sha1')
+    tmpdir.ensure('state', 'exported', 'sha1', 'conf.py')
+
+    instance.record(str(destination), '', 'inputs1', ['v1'])
+    instance.record(str(destination), 'v1', 'inputs2')
+    assert instance.builds[''] == ['inputs1', {'_static/style.css': 3, 'contents.html': 4}]
+    assert instance.builds['v1'] == ['inputs2', {'contents.html': 2}]
+    assert state.BuildState(str(tmpdir.join('state'))).builds == instance.builds
+
+    assert instance.is_complete(str(destination), '', 'inputs1')
+    assert not instance.is_complete(str(destination), '', 'inputs2')
+    assert not instance.is_complete(str(destination), 'v2', 'inputs2')
+    destination.join('v1', 'contents.html').write('v1 but longer')
+    assert not instance.is_complete(str(destination), 'v1', 'inputs2')
+    destination.join('_static', 'style.css').remove()
+    assert not instance.is_complete(str(destination), '', 'inputs1')
+
+    instance.cleanup()
+    assert not tmpdir.join('state', 'exported').check()
+    assert state.BuildState(str(tmpdir.join('state'))).exported == list()
+    assert state.BuildState(str(tmpdir.join('state'))).builds == instance.builds
+
+
+def test_cache_dir(tmpdir):
+    """Test cache_dir() names.
+
+    :param tmpdir: pytest fixture.
+    """
+    master = state.cache_dir(str(tmpdir), 'master')
+    assert master.startswith(str(tmpdir.join('master-')))
+    assert state.cache_dir(str(tmpdir), 'master') == master
+    assert state.cache_dir(str(tmpdir), 'feature/x') != state.cache_dir(str(tmpdir), 'feature_x')
+    assert len(state.cache_dir(str(tmpdir), 'feature/x').split('/')) == len(master.split('/'))  # Not nested.
+
+
+def test_sync_tree(tmpdir):
+    """Test sync_tree() only writing changed files.
+
+    :param tmpdir: pytest fixture.
+    """
+    source, target = tmpdir.ensure_dir('source'), tmpdir.join('target')
+    source.ensure('conf.py').write('one')
+    source.ensure('same.rst').write('same')
+    source.ensure('sub', 'changed.rst').write('before')
+    source.ensure('sub', 'removed.rst').write('removed')
+    assert state.sync_tree(str(source), str(target)) == 4
+    assert sorted(p.relto(target) for p in target.visit()) == sorted(p.relto(source) for p in source.visit())
+    for path in target.visit(lambda p: p.isfile()):
+        path.setmtime(1)
+
+    assert state.sync_tree(str(source), str(target)) == 0
+    source.join('sub', 'changed.rst').write('after')
+    source.join('sub', 'removed.rst').remove()
+    source.ensure('sub', 'new', 'added.rst').write('added')
+    assert state.sync_tree(str(source), str(target)) == 3
+
+    assert sorted(p.relto(target) for p in target.visit()) == sorted(p.relto(source) for p in source.visit())
+    assert target.join('sub', 'changed.rst').read() == 'after'
+    assert target.join('conf.py').mtime() == 1
+    assert target.join('same.rst').mtime() == 1
+    assert target.join('sub', 'changed.rst').mtime() > 1
@@ -0,0 +1,112 @@
+"""Test objects in module."""
+
+import json
+import logging
+
+import pytest
+
+from sphinxcontrib.versioning import timings
+from sphinxcontrib.versioning.git import run_command
+
+
+@pytest.fixture(autouse=True)
+def stop_recording():
+    """Don't leave recording enabled after tests."""
+    yield
+    timings.CURRENT = None
+
+
+def test_not_recording(local):
+    """Verify phases and builds are ignored unless recording.
+
+    :param local: conftest fixture.
+    """
+    before = timings.GIT_COMMANDS.get('rev-parse', 0)
+    with timings.phase('nothing'):
+        run_command(str(local), ['git', 'rev-parse', 'HEAD'])
+    timings.record_build('master', True, 1.0, None)
+    assert timings.CURRENT is None
+    assert timings.GIT_COMMANDS['rev-parse'] == before + 1  # Always counted.
+
+
+def test_recording(caplog, tmpdir, local):
+    """Test phases, builds, the JSON report, and the summary.
+
+    :param caplog: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    """
+    assert timings.start() is True
+    assert timings.start() is False  # Already recording, e.g. build invoked by push.
+
+    with timings.phase('list_remote'):
+        run_command(str(local), ['git', 'rev-parse', 'HEAD'])
+        run_command(str(local), ['git', 'rev-parse', 'HEAD'])
+    with timings.phase('export'):
+        sum(range(100000))
+    with pytest.raises(ValueError):
+        with timings.phase('export'):
+            run_command(str(local), ['git', 'status'])
+            raise ValueError
+    phases = dict(read=1.0, resolve=0.25, startup=0.5, versions=0.1, write=0.5)
+    timings.record_build('master', True, 2.5, dict(cpu=2.0, pages=4, peak_rss=50 * 1024 * 1024, phases=phases))
+    timings.record_build('broken', False, 0.5, None)
+
+    caplog.set_level(logging.INFO)
+    report_file = tmpdir.join('timings.json')
+    timings.finish(str(report_file))
+    assert timings.CURRENT is None
+    timings.finish(str(tmpdir.join('ignored.json')))  # Not recording anymore.
+    assert not tmpdir.join('ignored.json').check()
+
+    report = json.loads(report_file.read())
+    assert [(p['name'], p['git']) for p in report['phases']] == [
+        ('list_remote', {'rev-parse': 2}), ('export', {}), ('export', {'status': 1})]
+    assert report['builds'] == [
+        dict(cpu=2.0, name='master', pages=4, peak_rss=50 * 1024 * 1024, phases=phases, root=True, wall=2.5),
+        dict(cpu=None, name='broken', pages=None, peak_rss=None, phases=None, root=False, wall=0.5),
+    ]
+    assert report['git'] == {'rev-parse': 2, 'status': 1}
+    assert report['git_total'] == 3
+
+    messages = [r.getMessage() for r in caplog.records if r.name == timings.__name__]
+    assert messages[0].startswith('Timings: ')
+    assert messages[0].endswith(', 3 git commands.')
+    assert [m.split()[0] for m in messages[1:3]] == sorted(['list_remote', 'export'], key=lambda n: -sum(
+        p['wall'] for p in report['phases'] if p['name'] == n))
+    assert '(2x)' in [m for m in messages if m.startswith('  export')][0]
+    assert messages[3] == ('  sphinx phases: startup 0.5s, environment 0.0s, read 1.0s, resolve 0.2s, write 0.5s, '
+                           'versions 0.1s')
+    assert messages[4] == '  versions menu overhead: 25.0ms per page (4 pages)'
+    assert messages[5].startswith('  build root master')
+    assert '50 MiB' in messages[5]
+    assert messages[6].startswith('  build broken')
+    assert messages[-1] == 'Wrote timings report to: {}'.format(report_file)
+
+
+def test_metrics_only(caplog, tmpdir):
+    """Test cached and failed builds, sizes, and writing only metrics.
+
+    :param caplog: pytest fixture.
+    :param tmpdir: pytest fixture.
+    """
+    tmpdir.ensure('exported', 'a.txt').write('12345')
+    tmpdir.ensure('exported', '.git', 'objects').write('ignored')
+    timings.record_size('exported', str(tmpdir.join('exported')))  # Not recording, not measured.
+
+    assert timings.start() is True
+    timings.record_size('exported', str(tmpdir.join('exported')))
+    timings.record_size('exported', str(tmpdir.join('exported')))
+    timings.record_cached('v1.0', False)
+    timings.record_failure('old', 'read_config')
+    report = timings.CURRENT.report()
+    assert report['cached'] == [dict(name='v1.0', root=False)]
+    assert report['failures'] == [dict(name='old', phase='read_config')]
+    assert report['sizes'] == dict(exported=10)
+
+    caplog.set_level(logging.INFO)
+    metrics_file = tmpdir.join('docs.prom')
+    timings.finish(None, str(metrics_file))
+    assert 'sphinx_versioning_exported_bytes 10\n' in metrics_file.read()
+    messages = [r.getMessage() for r in caplog.records if r.name == timings.__name__]
+    assert messages == ['Wrote metrics to: {}'.format(metrics_file)]
@@ -0,0 +1,90 @@
+"""Test objects in module."""
+
+import logging
+from subprocess import CalledProcessError
+
+import pytest
+
+from sphinxcontrib.versioning import git, timings, tracing
+from sphinxcontrib.versioning.git import run_command
+
+
+def test_parse_budgets():
+    """Test parsing budgets."""
+    assert tracing.parse_budgets(()) == dict()
+    assert tracing.parse_budgets(('export=20', 'list_remote=1')) == dict(export=20, list_remote=1)
+    with pytest.raises(ValueError) as exc:
+        tracing.parse_budgets(('export',))
+    assert exc.value.args[0] == 'Invalid git budget "export", expected phase=count (e.g. export=20).'
+
+
+def test_trace(local):
+    """Test records of commands, output bytes, and retries.
+
+    :param local: conftest fixture.
+    """
+    with tracing.trace() as tracer:
+        with timings.phase('list_remote'):
+            output = run_command(str(local), ['git', 'rev-parse', 'HEAD'])
+        run_command(str(local), ['git', 'archive', '--format=tar', 'HEAD'], pipeto=lambda s: s.read())
+        with pytest.raises(CalledProcessError):
+            run_command(str(local), ['git', 'rev-parse', 'unknown'], retry=2)
+    assert not git.TRACERS
+    run_command(str(local), ['git', 'status'])  # Not traced.
+
+    assert [(r['command'][1], r['phase'], r['retries'], r['code'] != 0) for r in tracer.records] == [
+        ('rev-parse', 'list_remote', 0, False), ('archive', None, 0, False), ('rev-parse', None, 2, True)]
+    assert tracer.records[0]['output_bytes'] == len(output)
+    assert tracer.records[1]['output_bytes'] > 1024  # Tar file piped to function.
+    assert all(r['seconds'] > 0 and r['cwd'] == str(local) for r in tracer.records)
+    assert tracer.counts == {'list_remote': 1, None: 4}  # Retries count.
+
+
+def test_budgets(caplog, local):
+    """Test flagging commands over budget.
+
+    :param caplog: pytest fixture.
+    :param local: conftest fixture.
+    """
+    caplog.set_level(logging.DEBUG, logger=tracing.__name__)
+    with tracing.trace(dict(export=1, fetch=5)) as tracer:
+        with timings.phase('export'):
+            for _ in range(3):
+                run_command(str(local), ['git', 'rev-parse', 'HEAD'])
+        with timings.phase('fetch'):
+            run_command(str(local), ['git', 'rev-parse', 'HEAD'])
+    assert [r['over_budget'] for r in tracer.records] == [False, True, True, False]
+    assert tracer.over_budget() == dict(export=3)
+    records = [(r.levelname, r.getMessage()) for r in caplog.records if r.name == tracing.__name__]
+    assert records == [
+        ('WARNING', 'Phase export exceeded its budget of 1 git commands with: git rev-parse HEAD'),
+        ('DEBUG', 'Phase export over its budget of 1 git commands with: git rev-parse HEAD'),
+    ]
+
+
+def test_start_finish(caplog, tmpdir, local):
+    """Test registering once, GIT_TRACE2_PERF, and the summary.
+
+    :param caplog: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    """
+    caplog.set_level(logging.INFO)
+    perf = tmpdir.join('perf.txt')
+    tracer = tracing.start(dict(export=0), str(perf))
+    try:
+        assert tracing.start() is None  # Already tracing, e.g. build invoked by push.
+        with timings.phase('export'):
+            run_command(str(local), ['git', 'rev-parse', 'HEAD'])
+    finally:
+        tracing.finish(tracer)
+    assert not git.TRACERS
+    assert 'rev-parse' in perf.read()
+
+    messages = [r.getMessage() for r in caplog.records if r.name == tracing.__name__]
+    assert messages[0] == 'Phase export exceeded its budget of 0 git commands with: git rev-parse HEAD'
+    assert messages[1].startswith('Git commands: 1 in ')
+    assert messages[2].startswith('  export               1 git ')
+    assert messages[2].endswith('s (budget 0)')
+    assert messages[3:] == ['Phase export ran 1 git commands, over its budget of 0.',
+                            'Git wrote GIT_TRACE2_PERF output to: {}'.format(perf)]
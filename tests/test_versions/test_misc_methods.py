@@ -1,8 +1,10 @@
 """Test methods in Versions class."""
 
+import pickle
+
 import pytest
 
-from sphinxcontrib.versioning.versions import Versions
+from sphinxcontrib.versioning.versions import PageTable, Versions
 
 REMOTES = (
     ('0772e5ff32af52115a809d97cd506837fa209f7f', 'zh-pages', 'heads', 1465766422, 'README'),
@@ -114,8 +116,86 @@ def test_bool_len():
     assert len(versions) == 0
 
 
+def test_links_cache():
+    """Test branches/tags/iteration being computed once per page."""
+    versions = Versions(REMOTES)
+    versions['master']['found_docs'] = ('contents', 'one')
+    versions.context.update(dict(pagename='one', scv_is_root=False, current_version='master'))
+    tags = versions.tags
+    assert versions.tags is tags
+    assert versions.branches == [('zh-pages', '../zh-pages/contents.html'), ('master', 'one.html')]
+    assert list(versions) == versions.branches[:1] + [('master', 'one.html')] + tags
+
+    versions.context.update(dict(pagename='contents', scv_is_root=True))
+    assert versions.tags is not tags
+    assert versions.branches == [('zh-pages', 'zh-pages/contents.html'), ('master', 'master/contents.html')]
+
+
 def test_id():
     """Test remote IDs."""
     versions = Versions(REMOTES)
     for remote in versions.remotes:
         assert remote['id'] == '{}/{}'.format(remote['kind'], remote['name'])
+
+
+def test_remote_dict_access():
+    """Test Remote instances behaving like the dicts templates and state hashing use."""
+    remote = Versions(REMOTES).remotes[0]
+    assert remote['name'] == remote.name == 'zh-pages'
+    assert 'sha' in remote
+    assert 'unknown' not in remote
+    assert remote.get('unknown', 'default') == 'default'
+    assert [k for k, _ in remote.items()] == sorted(remote.keys())
+
+    remote['root_dir'] = 'other'
+    remote.update(dict(master_doc='index'))
+    assert (remote.root_dir, remote['master_doc']) == ('other', 'index')
+    with pytest.raises(KeyError):
+        remote['unknown'] = 1
+    with pytest.raises(KeyError):
+        remote['unknown']  # pylint: disable=pointless-statement
+
+    assert remote != Versions(REMOTES).remotes[0]
+    assert Versions(REMOTES).remotes[0] == Versions(REMOTES).remotes[0]
+
+
+def test_remote_found_docs_pooled():
+    """Test found_docs page names being the same string objects across remotes, stored as bitsets."""
+    versions = Versions(REMOTES)
+    versions['master']['found_docs'] = ('contents', ''.join(['one', '/', 'two']))
+    versions['v1.2.0']['found_docs'] = ('contents', ''.join(['one', '/two']))
+    versions['v1.2.0']['found_docs'] += ('three',)
+    assert versions['master']['found_docs'][1] is versions['v1.2.0']['found_docs'][1]
+    assert versions['v1.2.0']['found_docs'] == ('contents', 'one/two', 'three')
+    assert versions.pages.names == ['contents', 'one/two', 'three']
+    assert (versions['master'].docs, versions['v1.2.0'].docs, versions['v2.0.0'].docs) == (b'\x03', b'\x07', b'')
+    assert versions['v1.2.0'].has_doc('three')
+    assert not versions['master'].has_doc('three')
+    assert not versions['master'].has_doc('unknown')
+
+
+def test_remote_pickle():
+    """Test pickling remotes, e.g. when sent to child processes."""
+    versions = Versions(REMOTES)
+    versions['master']['found_docs'] = ('contents', 'one')
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        remotes = pickle.loads(pickle.dumps(versions.remotes, protocol))
+        assert remotes == versions.remotes
+        assert remotes[1]['found_docs'] == ('contents', 'one')
+        assert remotes[0].pages is remotes[1].pages
+
+
+def test_page_table():
+    """Test PageTable IDs and bitsets."""
+    table = PageTable()
+    assert table.encode([]) == b''
+    assert table.encode(['b', 'a', 'b']) == b'\x03'
+    assert table.ids == dict(a=0, b=1)
+
+    names = ['page_{:02d}'.format(i) for i in range(20)]
+    bits = table.encode(names[::2])
+    assert len(bits) == 2  # IDs 2 to 11.
+    assert table.decode(bits) == tuple(names[::2])
+    assert [table.contains(bits, n) for n in names[:4]] == [True, False, True, False]
+    assert not table.contains(b'\x03', 'page_00')  # Beyond the end of the bitset.
+    assert not table.contains(bits, 'a')
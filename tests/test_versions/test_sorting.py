@@ -128,3 +128,30 @@ def test_sort(remotes, sort):
         expected = [i[1] for i in remotes]
 
     assert actual == expected
+
+
+@pytest.mark.parametrize('sort', ['pep440', 'pep440,alpha', 'semver'])
+def test_sort_pep440(sort):
+    """Test sorting PEP 440 versions, highest first.
+
+    :param str sort: Passed to class after splitting by comma.
+    """
+    items = ['1.0.post1', 'v1.0', '1.0rc1', '1.0b2', '1!0.1', '1.0.dev1', '1.0a1.dev2', '1.0.0+local.2', '1.0+local.10',
+             '1.1', 'master', 'gh-pages']
+    remotes = [('', item, 'tags', i, 'README') for i, item in enumerate(items)]
+    versions = Versions(remotes, sort=sort.split(','))
+    versions.context.update(dict(pagename='contents', scv_is_root=True, current_version='master'))
+    actual = [i[0] for i in versions]
+
+    if sort == 'pep440':
+        expected = ['1!0.1', '1.1', '1.0.post1', '1.0+local.10', '1.0.0+local.2', 'v1.0', '1.0rc1', '1.0b2',
+                    '1.0a1.dev2', '1.0.dev1', 'master', 'gh-pages']
+    elif sort == 'pep440,alpha':
+        expected = ['1!0.1', '1.1', '1.0.post1', '1.0+local.10', '1.0.0+local.2', 'v1.0', '1.0rc1', '1.0b2',
+                    '1.0a1.dev2', '1.0.dev1', 'gh-pages', 'master']
+    else:
+        expected = ['1.1', 'v1.0', '1.0+local.10', '1.0.0+local.2', '1.0.dev1', '1.0.post1', '1.0a1.dev2', '1.0b2',
+                    '1.0rc1', '1!0.1', 'master', 'gh-pages']
+
+    assert actual == expected
+    assert versions.greatest_tag_remote == versions['1!0.1' if sort.startswith('pep440') else '1.1']
@@ -0,0 +1,174 @@
+"""Test objects in module."""
+
+import os
+import time
+
+import pytest
+
+from sphinxcontrib.versioning import workers
+
+
+def pid(fail=False):
+    """Return the process ID. Runs in child processes.
+
+    :param bool fail: Raise an exception instead.
+
+    :return: Process ID.
+    :rtype: int
+    """
+    if fail:
+        raise ValueError('Failing on purpose.')
+    return os.getpid()
+
+
+def sleep(seconds):
+    """Sleep and return the process ID. Runs in child processes.
+
+    :param float seconds: Seconds to sleep.
+
+    :return: Process ID.
+    :rtype: int
+    """
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def exit_now(code):
+    """Exit the child process.
+
+    :param int code: Exit code.
+    """
+    raise SystemExit(code)
+
+
+def allocate(megabytes):
+    """Allocate memory and return the process ID. Runs in child processes.
+
+    :param int megabytes: MiB to allocate.
+
+    :return: Process ID.
+    :rtype: int
+    """
+    data = bytearray(megabytes * 1024 * 1024)
+    return os.getpid() if data else None
+
+
+@pytest.fixture(autouse=True)
+def close_workers():
+    """Don't leave idle workers around after tests."""
+    yield
+    workers.close_idle_workers()
+
+
+@pytest.mark.parametrize('start_method', [None, 'fork', 'forkserver', 'spawn'])
+def test_run(start_method):
+    """Verify results and that every task gets a new process by default.
+
+    :param str start_method: Start method for child processes.
+    """
+    first = workers.run(pid, tuple(), start_method)
+    second = workers.run(pid, tuple(), start_method)
+    assert first[0] is second[0] is True
+    assert len({first[1], second[1], os.getpid()}) == 3
+    assert not workers.IDLE_WORKERS
+
+
+def test_recycle():
+    """Verify workers are reused up to max_builds times and replaced after failing."""
+    pids = [workers.run(pid, tuple(), max_builds=2)[1] for _ in range(5)]
+    assert pids[0] == pids[1]
+    assert pids[2] == pids[3]
+    assert len(set(pids)) == 3
+
+    assert workers.run(pid, (True,), max_builds=2) == (False, None)
+    after_failure = workers.run(pid, tuple(), max_builds=2)[1]
+    assert after_failure not in pids
+
+    # Different settings don't reuse the idle worker.
+    assert workers.run(pid, tuple(), max_builds=3)[1] != after_failure
+
+
+@pytest.mark.parametrize('code,expected', [(0, True), (1, False), ('error', False)])
+def test_exit(code, expected):
+    """Verify sys.exit() in child processes.
+
+    :param code: Exit code.
+    :param bool expected: Expected success.
+    """
+    assert workers.run(exit_now, (code,)) == (expected, None)
+
+
+def test_pickles_tasks():
+    """Test function."""
+    assert workers.pickles_tasks('spawn') is True
+    assert workers.pickles_tasks('fork') is False
+    assert workers.pickles_tasks('fork', 2) is True
+
+
+@pytest.mark.parametrize('max_builds', [1, 2])
+def test_run_parallel(max_builds):
+    """Verify tasks run at the same time, results arrive as they finish, and indexes map to tasks.
+
+    :param int max_builds: Number of tasks each worker runs.
+    """
+    started = list()
+    tasks = [(sleep, (1,)), (sleep, (0,)), (pid, (True,)), (sleep, (0,))]
+    results = list(workers.run_parallel(tasks, 2, max_builds=max_builds, started=started.append))
+    assert started == [0, 1, 2, 3]
+    assert sorted(r[0] for r in results) == [0, 1, 2, 3]
+    assert results[-1][0] == 0  # Slowest task finishes last.
+    assert [r[1] for r in sorted(results)] == [True, True, False, True]
+    assert results[-1][3] >= 1
+    assert len({r[2] for r in results if r[1]} | {os.getpid()}) == 4  # Failed task's worker isn't reused.
+
+
+def test_run_parallel_close():
+    """Verify running tasks are terminated when the caller stops early."""
+    results = workers.run_parallel([(sleep, (0,)), (sleep, (60,))], 2)
+    assert next(results)[0] == 0
+    start = time.time()
+    results.close()
+    assert time.time() - start < 30
+
+
+@pytest.mark.parametrize('max_builds', [1, 2])
+def test_time_limit(max_builds):
+    """Verify tasks running too long are terminated and fail.
+
+    :param int max_builds: Number of tasks each worker runs.
+    """
+    start = time.time()
+    assert workers.run(sleep, (60,), max_builds=max_builds, limits=dict(time_limit=1)) == (False, None)
+    assert time.time() - start < 30
+    assert workers.run(sleep, (0,), max_builds=max_builds, limits=dict(time_limit=1))[0] is True
+
+    tasks = [(sleep, (60,)), (sleep, (0,))]
+    results = sorted(workers.run_parallel(tasks, 2, max_builds=max_builds, limits=dict(time_limit=1)))
+    assert [r[1] for r in results] == [False, True]
+    assert time.time() - start < 60
+
+
+@pytest.mark.skipif('not workers.available_memory()')
+def test_memory_limit():
+    """Verify tasks allocating more than the memory limit fail."""
+    with open('/proc/self/status') as handle:
+        used = [int(line.split()[1]) * 1024 for line in handle if line.startswith('VmSize:')][0]
+    limit = used + 256 * 1024 * 1024  # Forked children start with the parent's address space.
+    assert workers.run(allocate, (512,), 'fork', limits=dict(memory_limit=limit))[0] is False
+    assert workers.run(allocate, (16,), 'fork', limits=dict(memory_limit=limit))[0] is True
+
+
+def test_low_memory(monkeypatch):
+    """Verify tasks run one at a time while available memory is low.
+
+    :param monkeypatch: pytest fixture.
+    """
+    monkeypatch.setattr(workers, 'available_memory', lambda: 100)
+    monkeypatch.setattr(workers, 'peak_child_memory', lambda: 200)
+    start = time.time()
+    results = list(workers.run_parallel([(sleep, (0.5,))] * 3, 3))
+    assert [r[:2] for r in results] == [(0, True), (1, True), (2, True)]
+    assert time.time() - start >= 1.5
+
+    monkeypatch.setattr(workers, 'available_memory', lambda: None)  # Unknown, e.g. on Windows.
+    assert workers.memory_allows_another(1024)